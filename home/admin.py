@@ -1,4 +1,22 @@
 from django.contrib import admin
-from home.models import RecentlyPlayed
+from home.models import RecentlyPlayed, PlayEvent, SongPlayRollup, ArtistPlayRollup, ExploreSnapshot
 
 admin.site.register(RecentlyPlayed)
+
+
+class PlayEventAdmin(admin.ModelAdmin):
+    list_display = ('user', 'song', 'playlist', 'played_at', 'ms_played')
+
+admin.site.register(PlayEvent, PlayEventAdmin)
+
+class PlayRollupAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'granularity', 'bucket', 'plays', 'ms_played')
+    list_filter = ('granularity',)
+
+admin.site.register(SongPlayRollup, PlayRollupAdmin)
+admin.site.register(ArtistPlayRollup, PlayRollupAdmin)
+
+class ExploreSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_at')
+
+admin.site.register(ExploreSnapshot, ExploreSnapshotAdmin)
@@ -0,0 +1,193 @@
+import logging
+import os
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from home.models import ArtistPlayRollup, ExploreSnapshot, SongPlayRollup
+from music.models import Song, Album
+from music.serializers import SongSerializer, AlbumSerializer
+from playlists.models import Playlist
+from playlists.serializers import PlaylistSerializer
+from users.serializers import UserResponseSerializer
+
+ROLLUP_WINDOW_DAYS = 30
+SNAPSHOT_CACHE_KEY = 'explore:snapshot'
+REFRESH_LOCK_KEY = 'explore:snapshot:refresh'
+REFRESH_LOCK_TIMEOUT = 60 * 5
+SNAPSHOTS_KEPT = 5
+# Recommended today is filtered per user, so the snapshot keeps spare candidates
+RECOMMENDED_TODAY_CANDIDATES = 50
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+def order_by_ids(queryset, ids):
+    """Fetch ``ids`` from ``queryset`` in one query, keeping the given order."""
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def recommended_today_songs(exclude_ids=(), limit=RECOMMENDED_TODAY_CANDIDATES):
+    return (
+        Song.objects
+        .exclude(id__in=exclude_ids)
+        .order_by('-released_date')
+        .select_related('album', 'album__artist')
+        .prefetch_related('genre', 'featured_artists__user_profile')
+        .distinct()[:limit]
+    )
+
+
+def global_sections():
+    """Serialize the explore sections that do not depend on the user."""
+    sections = {}
+    rollup_window = timezone.now() - timedelta(days=ROLLUP_WINDOW_DAYS)
+    daily_song_plays = SongPlayRollup.objects.filter(granularity='day', bucket__gte=rollup_window)
+
+    # Recommended Today candidates
+    sections['recommended_today'] = {
+        'title': 'Recommended for Today',
+        'items': SongSerializer(recommended_today_songs(), many=True).data
+    }
+
+    # Popular Albums
+    popular_album_ids = [
+        row['song__album'] for row in
+        daily_song_plays
+        .filter(song__album__isnull=False)
+        .values('song__album')
+        .annotate(total_plays=Sum('plays'))
+        .order_by('-total_plays')[:6]
+    ]
+    popular_albums = order_by_ids(Album.objects.select_related('artist'), popular_album_ids)
+    sections['popular_albums'] = {
+        'title': 'Popular Albums',
+        'items': AlbumSerializer(popular_albums, many=True).data
+    }
+
+    # Popular Artists Section
+    popular_artist_ids = [
+        row['artist'] for row in
+        ArtistPlayRollup.objects
+        .filter(granularity='day', bucket__gte=rollup_window)
+        .values('artist')
+        .annotate(total_plays=Sum('plays'))
+        .order_by('-total_plays')[:6]
+    ]
+    popular_artists = order_by_ids(User.objects.select_related('user_profile'), popular_artist_ids)
+    if popular_artists:
+        sections['popular_artists'] = {
+            'title': 'Artist You May Like',
+            'items': UserResponseSerializer(popular_artists, many=True).data
+        }
+
+    # Trending Songs Section
+    trending_window = timezone.now().date() - timedelta(days=30)
+    trending_song_ids = [
+        row['song'] for row in
+        daily_song_plays
+        .filter(song__released_date__gte=trending_window)
+        .values('song')
+        .annotate(total_engagement=Sum('plays') + Max('song__likes'))
+        .order_by('-total_engagement')[:6]
+    ]
+    trending_songs = order_by_ids(
+        Song.objects.select_related('album', 'album__artist')
+        .prefetch_related('genre', 'featured_artists__user_profile'),
+        trending_song_ids
+    )
+    sections['trending_songs'] = {
+        'title': 'Trending Songs',
+        'items': SongSerializer(trending_songs, many=True).data
+    }
+
+    # Trending Playlists Section
+    trending_playlist_ids = [
+        row['song__playlists'] for row in
+        daily_song_plays
+        .filter(song__playlists__privacy='public')
+        .values('song__playlists')
+        .annotate(total_plays=Sum('plays'))
+        .order_by('-total_plays')[:6]
+    ]
+    trending_playlists = order_by_ids(Playlist.objects.all(), trending_playlist_ids)
+    sections['trending_playlists'] = {
+        'title': 'Popular Radio',
+        'items': PlaylistSerializer(trending_playlists, many=True).data
+    }
+
+    # Featured Album (Most Liked of those Played lately)
+    album_likes = Song.objects.filter(album=OuterRef('pk')).order_by().values('album').annotate(likes=Sum('likes'))
+    featured_album = (
+        Album.objects
+        .filter(songs__play_rollups__granularity='day', songs__play_rollups__bucket__gte=rollup_window)
+        .annotate(window_plays=Sum('songs__play_rollups__plays'))
+        .annotate(song_likes=Coalesce(Subquery(album_likes.values('likes')), Value(0)))
+        .order_by('-song_likes', '-window_plays')
+        .first()
+    )
+    if featured_album:
+        sections['featured_album'] = {
+            'title': 'Featured Album',
+            'details': AlbumSerializer(featured_album).data
+        }
+    return sections
+
+
+def snapshot_payload(snapshot):
+    return {'version': snapshot.id, 'created_at': snapshot.created_at, 'sections': snapshot.sections}
+
+
+def build_explore_snapshot():
+    """
+    Materialize the global sections as a new snapshot version. The row and the
+    cached copy are each replaced in a single write, so readers see either the
+    old or the new version, never a mix.
+    """
+    sections = global_sections()
+    with transaction.atomic():
+        snapshot = ExploreSnapshot.objects.create(sections=sections)
+        stale_ids = ExploreSnapshot.objects.order_by('-id').values_list('id', flat=True)[SNAPSHOTS_KEPT:]
+        ExploreSnapshot.objects.filter(id__in=list(stale_ids)).delete()
+        transaction.on_commit(lambda: cache.set(SNAPSHOT_CACHE_KEY, snapshot_payload(snapshot), None))
+    return snapshot
+
+
+def refresh_explore_snapshot_later():
+    """Build a new snapshot on a background thread, unless any process sharing the cache already is."""
+    if not cache.add(REFRESH_LOCK_KEY, os.getpid(), REFRESH_LOCK_TIMEOUT):
+        return
+
+    def refresh():
+        try:
+            build_explore_snapshot()
+        except Exception:
+            logger.exception("Failed to refresh the explore snapshot")
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+            close_old_connections()
+
+    threading.Thread(target=refresh, name='explore-snapshot-refresh', daemon=True).start()
+
+
+def current_explore_snapshot():
+    """
+    The current snapshot from the cache, falling back to the newest row and
+    building the first one. Snapshots older than ``EXPLORE_SNAPSHOT_MAX_AGE``
+    are still served while a new one is built in the background.
+    """
+    payload = cache.get(SNAPSHOT_CACHE_KEY)
+    if payload is None:
+        snapshot = ExploreSnapshot.objects.order_by('-id').first() or build_explore_snapshot()
+        payload = snapshot_payload(snapshot)
+        cache.add(SNAPSHOT_CACHE_KEY, payload, None)
+    if timezone.now() - payload['created_at'] > timedelta(seconds=settings.EXPLORE_SNAPSHOT_MAX_AGE):
+        refresh_explore_snapshot_later()
+    return payload
@@ -0,0 +1,230 @@
+import math
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import threading
+import time
+import uuid
+
+import numpy as np
+from django.conf import settings
+
+MAGIC = b'ALSF'
+VERSION = 1
+# magic, version, factors, users, items; followed by the sorted user UUIDs, the
+# item UUIDs, then little-endian float32 user and item factor rows
+HEADER = struct.Struct('<4sBxHII')
+ID_SIZE = 16
+FLOAT = np.dtype('<f4')
+
+FACTORS = 32
+ITERATIONS = 10
+REGULARIZATION = 0.1
+# Confidence of an interaction is 1 + ALPHA * weight
+ALPHA = 10.0
+
+
+# State shared with forked workers, set before the pool starts
+_matrix = None
+_fixed = None
+_base = None
+_alpha = None
+
+
+def compressed(rows, columns, weights, count):
+    """``(indptr, indices, weights)`` of the sparse matrix with ``count`` rows given as coordinates."""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=count), out=indptr[1:])
+    return indptr, columns[order], weights[order]
+
+
+def solve_rows(bounds):
+    """
+    One implicit-feedback ALS half step for rows ``start`` to ``end`` of the
+    matrix against the fixed factors, using the ``YᵀY + Yᵀ(C - I)Y``
+    decomposition so each row only touches its own interactions.
+    """
+    start, end = bounds
+    indptr, indices, weights = _matrix
+    solved = np.zeros((end - start, _fixed.shape[1]))
+    for row in range(start, end):
+        columns = indices[indptr[row]:indptr[row + 1]]
+        if not len(columns):
+            continue
+        confidence = 1 + _alpha * weights[indptr[row]:indptr[row + 1]]
+        vectors = _fixed[columns]
+        a = _base + (vectors.T * (confidence - 1)) @ vectors
+        solved[row - start] = np.linalg.solve(a, vectors.T @ confidence)
+    return solved
+
+
+def als_half_step(matrix, fixed, regularization, alpha, workers):
+    global _matrix, _fixed, _base, _alpha
+    rows = len(matrix[0]) - 1
+    _matrix, _fixed, _alpha = matrix, fixed, alpha
+    _base = fixed.T @ fixed + regularization * np.eye(fixed.shape[1])
+    if workers <= 1 or rows < workers * 64:
+        return solve_rows((0, rows))
+
+    chunk_size = math.ceil(rows / (workers * 4))
+    chunks = [(start, min(start + chunk_size, rows)) for start in range(0, rows, chunk_size)]
+    # Forked workers read the fixed factors copy-on-write instead of pickling them
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        return np.vstack(pool.map(solve_rows, chunks))
+
+
+def train_als(interactions, factors=FACTORS, iterations=ITERATIONS, regularization=REGULARIZATION, alpha=ALPHA,
+              workers=1, seed=0, progress=None):
+    """
+    Train implicit ALS on ``{user_id: {song_id: weight}}``. Returns
+    ``(user_ids, user_factors, song_ids, song_factors)`` with factors as arrays of rows.
+    ``progress(iteration, seconds)`` is called after every iteration.
+    """
+    user_ids = sorted(interactions, key=lambda user_id: user_id.bytes)
+    song_ids = sorted({song_id for songs in interactions.values() for song_id in songs}, key=lambda song_id: song_id.bytes)
+    song_index = {song_id: index for index, song_id in enumerate(song_ids)}
+    users, songs, weights = [], [], []
+    for user, user_id in enumerate(user_ids):
+        for song_id, weight in interactions[user_id].items():
+            users.append(user)
+            songs.append(song_index[song_id])
+            weights.append(weight)
+    users, songs = np.array(users, dtype=np.int64), np.array(songs, dtype=np.int64)
+    weights = np.array(weights, dtype=np.float64)
+    user_matrix = compressed(users, songs, weights, len(user_ids))
+    song_matrix = compressed(songs, users, weights, len(song_ids))
+
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(0, 0.01, (len(user_ids), factors))
+    song_factors = rng.normal(0, 0.01, (len(song_ids), factors))
+    for iteration in range(1, iterations + 1):
+        started = time.monotonic()
+        user_factors = als_half_step(user_matrix, song_factors, regularization, alpha, workers)
+        song_factors = als_half_step(song_matrix, user_factors, regularization, alpha, workers)
+        if progress:
+            progress(iteration, time.monotonic() - started)
+    return user_ids, user_factors, song_ids, song_factors
+
+
+def write_model(path, user_ids, user_factors, song_ids, song_factors):
+    """Write the model next to ``path`` and move it into place, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    user_factors = np.asarray(user_factors, dtype=FLOAT)
+    song_factors = np.asarray(song_factors, dtype=FLOAT)
+    factors = song_factors.shape[1] if song_factors.ndim == 2 else 0
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, factors, len(user_ids), len(song_ids)))
+        file.write(b''.join(user_id.bytes for user_id in user_ids))
+        file.write(b''.join(song_id.bytes for song_id in song_ids))
+        file.write(user_factors.tobytes())
+        file.write(song_factors.tobytes())
+    os.replace(temporary, path)
+
+
+class FactorModel:
+    """
+    A trained model memory-mapped read-only. Every process maps the same file,
+    so the factors live once in the page cache instead of once per worker.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.factors, self.users, self.songs = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a factor model")
+        self.user_ids_at = HEADER.size
+        self.song_ids_at = self.user_ids_at + self.users * ID_SIZE
+        user_factors_at = self.song_ids_at + self.songs * ID_SIZE
+        song_factors_at = user_factors_at + self.users * self.factors * FLOAT.itemsize
+        self.user_factors = self.float_rows(path, user_factors_at, self.users)
+        self.song_factors = self.float_rows(path, song_factors_at, self.songs)
+
+    def float_rows(self, path, offset, rows):
+        if not rows or not self.factors:
+            return np.zeros((rows, self.factors), dtype=FLOAT)
+        return np.memmap(path, dtype=FLOAT, mode='r', offset=offset, shape=(rows, self.factors))
+
+    def user_index(self, user_id):
+        """Binary search over the sorted user ids."""
+        key = user_id.bytes
+        low, high = 0, self.users
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.user_ids_at + middle * ID_SIZE
+            if self.data[offset:offset + ID_SIZE] < key:
+                low = middle + 1
+            else:
+                high = middle
+        offset = self.user_ids_at + low * ID_SIZE
+        return low if low < self.users and self.data[offset:offset + ID_SIZE] == key else None
+
+    def song_id(self, index):
+        offset = self.song_ids_at + index * ID_SIZE
+        return uuid.UUID(bytes=bytes(self.data[offset:offset + ID_SIZE]))
+
+    def recommend(self, user_id, exclude_ids=(), limit=6):
+        """Top ``limit`` song ids by ``user · song`` score, skipping ``exclude_ids``."""
+        index = self.user_index(user_id)
+        if index is None:
+            return []
+        scores = self.song_factors @ self.user_factors[index]
+        exclude_ids = set(exclude_ids)
+        count = min(limit + len(exclude_ids), self.songs)
+        if not count:
+            return []
+        # Only the best ``count`` are sorted, not every song
+        best = np.argpartition(-scores, count - 1)[:count] if count < self.songs else np.arange(self.songs)
+        best = best[np.lexsort((best, -scores[best]))]
+        song_ids = (self.song_id(song) for song in best.tolist())
+        return [song_id for song_id in song_ids if song_id not in exclude_ids][:limit]
+
+
+_model = None
+_model_key = None
+_model_lock = threading.Lock()
+
+
+def load_model(path=None):
+    """The current model for this process, reopened when the file is replaced; ``None`` if none is trained."""
+    global _model, _model_key
+    path = path or settings.RECOMMENDER_MODEL_PATH
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (path, stat.st_ino, stat.st_mtime_ns)
+    with _model_lock:
+        if _model_key != key:
+            _model, _model_key = FactorModel(path), key
+        return _model
+
+
+def recommend_songs(user_id, exclude_ids=(), limit=6):
+    model = load_model()
+    return model.recommend(user_id, exclude_ids, limit) if model else []
+
+
+def holdout_split(interactions, seed=0):
+    """Hide one random song of every user with at least two, for leave-one-out evaluation."""
+    rng = random.Random(seed)
+    train, held_out = {}, {}
+    for user_id, songs in interactions.items():
+        songs = dict(songs)
+        if len(songs) >= 2:
+            song_id = rng.choice(sorted(songs, key=lambda song_id: song_id.bytes))
+            songs.pop(song_id)
+            held_out[user_id] = song_id
+        train[user_id] = songs
+    return train, held_out
+
+
+def recall_at_k(model, train, held_out, k):
+    hits = sum(
+        song_id in model.recommend(user_id, train[user_id], limit=k) for user_id, song_id in held_out.items()
+    )
+    return hits / len(held_out) if held_out else 0.0
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from home.explore import build_explore_snapshot
+
+
+class Command(BaseCommand):
+    help = "Materialize the global explore sections into a new snapshot version"
+
+    def handle(self, *args, **options):
+        snapshot = build_explore_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Published explore snapshot {snapshot.id}"))
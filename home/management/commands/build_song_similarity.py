@@ -0,0 +1,18 @@
+import time
+from django.core.management.base import BaseCommand
+from home.similarity import HISTORY_DAYS, TOP_K, build_song_similarity
+
+
+class Command(BaseCommand):
+    help = "Rebuild the item-item song similarity used by \"Made for you\" from likes, dislikes and plays"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K)
+        parser.add_argument('--days', type=int, default=HISTORY_DAYS, help="Days of play history to include")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        songs, rows = build_song_similarity(top_k=options['top_k'], history_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {rows} neighbours for {songs} songs in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from home.search import search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index of songs, albums, artists and playlists in the configured backend"
+
+    def handle(self, *args, **options):
+        backend = search_backend()
+        counts = backend.rebuild()
+        summary = ', '.join(f"{count} {type}" for type, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {summary} with {backend.__class__.__name__}"))
@@ -0,0 +1,15 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from home.rollups import rollup_play_events
+
+
+class Command(BaseCommand):
+    help = "Aggregate new play events into hourly and daily song and artist rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slice-minutes', type=int, default=60,
+                            help="Minutes of recorded events folded per transaction")
+
+    def handle(self, *args, **options):
+        processed = rollup_play_events(slice_size=timedelta(minutes=max(options['slice_minutes'], 1)))
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {processed} play events"))
@@ -0,0 +1,63 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from home import factorization
+from home.similarity import HISTORY_DAYS, interaction_matrix
+
+
+class Command(BaseCommand):
+    help = "Train the implicit-feedback ALS recommender from likes and plays, optionally reporting recall@k"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factors', type=int, default=factorization.FACTORS)
+        parser.add_argument('--iterations', type=int, default=factorization.ITERATIONS)
+        parser.add_argument('--regularization', type=float, default=factorization.REGULARIZATION)
+        parser.add_argument('--alpha', type=float, default=factorization.ALPHA)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--days', type=int, default=HISTORY_DAYS, help="Days of play history to include")
+        parser.add_argument('--evaluate', action='store_true',
+                            help="Hold out one song per user and report recall@k instead of publishing the model")
+        parser.add_argument('--k', type=int, default=10, help="Cutoff for recall@k")
+        parser.add_argument('--output', default=settings.RECOMMENDER_MODEL_PATH)
+
+    def handle(self, *args, **options):
+        interactions = interaction_matrix(options['days'])
+        held_out = {}
+        if options['evaluate']:
+            interactions, held_out = factorization.holdout_split(interactions)
+        total = sum(len(songs) for songs in interactions.values())
+        if not total:
+            self.stdout.write(self.style.WARNING("No interactions to train on"))
+            return
+
+        def progress(iteration, seconds):
+            self.stdout.write(f"Iteration {iteration}: {seconds:.1f}s, {total / max(seconds, 1e-9):.0f} interactions/s")
+
+        started = time.monotonic()
+        model = factorization.train_als(
+            interactions,
+            factors=options['factors'],
+            iterations=options['iterations'],
+            regularization=options['regularization'],
+            alpha=options['alpha'],
+            workers=options['workers'],
+            progress=progress,
+        )
+        elapsed = time.monotonic() - started
+        summary = f"Trained on {total} interactions of {len(model[0])} users and {len(model[2])} songs in {elapsed:.1f}s"
+
+        if options['evaluate']:
+            path = f"{options['output']}.evaluate"
+            factorization.write_model(path, *model)
+            try:
+                recall = factorization.recall_at_k(
+                    factorization.FactorModel(path), interactions, held_out, options['k']
+                )
+            finally:
+                os.remove(path)
+            self.stdout.write(self.style.SUCCESS(f"{summary}; recall@{options['k']} = {recall:.3f} over {len(held_out)} users"))
+            return
+
+        factorization.write_model(options['output'], *model)
+        self.stdout.write(self.style.SUCCESS(f"{summary}; published {options['output']}"))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0003_explore_snapshot'),
+        ('music', '0019_follow_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SongNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='music.song')),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='music.song')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['song', '-score'], name='song_neighbor_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('song', 'neighbor'), name='unique_song_neighbor')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+TABLE = 'home_search_index'
+
+# Frozen copy of home.search.base.document_queryset for the historical models
+DOCUMENTS = (
+    ('songs', 'music.Song', {}, ('id', 'title', 'album__title', 'album__artist__user_profile__display_name')),
+    ('albums', 'music.Album', {}, ('id', 'title', 'artist__user_profile__display_name')),
+    ('artists', 'users.UserProfile', {'role': 'artists'},
+     ('user_id', 'display_name', 'user__first_name', 'user__last_name')),
+    ('playlists', 'playlists.Playlist', {'privacy': 'public'}, ('id', 'name', 'user__user_profile__display_name')),
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "kind UNINDEXED, object_id, title, context, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        for kind, model, filters, fields in DOCUMENTS:
+            rows = apps.get_model(model).objects.filter(**filters).values_list(*fields)
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (kind, object_id, title, context) VALUES (%s, %s, %s, %s)",
+                [(kind, object_id.hex, title or '', ' '.join(value for value in context if value))
+                 for object_id, title, *context in rows.iterator(chunk_size=2000)],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0004_song_neighbors'),
+        ('music', '0020_search_vectors'),
+        ('playlists', '0006_search_vectors'),
+        ('users', '0009_search_vectors'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
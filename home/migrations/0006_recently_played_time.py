@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recentlyplayed',
+            name='played_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
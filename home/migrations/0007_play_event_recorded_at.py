@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:15
+
+import datetime
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_watermarks(apps, schema_editor):
+    """
+    Every existing event was stamped with the same ``recorded_at``; put the ones
+    already rolled up just before the new time watermark and the rest at it.
+    """
+    PlayEvent = apps.get_model('home', 'PlayEvent')
+    RollupWatermark = apps.get_model('home', 'RollupWatermark')
+    now = django.utils.timezone.now()
+    last_event_id = (
+        RollupWatermark.objects.filter(name='play_events').values_list('last_event_id', flat=True).first() or 0
+    )
+    PlayEvent.objects.filter(id__lte=last_event_id).update(recorded_at=now - datetime.timedelta(seconds=1))
+    PlayEvent.objects.filter(id__gt=last_event_id).update(recorded_at=now)
+    RollupWatermark.objects.filter(name='play_events').update(rolled_up_until=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0006_recently_played_time'),
+        ('music', '0020_search_vectors'),
+        ('playlists', '0006_search_vectors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playevent',
+            name='recorded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='rollupwatermark',
+            name='rolled_up_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='playevent',
+            index=models.Index(fields=['recorded_at'], name='play_event_recorded_idx'),
+        ),
+        migrations.RunPython(move_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='rollupwatermark',
+            name='last_event_id',
+        ),
+    ]
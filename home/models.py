@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from music.models import Song
 from playlists.models import Playlist
 
@@ -10,8 +12,112 @@ class RecentlyPlayed(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     song = models.ForeignKey(Song, on_delete=models.CASCADE, null=True, blank=True)
     playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE, null=True, blank=True)
-    played_at = models.DateTimeField(auto_now_add=True)
+    # Written in batches by home.recent, which keeps the time of the play
+    played_at = models.DateTimeField(default=timezone.now)
 
 
     def __str__(self):
         return f"{self.user} - {self.song or self.playlist}"
+
+
+class PlayEvent(models.Model):
+    """Append-only listening history, one row per play."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='play_events', db_index=False)
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='play_events')
+    playlist = models.ForeignKey(Playlist, on_delete=models.SET_NULL, null=True, blank=True, related_name='play_events')
+    played_at = models.DateTimeField(default=timezone.now)
+    ms_played = models.PositiveIntegerField(default=0)
+    # When the row was written, which is what the rollups advance on; played_at
+    # comes from the client and may be far in the past
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-played_at'], name='play_event_user_played_idx'),
+            models.Index(fields=['recorded_at'], name='play_event_recorded_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} played {self.song_id}"
+
+
+class PlayRollup(models.Model):
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    granularity = models.CharField(choices=GRANULARITY_CHOICES, max_length=4)
+    bucket = models.DateTimeField()
+    plays = models.PositiveIntegerField(default=0)
+    ms_played = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class SongPlayRollup(PlayRollup):
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='play_rollups')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['song', 'granularity', 'bucket'], name='unique_song_play_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'bucket'], name='song_rollup_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.song} - {self.granularity} {self.bucket}"
+
+
+class ArtistPlayRollup(PlayRollup):
+    artist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='play_rollups')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['artist', 'granularity', 'bucket'], name='unique_artist_play_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'bucket'], name='artist_rollup_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.artist} - {self.granularity} {self.bucket}"
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    rolled_up_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.rolled_up_until}"
+
+
+class SongNeighbor(models.Model):
+    """One of the ``k`` songs most similar to ``song``, rebuilt by ``build_song_similarity``."""
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['song', 'neighbor'], name='unique_song_neighbor'),
+        ]
+        indexes = [
+            models.Index(fields=['song', '-score'], name='song_neighbor_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.song_id} ~ {self.neighbor_id} ({self.score:.3f})"
+
+
+class ExploreSnapshot(models.Model):
+    """
+    The explore sections that are the same for every user, materialized by
+    ``build_explore_snapshot``. The newest row is the current version.
+    """
+    sections = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Explore snapshot {self.id} ({self.created_at:%Y-%m-%d %H:%M})"
@@ -0,0 +1,234 @@
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from home.models import RecentlyPlayed
+from music.models import Song
+from playlists.models import Playlist
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'recent'
+# Slots per user; repeats of one song take a slot each, so this leaves room
+# for WINDOW distinct entries
+RING_SIZE = 20
+WINDOW = 6
+SLOT_TIMEOUT = 60 * 60 * 24 * 30
+
+
+class RecentlyPlayedBuffer:
+    """
+    Per-user ring buffer of recently opened songs and playlists.
+
+    Each open claims the next slot with an atomic ``incr`` and writes a single
+    key, so concurrent plays never overwrite each other. Reads fetch every
+    slot with one ``get_many``. The windows of the users touched since the
+    last flush are merged into the ``RecentlyPlayed`` table in one transaction
+    per batch, and the table is only read to seed a user's buffer when the
+    cache has lost it.
+    """
+
+    def __init__(self, interval):
+        self.interval = max(int(interval), 1)
+        self.dirty = set()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def key(self, user_id, *parts):
+        return ':'.join([KEY_PREFIX, str(user_id), *map(str, parts)])
+
+    def slot_keys(self, user_id):
+        return [self.key(user_id, slot) for slot in range(RING_SIZE)]
+
+    def add(self, user_id, kind, object_id, played_at=None):
+        """Record that ``user_id`` opened the ``kind`` ('song' or 'playlist') ``object_id``."""
+        self.start()
+        sequence = self.next_sequence(user_id)
+        entry = (sequence, kind, str(object_id), played_at or timezone.now())
+        cache.set(self.key(user_id, sequence % RING_SIZE), entry, SLOT_TIMEOUT)
+        with self._lock:
+            self.dirty.add(user_id)
+
+    def next_sequence(self, user_id):
+        try:
+            return cache.incr(self.key(user_id, 'seq'))
+        except ValueError:
+            self.seed(user_id)
+            return cache.incr(self.key(user_id, 'seq'))
+
+    def seed(self, user_id):
+        """Refill a user's buffer from the table after the cache lost it."""
+        rows = (
+            RecentlyPlayed.objects.filter(user_id=user_id).order_by('-played_at', '-id')
+            .values_list('song_id', 'playlist_id', 'played_at')[:WINDOW]
+        )
+        entries = {}
+        for sequence, (song_id, playlist_id, played_at) in enumerate(reversed(rows), start=1):
+            kind, object_id = ('song', song_id) if song_id else ('playlist', playlist_id)
+            entries[self.key(user_id, sequence % RING_SIZE)] = (sequence, kind, str(object_id), played_at)
+        cache.set_many(entries, SLOT_TIMEOUT)
+        cache.add(self.key(user_id, 'seq'), len(entries), None)
+
+    def entries(self, user_id):
+        """The user's latest ``WINDOW`` distinct ``(kind, object_id, played_at)``, newest first."""
+        sequence_key = self.key(user_id, 'seq')
+        found = cache.get_many([sequence_key, *self.slot_keys(user_id)])
+        if sequence_key not in found:
+            self.seed(user_id)
+            found = cache.get_many(self.slot_keys(user_id))
+        found.pop(sequence_key, None)
+
+        latest, seen = [], set()
+        # Newest first; the sequence breaks ties between plays in the same instant
+        ordered = sorted(found.values(), key=lambda entry: (entry[3], entry[0]), reverse=True)
+        for _, kind, object_id, played_at in ordered:
+            if (kind, object_id) not in seen:
+                seen.add((kind, object_id))
+                latest.append((kind, object_id, played_at))
+        return latest[:WINDOW]
+
+    def flush(self):
+        """
+        Write the current window of every user played since the last flush and
+        return how many users were written. Only one flush runs at a time
+        across all processes sharing the cache.
+        """
+        lock_key = f'{KEY_PREFIX}:lock'
+        if not cache.add(lock_key, os.getpid(), max(self.interval * 2, 60)):
+            return 0
+
+        try:
+            with self._lock:
+                user_ids, self.dirty = self.dirty, set()
+            if not user_ids:
+                return 0
+            windows = {user_id: self.entries(user_id) for user_id in user_ids}
+            try:
+                write_windows(windows)
+            except Exception:
+                with self._lock:
+                    self.dirty |= user_ids
+                raise
+            return len(user_ids)
+        finally:
+            cache.delete(lock_key)
+
+    def start(self):
+        """Start the background flusher once per process."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # Users buffered by the parent are the parent's to flush
+            self.dirty = set()
+            thread = threading.Thread(target=self.run, name='recently-played-flush', daemon=True)
+            thread.start()
+            atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush recently played")
+            finally:
+                close_old_connections()
+
+
+def write_windows(windows):
+    """
+    Merge each user's entries in ``{user_id: entries}`` into their
+    ``RecentlyPlayed`` rows, in one transaction.
+
+    A window read from the cache may be missing plays: slots can be evicted,
+    and with a per-process cache each process only sees its own. So the rows
+    are never rewritten from it, only updated with newer plays and trimmed to
+    the latest ``WINDOW`` distinct songs and playlists.
+    """
+    song_ids = {object_id for entries in windows.values() for kind, object_id, _ in entries if kind == 'song'}
+    playlist_ids = {object_id for entries in windows.values() for kind, object_id, _ in entries if kind == 'playlist'}
+    with transaction.atomic():
+        # Serialise with other processes merging into the same users
+        User.objects.select_for_update().filter(id__in=list(windows)).order_by('id').exists()
+        # Skip entries whose song or playlist was deleted while they sat in the buffer
+        song_ids = {str(pk) for pk in Song.objects.filter(id__in=song_ids).values_list('id', flat=True)}
+        playlist_ids = {str(pk) for pk in Playlist.objects.filter(id__in=playlist_ids).values_list('id', flat=True)}
+
+        rows = {user_id: {} for user_id in windows}
+        stale = []
+        for row in RecentlyPlayed.objects.filter(user_id__in=list(windows)).order_by('-played_at', '-id'):
+            kind, object_id = ('song', row.song_id) if row.song_id else ('playlist', row.playlist_id)
+            # Older duplicates of a target go
+            if rows[row.user_id].setdefault((kind, str(object_id)), row) is not row:
+                stale.append(row.id)
+
+        created, updated = [], []
+        for user_id, entries in windows.items():
+            for kind, object_id, played_at in entries:
+                if object_id not in (song_ids if kind == 'song' else playlist_ids):
+                    continue
+                row = rows[user_id].get((kind, object_id))
+                if row is None:
+                    row = rows[user_id][kind, object_id] = RecentlyPlayed(
+                        user_id=user_id,
+                        song_id=object_id if kind == 'song' else None,
+                        playlist_id=object_id if kind == 'playlist' else None,
+                        played_at=played_at,
+                    )
+                    created.append(row)
+                elif played_at > row.played_at:
+                    row.played_at = played_at
+                    updated.append(row)
+
+        kept = set()
+        for user_rows in rows.values():
+            latest = sorted(user_rows.values(), key=lambda row: row.played_at, reverse=True)
+            kept.update(map(id, latest[:WINDOW]))
+            stale += [row.id for row in latest[WINDOW:] if row.pk]
+
+        RecentlyPlayed.objects.filter(id__in=stale).delete()
+        RecentlyPlayed.objects.bulk_update([row for row in updated if id(row) in kept], ['played_at'])
+        RecentlyPlayed.objects.bulk_create([row for row in created if id(row) in kept])
+
+
+recently_played_buffer = RecentlyPlayedBuffer(settings.RECENTLY_PLAYED_FLUSH_INTERVAL)
+
+
+def recently_played_entries(user_id):
+    """
+    Unsaved ``RecentlyPlayed`` entries of the user's window, newest first, with
+    songs and playlists loaded in one query each.
+    """
+    entries = recently_played_buffer.entries(user_id)
+    songs = (
+        Song.objects.select_related('album', 'album__artist')
+        .prefetch_related('genre', 'featured_artists__user_profile')
+        .in_bulk([object_id for kind, object_id, _ in entries if kind == 'song'])
+    )
+    playlists = Playlist.objects.select_related('user').in_bulk(
+        [object_id for kind, object_id, _ in entries if kind == 'playlist']
+    )
+    recent = []
+    for kind, object_id, played_at in entries:
+        target = (songs if kind == 'song' else playlists).get(uuid.UUID(object_id))
+        if target is not None:
+            recent.append(RecentlyPlayed(
+                user_id=user_id,
+                song=target if kind == 'song' else None,
+                playlist=target if kind == 'playlist' else None,
+                played_at=played_at,
+            ))
+    return recent
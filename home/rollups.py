@@ -0,0 +1,95 @@
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from home.models import PlayEvent, SongPlayRollup, ArtistPlayRollup, RollupWatermark
+
+WATERMARK_NAME = 'play_events'
+GRANULARITIES = ('hour', 'day')
+
+
+def merge_rollups(model, owner_field, totals):
+    """
+    Add ``{(owner_id, granularity, bucket): [plays, ms_played]}`` onto the
+    existing rollup rows, creating the missing ones.
+    """
+    if not totals:
+        return
+
+    owner_ids = {key[0] for key in totals}
+    buckets = {key[2] for key in totals}
+    existing = model.objects.filter(**{f'{owner_field}__in': owner_ids}, bucket__in=buckets)
+
+    to_update = []
+    for rollup in existing:
+        key = (getattr(rollup, owner_field), rollup.granularity, rollup.bucket)
+        if key in totals:
+            plays, ms_played = totals.pop(key)
+            rollup.plays += plays
+            rollup.ms_played += ms_played
+            to_update.append(rollup)
+
+    model.objects.bulk_update(to_update, ['plays', 'ms_played'], batch_size=1000)
+    model.objects.bulk_create(
+        [
+            model(**{owner_field: owner_id}, granularity=granularity, bucket=bucket, plays=plays, ms_played=ms_played)
+            for (owner_id, granularity, bucket), (plays, ms_played) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def rollup_play_events(slice_size=timedelta(hours=1)):
+    """
+    Fold the ``PlayEvent`` rows recorded since the watermark into the hourly
+    and daily per-song and per-artist rollups, one ``slice_size`` of
+    ``recorded_at`` per transaction. Returns the number of events processed.
+
+    Per-process flushers commit concurrently, so ids are not committed in
+    order; the watermark instead advances in time and stays
+    ``PLAY_ROLLUP_LAG`` seconds behind now, so that every flush writing
+    inside a slice has committed before the slice is read.
+    """
+    processed = 0
+    until = timezone.now() - timedelta(seconds=settings.PLAY_ROLLUP_LAG)
+    while True:
+        with transaction.atomic():
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+            pending = PlayEvent.objects.filter(recorded_at__lt=until)
+            if watermark.rolled_up_until is not None:
+                pending = pending.filter(recorded_at__gte=watermark.rolled_up_until)
+            # Skip straight over idle stretches
+            start = pending.order_by('recorded_at').values_list('recorded_at', flat=True).first()
+            if start is None:
+                if watermark.rolled_up_until is None or watermark.rolled_up_until < until:
+                    watermark.rolled_up_until = until
+                    watermark.save(update_fields=['rolled_up_until'])
+                return processed
+
+            end = min(start + slice_size, until)
+            events = pending.filter(recorded_at__gte=start, recorded_at__lt=end).order_by()
+            song_totals = defaultdict(lambda: [0, 0])
+            artist_totals = defaultdict(lambda: [0, 0])
+            for granularity in GRANULARITIES:
+                rows = (
+                    events.annotate(bucket=Trunc('played_at', granularity, tzinfo=dt_timezone.utc))
+                    .values_list('song_id', 'song__album__artist_id', 'bucket')
+                    .annotate(plays=Count('id'), ms_played=Sum('ms_played'))
+                )
+                for song_id, artist_id, bucket, plays, ms_played in rows:
+                    song_totals[(song_id, granularity, bucket)] = [plays, ms_played]
+                    if artist_id:
+                        totals = artist_totals[(artist_id, granularity, bucket)]
+                        totals[0] += plays
+                        totals[1] += ms_played
+                    if granularity == GRANULARITIES[0]:
+                        processed += plays
+
+            merge_rollups(SongPlayRollup, 'song_id', song_totals)
+            merge_rollups(ArtistPlayRollup, 'artist_id', artist_totals)
+
+            watermark.rolled_up_until = end
+            watermark.save(update_fields=['rolled_up_until'])
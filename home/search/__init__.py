@@ -0,0 +1,81 @@
+import base64
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+from home.search.base import SEARCH_TYPES
+from home.search.cache import bump_catalog_generation
+from home.search.suggest import suggest_index
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def backend_path():
+    if settings.SEARCH_BACKEND:
+        return settings.SEARCH_BACKEND
+    if connection.vendor == 'postgresql':
+        return 'home.search.postgres.PostgresSearchBackend'
+    from home.search.sqlite import fts5_table_exists
+    if fts5_table_exists():
+        return 'home.search.sqlite.SqliteSearchBackend'
+    return 'home.search.memory.MemorySearchBackend'
+
+
+def search_backend():
+    """The configured backend, picked and created once per process."""
+    with _backends_lock:
+        if settings.SEARCH_BACKEND not in _backends:
+            _backends[settings.SEARCH_BACKEND] = import_string(backend_path())()
+        return _backends[settings.SEARCH_BACKEND]
+
+
+def search_catalog(text, type, limit, offset=0):
+    """``(objects, hits)`` of ``type`` matching ``text``, best match first."""
+    return search_backend().search(text, type, limit, offset)
+
+
+def encode_cursor(type, offset):
+    return base64.urlsafe_b64encode(f'{type}|{offset}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """``(type, offset)`` from a search cursor, or ``None`` if it is not valid."""
+    try:
+        type, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        offset = int(offset)
+    except (ValueError, UnicodeError):
+        return None
+    return (type, offset) if type in SEARCH_TYPES and offset >= 0 else None
+
+
+def suggest(text, limit):
+    return suggest_index().suggest(text, limit)
+
+
+def index_now(type, ids):
+    search_backend().index(type, ids)
+    suggest_index().index(type, ids)
+    bump_catalog_generation()
+
+
+def remove_now(type, ids):
+    search_backend().remove(type, ids)
+    suggest_index().remove(type, ids)
+    bump_catalog_generation()
+
+
+def index_later(type, ids):
+    """
+    Reindex ``ids`` in the search backend and the typeahead and retire cached
+    results once the surrounding transaction commits.
+    """
+    ids = list(ids)
+    if ids:
+        transaction.on_commit(lambda: index_now(type, ids))
+
+
+def remove_later(type, ids):
+    ids = list(ids)
+    if ids:
+        transaction.on_commit(lambda: remove_now(type, ids))
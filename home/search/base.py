@@ -0,0 +1,87 @@
+import re
+import unicodedata
+from django.contrib.auth import get_user_model
+from home.explore import order_by_ids
+from music.models import Album, Song
+from playlists.models import Playlist
+from users.models import UserProfile
+
+User = get_user_model()
+
+SEARCH_TYPES = ('songs', 'albums', 'artists', 'playlists')
+MAX_SEARCH_LIMIT = 50
+# Hit counts stop at this, so counting never costs more than a bounded scan
+MAX_HIT_COUNT = 1000
+# How much a match in the title counts against one in the context (album, artist and owner names)
+FIELD_WEIGHTS = {'title': 3.0, 'context': 1.0}
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lower-cased words of ``text`` with accents removed, so "Beyoncé" matches "beyonce"."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return TOKEN_RE.findall(text.casefold())
+
+
+def document_queryset(type):
+    """``(id, title, *context)`` rows of everything of ``type`` that may show up in search."""
+    if type == 'songs':
+        return Song.objects.values_list('id', 'title', 'album__title', 'album__artist__user_profile__display_name')
+    if type == 'albums':
+        return Album.objects.values_list('id', 'title', 'artist__user_profile__display_name')
+    if type == 'artists':
+        return UserProfile.objects.filter(role='artists').values_list(
+            'user_id', 'display_name', 'user__first_name', 'user__last_name'
+        )
+    return Playlist.objects.filter(privacy='public').values_list('id', 'name', 'user__user_profile__display_name')
+
+
+def documents(type, ids=None):
+    """Yield ``(id, title, context)`` for ``type``, or only for ``ids`` when given."""
+    rows = document_queryset(type)
+    if ids is not None:
+        rows = rows.filter(**{'user_id__in' if type == 'artists' else 'id__in': ids})
+    for object_id, title, *context in rows.iterator(chunk_size=2000):
+        yield object_id, title or '', ' '.join(value for value in context if value)
+
+
+def result_queryset(type):
+    if type == 'songs':
+        return (
+            Song.objects.select_related('album', 'album__artist', 'album__artist__user_profile')
+            .prefetch_related('genre', 'featured_artists__user_profile')
+        )
+    if type == 'albums':
+        return Album.objects.select_related('artist__user_profile').prefetch_related('songs')
+    if type == 'artists':
+        return User.objects.select_related('user_profile')
+    return Playlist.objects.select_related('user__user_profile').prefetch_related('songs')
+
+
+class SearchBackend:
+    """
+    Where ``/api/search/`` looks things up. Backends that keep their own index
+    implement ``search_ids``, ``index``, ``remove`` and ``rebuild``; results are
+    then loaded in ranked order with one query.
+    """
+
+    def search(self, text, type, limit, offset=0):
+        """``(objects, hits)`` ranked ``offset`` to ``offset + limit``; ``hits`` stops at ``MAX_HIT_COUNT``."""
+        ids, hits = self.search_ids(text, type, limit, offset)
+        return order_by_ids(result_queryset(type), ids), hits
+
+    def search_ids(self, text, type, limit, offset=0):
+        """``(ids, hits)`` like ``search``."""
+        raise NotImplementedError
+
+    def index(self, type, ids):
+        """(Re)index ``ids`` of ``type``; ids that are no longer searchable are dropped."""
+        raise NotImplementedError
+
+    def remove(self, type, ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Index everything from scratch and return ``{type: documents}``."""
+        raise NotImplementedError
@@ -0,0 +1,86 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import Future
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_CACHE_KEY = 'search:catalog:generation'
+# How long other processes wait for the one filling a key before querying themselves
+FILL_TIMEOUT = 5
+POLL_INTERVAL = 0.025
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def catalog_generation():
+    return cache.get_or_set(GENERATION_CACHE_KEY, 0, None)
+
+
+def bump_catalog_generation():
+    """Retire every cached search result; called when a searchable row changes."""
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, 1, None)
+
+
+def normalize_query(text):
+    return ' '.join(text.casefold().split())
+
+
+def result_cache_key(generation, text, type, limit, offset):
+    digest = hashlib.md5(normalize_query(text).encode()).hexdigest()
+    return f'search:results:{generation}:{type}:{limit}:{offset}:{digest}'
+
+
+def fill(key, compute):
+    """
+    Compute and cache ``key`` unless another process already is, in which
+    case wait for its result, up to ``FILL_TIMEOUT``.
+    """
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, True, FILL_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, settings.SEARCH_CACHE_TIMEOUT)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + FILL_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return compute()
+
+
+def single_flight(key, compute):
+    """
+    ``compute()`` cached under ``key``. Concurrent misses on the same key share
+    one computation: threads of this process wait on the first one's result
+    and other processes on its cache entry.
+    """
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = _in_flight[key] = Future()
+    if not leader:
+        return future.result()
+
+    try:
+        value = cache.get(key)
+        if value is None:
+            value = fill(key, compute)
+        future.set_result(value)
+        return value
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
@@ -0,0 +1,251 @@
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from django.core.cache import cache
+from django.db import close_old_connections
+from home.search.base import FIELD_WEIGHTS, MAX_HIT_COUNT, SEARCH_TYPES, SearchBackend, documents, tokenize
+
+logger = logging.getLogger(__name__)
+
+GENERATION_CACHE_KEY = 'search:memory:generation'
+# Ids per logged change, which carries their rows to every process
+CHANGE_CHUNK = 500
+# Seconds a logged change is kept; a process that falls further behind rebuilds
+CHANGE_TIMEOUT = 60 * 60
+# Changes a process applies to catch up before it rebuilds instead
+MAX_CATCH_UP = 500
+# Seconds to wait for a change whose generation was bumped but is not stored yet
+CHANGE_WAIT = 5
+# BM25 term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+
+class InvertedIndex:
+    """
+    Postings of one document type, ``{term: {doc: weighted term frequency}}``,
+    where a title occurrence counts ``FIELD_WEIGHTS['title']`` times.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        self.total_length = 0.0
+        self.doc_terms = {}
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, doc, title, context):
+        self.discard(doc)
+        frequencies = Counter()
+        for field, text in (('title', title), ('context', context)):
+            for term in tokenize(text):
+                frequencies[term] += FIELD_WEIGHTS[field]
+        if not frequencies:
+            return
+        for term, frequency in frequencies.items():
+            self.postings[term][doc] = frequency
+        self.doc_terms[doc] = tuple(frequencies)
+        self.lengths[doc] = length = sum(frequencies.values())
+        self.total_length += length
+
+    def discard(self, doc):
+        for term in self.doc_terms.pop(doc, ()):
+            docs = self.postings[term]
+            docs.pop(doc, None)
+            if not docs:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(doc, 0.0)
+
+    def search(self, text, limit, offset=0):
+        """
+        ``(ids, hits)`` of the documents containing every term of ``text``,
+        ranked ``offset`` to ``offset + limit`` by BM25 score.
+        """
+        terms = set(tokenize(text))
+        if not terms or not self.lengths:
+            return [], 0
+        postings = [self.postings.get(term) for term in terms]
+        if not all(postings):
+            return [], 0
+        postings.sort(key=len)
+        matches = set(postings[0]).intersection(*postings[1:])
+
+        count = len(self.lengths)
+        average_length = self.total_length / count
+        idfs = [math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5)) for docs in postings]
+
+        def score(doc):
+            norm = K1 * (1 - B + B * self.lengths[doc] / average_length)
+            # Ties break on the id so pages never overlap
+            return sum(idf * docs[doc] * (K1 + 1) / (docs[doc] + norm) for idf, docs in zip(idfs, postings)), doc
+
+        return heapq.nlargest(offset + limit, matches, key=score)[offset:], min(len(matches), MAX_HIT_COUNT)
+
+
+class ProcessIndex:
+    """
+    State held by each process and kept in step through a change log in the
+    shared cache. ``index`` and ``remove`` bump ``generation_key`` and store
+    the rows they (re)indexed under the new generation; every process applies
+    the changes it has not seen yet on its next use, without touching the
+    database. Full builds only happen on a background thread, when the log
+    cannot be followed (or every ``refresh_interval`` seconds), and the new
+    state is swapped in whole while the old one keeps serving.
+    """
+    generation_key = None
+    # Seconds after which the state is rebuilt anyway, None to follow the log only
+    refresh_interval = None
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.state = None
+        self.generation = None
+        self.built_at = 0.0
+        self.ready = threading.Event()
+        self.builder = None
+        self.missing_since = None
+
+    def current_generation(self):
+        return cache.get_or_set(self.generation_key, 0, None)
+
+    def change_key(self, generation):
+        return f'{self.generation_key}:change:{generation}'
+
+    def index(self, type, ids):
+        """(Re)index ``ids`` of ``type``, in this process now and in the others on their next use."""
+        ids = list(ids)
+        for start in range(0, len(ids), CHANGE_CHUNK):
+            chunk = ids[start:start + CHANGE_CHUNK]
+            self.record((type, chunk, list(self.fetch(type, chunk))))
+
+    def remove(self, type, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), CHANGE_CHUNK):
+            self.record((type, ids[start:start + CHANGE_CHUNK], []))
+
+    def record(self, change):
+        try:
+            generation = cache.incr(self.generation_key)
+        except ValueError:
+            generation = 1
+            cache.set(self.generation_key, generation, None)
+        cache.set(self.change_key(generation), change, CHANGE_TIMEOUT)
+        self.sync()
+
+    def sync(self):
+        """Apply the logged changes this copy has not seen, or rebuild it if they are gone."""
+        generation = self.current_generation()
+        if self.state is None or generation == self.generation:
+            return
+        with self.lock:
+            if generation < self.generation or generation - self.generation > MAX_CATCH_UP:
+                # The cache was cleared, or this copy is too far behind to catch up
+                self.build_later()
+                return
+            pending = range(self.generation + 1, generation + 1)
+            changes = cache.get_many([self.change_key(pending_generation) for pending_generation in pending])
+            for pending_generation in pending:
+                change = changes.get(self.change_key(pending_generation))
+                if change is None:
+                    # Evicted, or the process that bumped the generation is still writing it
+                    if self.missing_since is None:
+                        self.missing_since = time.monotonic()
+                    elif time.monotonic() - self.missing_since > CHANGE_WAIT:
+                        self.build_later()
+                    return
+                self.apply(self.state, *change)
+                self.generation = pending_generation
+                self.missing_since = None
+
+    def current(self, wait=True):
+        """
+        The state to read from. The first use starts a build and, with
+        ``wait``, waits for it; otherwise this may be ``None`` while it runs.
+        """
+        if self.state is None:
+            self.build_later()
+            if wait:
+                self.ready.wait()
+                if self.state is None:
+                    raise RuntimeError(f"Building {self.__class__.__name__} failed")
+            return self.state
+        self.sync()
+        if self.refresh_interval is not None and time.monotonic() - self.built_at > self.refresh_interval:
+            self.build_later()
+        return self.state
+
+    def build_later(self):
+        """Start a full build on a background thread unless one is running."""
+        with self.lock:
+            if self.builder is not None and self.builder.is_alive():
+                return
+            self.builder = threading.Thread(
+                target=self.build_in_background, name=f'{self.__class__.__name__}-build', daemon=True
+            )
+            self.builder.start()
+
+    def build_in_background(self):
+        try:
+            self.build_now()
+        except Exception:
+            logger.exception("Failed to build %s", self.__class__.__name__)
+        finally:
+            self.ready.set()
+            close_old_connections()
+
+    def build_now(self):
+        """Build the state from the database, swap it in and return it."""
+        # Read first: changes logged while building are applied again on top, which is harmless
+        generation = self.current_generation()
+        state = self.build()
+        with self.lock:
+            self.state, self.generation = state, generation
+            self.built_at = time.monotonic()
+            self.missing_since = None
+        self.ready.set()
+        self.sync()
+        return state
+
+    def fetch(self, type, ids):
+        """The rows ``apply`` needs to index ``ids`` of ``type``."""
+        raise NotImplementedError
+
+    def apply(self, state, type, ids, rows):
+        """Drop ``ids`` of ``type`` from ``state`` and add ``rows``."""
+        raise NotImplementedError
+
+    def build(self):
+        raise NotImplementedError
+
+
+class MemorySearchBackend(ProcessIndex, SearchBackend):
+    """One ``InvertedIndex`` per type, loaded in the background and kept current through the change log."""
+    generation_key = GENERATION_CACHE_KEY
+
+    def search_ids(self, text, type, limit, offset=0):
+        return self.current()[type].search(text, limit, offset)
+
+    def fetch(self, type, ids):
+        return documents(type, ids)
+
+    def apply(self, state, type, ids, rows):
+        index = state[type]
+        for object_id in ids:
+            index.discard(object_id)
+        for object_id, title, context in rows:
+            index.add(object_id, title, context)
+
+    def build(self):
+        indexes = {type: InvertedIndex() for type in SEARCH_TYPES}
+        for type, index in indexes.items():
+            for object_id, title, context in documents(type):
+                index.add(object_id, title, context)
+        return indexes
+
+    def rebuild(self):
+        return {type: len(index) for type, index in self.build_now().items()}
@@ -0,0 +1,96 @@
+import operator
+from functools import reduce
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery
+from home.search.base import MAX_HIT_COUNT, SEARCH_TYPES, SearchBackend, result_queryset
+from music.models import Album, Song
+from music.stats import id_chunks
+from playlists.models import Playlist
+from users.models import UserProfile
+
+# Weighted source fields of each stored ``search_vector``
+SEARCH_FIELDS = {
+    Song: (('title', 'A'), ('album__title', 'B'), ('album__artist__user_profile__display_name', 'C')),
+    Album: (('title', 'A'), ('artist__user_profile__display_name', 'B')),
+    Playlist: (('name', 'A'), ('user__user_profile__display_name', 'B')),
+    UserProfile: (('display_name', 'A'), ('user__first_name', 'B'), ('user__last_name', 'B')),
+}
+
+TYPE_MODELS = {'songs': Song, 'albums': Album, 'artists': UserProfile, 'playlists': Playlist}
+
+
+def search_vectors_enabled():
+    return connection.vendor == 'postgresql'
+
+
+def search_vector(model):
+    return reduce(operator.add, (SearchVector(field, weight=weight) for field, weight in SEARCH_FIELDS[model]))
+
+
+def update_search_vectors(model, queryset):
+    """Recompute ``search_vector`` for the rows of ``queryset`` in one UPDATE."""
+    if not search_vectors_enabled():
+        return
+    vectors = model.objects.filter(pk=OuterRef('pk')).annotate(vector=search_vector(model)).values('vector')[:1]
+    queryset.update(search_vector=Subquery(vectors))
+
+
+def reindex_search(models=None, chunk_size=1000):
+    """Rebuild the stored vectors of ``models`` (all by default) one chunk per UPDATE. Returns rows per model."""
+    counts = {}
+    for model in models or SEARCH_FIELDS:
+        counts[model.__name__] = 0
+        for ids in id_chunks(model.objects.all(), chunk_size):
+            update_search_vectors(model, model.objects.filter(id__in=ids))
+            counts[model.__name__] += len(ids)
+    return counts
+
+
+def ranked(queryset, query, vector_field='search_vector'):
+    return queryset.filter(**{vector_field: query}).annotate(rank=SearchRank(F(vector_field), query)).order_by('-rank', 'pk')
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    ``SearchRank`` over the stored ``search_vector`` columns. Each type is one
+    GIN index lookup that also loads the results, so ``search`` skips the id step.
+    """
+
+    def searchable(self, type):
+        if type == 'artists':
+            return result_queryset(type).filter(user_profile__role='artists'), 'user_profile__search_vector'
+        if type == 'playlists':
+            return result_queryset(type).filter(privacy='public'), 'search_vector'
+        return result_queryset(type), 'search_vector'
+
+    def page(self, ranked_queryset, limit, offset):
+        page = list(ranked_queryset[offset:offset + limit])
+        if offset == 0 and len(page) < limit:
+            return page, len(page)
+        return page, ranked_queryset.order_by()[:MAX_HIT_COUNT].count()
+
+    def search(self, text, type, limit, offset=0):
+        queryset, vector_field = self.searchable(type)
+        query = SearchQuery(text, search_type='websearch')
+        return self.page(ranked(queryset, query, vector_field), limit, offset)
+
+    def search_ids(self, text, type, limit, offset=0):
+        queryset, vector_field = self.searchable(type)
+        query = SearchQuery(text, search_type='websearch')
+        return self.page(ranked(queryset, query, vector_field).values_list('pk', flat=True), limit, offset)
+
+    def index(self, type, ids):
+        if type == 'artists':
+            update_search_vectors(UserProfile, UserProfile.objects.filter(user_id__in=ids))
+        else:
+            model = TYPE_MODELS[type]
+            update_search_vectors(model, model.objects.filter(id__in=ids))
+
+    def remove(self, type, ids):
+        # Vectors are stored on the rows themselves and go away with them
+        pass
+
+    def rebuild(self):
+        counts = reindex_search()
+        return {type: counts[TYPE_MODELS[type].__name__] for type in SEARCH_TYPES}
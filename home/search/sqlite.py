@@ -0,0 +1,81 @@
+import uuid
+from django.db import connection, transaction
+from home.search.base import FIELD_WEIGHTS, MAX_HIT_COUNT, SEARCH_TYPES, SearchBackend, documents, tokenize
+
+TABLE = 'home_search_index'
+# Ids matched by one DELETE; FTS5 slows down on much longer OR queries
+DELETE_CHUNK = 500
+
+
+def fts5_table_exists():
+    return connection.vendor == 'sqlite' and TABLE in connection.introspection.table_names()
+
+
+def encode_id(object_id):
+    # A bare token, so an id can be matched through the index instead of a table scan
+    return uuid.UUID(str(object_id)).hex
+
+
+def quoted(terms):
+    return ' AND '.join(f'"{term}"' for term in terms)
+
+
+class SqliteSearchBackend(SearchBackend):
+    """
+    An FTS5 table in the SQLite database itself, created by the ``home``
+    migrations, ranked with the built-in ``bm25()`` weighted by ``FIELD_WEIGHTS``.
+    """
+
+    def search_ids(self, text, type, limit, offset=0):
+        terms = tokenize(text)
+        if not terms:
+            return [], 0
+        match = f'{{title context}} : ({quoted(terms)})'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s "
+                f"ORDER BY bm25({TABLE}, 0, 0, %s, %s), rowid LIMIT %s OFFSET %s",
+                [match, type, FIELD_WEIGHTS['title'], FIELD_WEIGHTS['context'], limit, offset],
+            )
+            ids = [uuid.UUID(value) for value, in cursor.fetchall()]
+            if offset == 0 and len(ids) < limit:
+                return ids, len(ids)
+            cursor.execute(
+                f"SELECT count(*) FROM (SELECT 1 FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s LIMIT %s)",
+                [match, type, MAX_HIT_COUNT],
+            )
+            return ids, cursor.fetchone()[0]
+
+    def delete_rows(self, cursor, type, ids):
+        tokens = [f'"{encode_id(object_id)}"' for object_id in ids]
+        for start in range(0, len(tokens), DELETE_CHUNK):
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN "
+                f"(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s)",
+                [f"object_id : ({' OR '.join(tokens[start:start + DELETE_CHUNK])})", type],
+            )
+
+    def insert_rows(self, cursor, type, rows):
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (kind, object_id, title, context) VALUES (%s, %s, %s, %s)",
+            [(type, encode_id(object_id), title, context) for object_id, title, context in rows],
+        )
+
+    def index(self, type, ids):
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.delete_rows(cursor, type, ids)
+            self.insert_rows(cursor, type, documents(type, ids))
+
+    def remove(self, type, ids):
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.delete_rows(cursor, type, ids)
+
+    def rebuild(self):
+        counts = {}
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+            for type in SEARCH_TYPES:
+                rows = list(documents(type))
+                self.insert_rows(cursor, type, rows)
+                counts[type] = len(rows)
+        return counts
@@ -0,0 +1,178 @@
+import bisect
+import heapq
+import math
+import threading
+from django.conf import settings
+from home.search.base import SEARCH_TYPES, tokenize
+from home.search.memory import ProcessIndex
+from music.models import Album, Song
+from playlists.models import Playlist
+from users.models import UserProfile
+
+GENERATION_CACHE_KEY = 'search:suggest:generation'
+MAX_SUGGESTIONS = 20
+# Words of a title a prefix may start at, so "up" finds "Hold Up"
+MAX_KEYS_PER_ITEM = 4
+# Prefixes matching more entries than this are scanned once and memoized
+MAX_SCAN = 1000
+# Score bonus for matching the start of a title rather than a later word
+START_BONUS = 2.0
+
+
+def suggestion_queryset(type):
+    """``(id, title, subtitle, popularity)`` rows of ``type``, most popular first."""
+    if type == 'songs':
+        rows = Song.objects.values_list('id', 'title', 'album__artist__user_profile__display_name', 'plays_count')
+        return rows.order_by('-plays_count')
+    if type == 'albums':
+        rows = Album.objects.values_list('id', 'title', 'artist__user_profile__display_name', 'total_plays')
+        return rows.order_by('-total_plays')
+    if type == 'artists':
+        rows = UserProfile.objects.filter(role='artists').values_list(
+            'user_id', 'display_name', 'user__username', 'follower_count'
+        )
+        return rows.order_by('-follower_count')
+    rows = Playlist.objects.filter(privacy='public').values_list(
+        'id', 'name', 'user__user_profile__display_name', 'user__user_profile__follower_count'
+    )
+    return rows.order_by('-user__user_profile__follower_count')
+
+
+def suggestion_keys(title):
+    terms = tokenize(title)
+    return [' '.join(terms[start:]) for start in range(min(len(terms), MAX_KEYS_PER_ITEM))]
+
+
+class Suggestions:
+    """
+    Titles as one sorted array of ``(key, item)`` searched with ``bisect``,
+    with the best matches of hot prefixes memoized.
+    """
+
+    def __init__(self):
+        self.entries = []
+        # (type, id, title, subtitle, score, first key), or None once removed
+        self.items = []
+        self.refs = {}
+        self.counts = dict.fromkeys(SEARCH_TYPES, 0)
+        self.memo = {}
+
+    def add(self, type, object_id, title, subtitle, popularity, sort=True):
+        keys = suggestion_keys(title)
+        if not keys:
+            return
+        ref = len(self.items)
+        self.items.append((type, object_id, title, subtitle, math.log1p(popularity or 0), keys[0]))
+        self.refs[type, object_id] = ref
+        self.counts[type] += 1
+        for key in keys:
+            if sort:
+                bisect.insort(self.entries, (key, ref))
+                self.forget(key)
+            else:
+                self.entries.append((key, ref))
+
+    def discard(self, type, object_id):
+        ref = self.refs.pop((type, object_id), None)
+        if ref is None:
+            return
+        keys = suggestion_keys(self.items[ref][2])
+        self.items[ref] = None
+        self.counts[type] -= 1
+        for key in keys:
+            index = bisect.bisect_left(self.entries, (key, ref))
+            if index < len(self.entries) and self.entries[index] == (key, ref):
+                del self.entries[index]
+            self.forget(key)
+
+    def forget(self, key):
+        """Drop the memoized suggestions ``key`` could appear in."""
+        for length in range(1, len(key) + 1):
+            self.memo.pop(key[:length], None)
+
+    def scan(self, prefix, limit, max_scan=None):
+        """Best ``limit`` item refs for ``prefix``, and whether every match was seen."""
+        entries, items = self.entries, self.items
+        scores = {}
+        index = bisect.bisect_left(entries, (prefix,))
+        end = len(entries) if max_scan is None else min(len(entries), index + max_scan)
+        while index < end:
+            key, ref = entries[index]
+            if not key.startswith(prefix):
+                break
+            item = items[ref]
+            if item is not None:
+                score = item[4] + START_BONUS if key == item[5] else item[4]
+                if score > scores.get(ref, -1.0):
+                    scores[ref] = score
+            index += 1
+        complete = index >= len(entries) or not entries[index][0].startswith(prefix)
+        return heapq.nlargest(limit, scores, key=scores.get), complete
+
+
+class SuggestIndex(ProcessIndex):
+    """
+    ``Suggestions`` for the titles of the ``SUGGEST_MAX_PER_TYPE`` most
+    popular songs, albums, artists and public playlists. Renames, new rows
+    and deletes arrive through the change log; popularity (plays, or
+    followers for artists and playlist owners) is refreshed by a background
+    rebuild every ``SUGGEST_REFRESH_SECONDS``.
+    """
+    generation_key = GENERATION_CACHE_KEY
+
+    def __init__(self):
+        super().__init__()
+        self.refresh_interval = settings.SUGGEST_REFRESH_SECONDS
+
+    def build(self):
+        suggestions = Suggestions()
+        for type in SEARCH_TYPES:
+            rows = suggestion_queryset(type)[:settings.SUGGEST_MAX_PER_TYPE]
+            for row in rows.iterator(chunk_size=2000):
+                suggestions.add(type, *row, sort=False)
+        suggestions.entries.sort()
+        return suggestions
+
+    def fetch(self, type, ids):
+        return suggestion_queryset(type).filter(**{'user_id__in' if type == 'artists' else 'id__in': ids})
+
+    def apply(self, suggestions, type, ids, rows):
+        present = {object_id for object_id in ids if (type, object_id) in suggestions.refs}
+        for object_id in ids:
+            suggestions.discard(type, object_id)
+        for row in rows:
+            # New rows have no plays yet, so a full index keeps the more popular ones
+            if row[0] in present or suggestions.counts[type] < settings.SUGGEST_MAX_PER_TYPE:
+                suggestions.add(type, *row)
+
+    def suggest(self, text, limit):
+        """
+        ``[(type, id, title, subtitle)]`` whose titles have a word starting
+        with ``text``, best first; nothing until the first build finishes.
+        """
+        prefix = ' '.join(tokenize(text))
+        if not prefix:
+            return []
+        suggestions = self.current(wait=False)
+        if suggestions is None:
+            return []
+        refs = suggestions.memo.get(prefix)
+        if refs is None:
+            refs, complete = suggestions.scan(prefix, MAX_SUGGESTIONS, MAX_SCAN)
+            if not complete:
+                with self.lock:
+                    refs = suggestions.memo[prefix] = suggestions.scan(prefix, MAX_SUGGESTIONS)[0]
+        items = [suggestions.items[ref] for ref in refs[:limit]]
+        return [item[:4] for item in items if item is not None]
+
+
+_suggest_index = None
+_suggest_index_lock = threading.Lock()
+
+
+def suggest_index():
+    global _suggest_index
+    with _suggest_index_lock:
+        if _suggest_index is None:
+            _suggest_index = SuggestIndex()
+        return _suggest_index
@@ -1,5 +1,8 @@
+from django.utils import timezone
 from rest_framework import serializers
 from home.models import RecentlyPlayed
+from home.search.base import MAX_SEARCH_LIMIT, SEARCH_TYPES
+from home.search.suggest import MAX_SUGGESTIONS
 from music.serializers import SongSerializer
 from playlists.serializers import PlaylistSerializer
 
@@ -10,4 +13,27 @@ class RecentlyPlayedSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = RecentlyPlayed
-        fields = ['song', 'playlist', 'played_at']
\ No newline at end of file
+        fields = ['song', 'playlist', 'played_at']
+
+# A day; anything longer is a broken client, and PlayEvent.ms_played is a 32-bit column
+MAX_MS_PLAYED = 24 * 60 * 60 * 1000
+
+class PlayEventSerializer(serializers.Serializer):
+    song = serializers.UUIDField()
+    playlist = serializers.UUIDField(required=False, allow_null=True)
+    played_at = serializers.DateTimeField(required=False)
+    ms_played = serializers.IntegerField(min_value=0, max_value=MAX_MS_PLAYED, default=0)
+
+    def validate_played_at(self, value):
+        # A client clock running ahead would park the event past the rollup watermark
+        return min(value, timezone.now())
+
+class SearchQuerySerializer(serializers.Serializer):
+    query = serializers.CharField(max_length=200)
+    type = serializers.ChoiceField(choices=SEARCH_TYPES, required=False, allow_blank=True)
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_SEARCH_LIMIT, required=False)
+    cursor = serializers.CharField(required=False)
+
+class SuggestQuerySerializer(serializers.Serializer):
+    query = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_SUGGESTIONS, default=10)
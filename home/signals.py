@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from home.search import index_later, remove_later
+from music.models import Album, Song
+from playlists.models import Playlist
+from users.models import UserProfile
+
+User = get_user_model()
+
+# What each model contributes to the search documents; saves that leave these
+# alone, like a song added to a playlist, are not reindexed
+SEARCHED_FIELDS = {
+    Playlist: ('name', 'privacy'),
+    UserProfile: ('display_name', 'role'),
+    User: ('first_name', 'last_name'),
+}
+
+
+@receiver(pre_save, sender=Playlist)
+@receiver(pre_save, sender=UserProfile)
+@receiver(pre_save, sender=User)
+def remember_searched_values(sender, instance, update_fields=None, **kwargs):
+    """Keep the searched values the row had before this save, ``None`` for a new row."""
+    fields = SEARCHED_FIELDS[sender]
+    if instance._state.adding:
+        instance._searched_values = None
+    elif update_fields is not None and not set(fields) & set(update_fields):
+        # Nothing searched is written, so nothing can change
+        instance._searched_values = tuple(getattr(instance, field) for field in fields)
+    else:
+        instance._searched_values = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def searched_values_changed(instance):
+    current = tuple(getattr(instance, field) for field in SEARCHED_FIELDS[type(instance)])
+    return getattr(instance, '_searched_values', None) != current
+
+
+@receiver(post_save, sender=Song)
+def index_song(sender, instance, **kwargs):
+    index_later('songs', [instance.pk])
+
+
+@receiver(post_save, sender=Album)
+def index_album(sender, instance, **kwargs):
+    # Songs are indexed with their album title
+    index_later('albums', [instance.pk])
+    index_later('songs', Song.objects.filter(album=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Playlist)
+def index_playlist(sender, instance, **kwargs):
+    previous = getattr(instance, '_searched_values', None)
+    was_public = previous is not None and previous[1] == 'public'
+    if not searched_values_changed(instance) or (not was_public and instance.privacy != 'public'):
+        return
+    # Also drops playlists that were made private
+    index_later('playlists', [instance.pk])
+
+
+def index_user(user_id):
+    """A user as an artist and everything indexed with their display name."""
+    index_later('artists', [user_id])
+    index_later('albums', Album.objects.filter(artist_id=user_id).values_list('id', flat=True))
+    index_later('songs', Song.objects.filter(album__artist_id=user_id).values_list('id', flat=True))
+    index_later('playlists', Playlist.objects.filter(user_id=user_id, privacy='public').values_list('id', flat=True))
+
+
+@receiver(post_save, sender=UserProfile)
+def index_profile(sender, instance, **kwargs):
+    if searched_values_changed(instance):
+        index_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def index_user_names(sender, instance, **kwargs):
+    if searched_values_changed(instance):
+        index_later('artists', [instance.pk])
+
+
+@receiver(post_delete, sender=Song)
+def remove_song(sender, instance, **kwargs):
+    remove_later('songs', [instance.pk])
+
+
+@receiver(post_delete, sender=Album)
+def remove_album(sender, instance, **kwargs):
+    remove_later('albums', [instance.pk])
+
+
+@receiver(post_delete, sender=Playlist)
+def remove_playlist(sender, instance, **kwargs):
+    remove_later('playlists', [instance.pk])
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_profile(sender, instance, **kwargs):
+    remove_later('artists', [instance.user_id])
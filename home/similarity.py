@@ -0,0 +1,147 @@
+import heapq
+import math
+from collections import defaultdict
+from datetime import timedelta
+from operator import itemgetter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from home.factorization import compressed
+from home.models import PlayEvent, SongNeighbor
+from music.models import LikeSong, UnlikeSong
+
+LIKE_WEIGHT = 2.0
+HISTORY_DAYS = 90
+# Caps the song pairs a single heavy listener contributes
+MAX_SONGS_PER_USER = 500
+TOP_K = 50
+# Partial products (song, listener, co-listened song) scored per block of songs
+PRODUCT_BLOCK = 2_000_000
+
+
+def interaction_matrix(history_days=HISTORY_DAYS):
+    """
+    Sparse ``{user_id: {song_id: weight}}`` of implicit feedback. A like counts
+    ``LIKE_WEIGHT``, plays in the last ``history_days`` add ``log1p(plays)``
+    and a dislike drops the song from that user's row.
+    """
+    users = defaultdict(dict)
+    since = timezone.now() - timedelta(days=history_days)
+    plays = (
+        PlayEvent.objects.filter(played_at__gte=since).order_by()
+        .values_list('user_id', 'song_id').annotate(plays=Count('id'))
+    )
+    for user_id, song_id, count in plays.iterator(chunk_size=10000):
+        users[user_id][song_id] = math.log1p(count)
+    for user_id, song_id in LikeSong.objects.values_list('user_id', 'song_id').iterator(chunk_size=10000):
+        users[user_id][song_id] = users[user_id].get(song_id, 0) + LIKE_WEIGHT
+    for user_id, song_id in UnlikeSong.objects.values_list('user_id', 'song_id').iterator(chunk_size=10000):
+        users[user_id].pop(song_id, None)
+
+    for user_id, songs in users.items():
+        if len(songs) > MAX_SONGS_PER_USER:
+            users[user_id] = dict(heapq.nlargest(MAX_SONGS_PER_USER, songs.items(), key=itemgetter(1)))
+    return users
+
+
+def song_neighbors(users, top_k=TOP_K, block_size=PRODUCT_BLOCK):
+    """
+    Yield ``(song_id, [(neighbor_id, cosine), ...])`` one row of the item-item
+    similarity matrix at a time, keeping the ``top_k`` best neighbours. The
+    interactions are held as CSR matrices by song and by user, and rows are
+    the sparse product of the song columns with the user rows, computed for
+    blocks of songs of about ``block_size`` partial products, so only songs
+    that share a listener are ever scored.
+    """
+    song_index = {}
+    rows, columns, weights = [], [], []
+    for user, songs in enumerate(users.values()):
+        for song_id, weight in songs.items():
+            rows.append(user)
+            columns.append(song_index.setdefault(song_id, len(song_index)))
+            weights.append(weight)
+    if not song_index:
+        return
+    song_ids = list(song_index)
+    rows, columns = np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)
+    weights = np.array(weights, dtype=np.float64)
+    user_indptr, user_songs, user_weights = compressed(rows, columns, weights, len(users))
+    song_indptr, song_users, song_weights = compressed(columns, rows, weights, len(song_ids))
+    norms = np.sqrt(np.bincount(columns, weights=weights * weights, minlength=len(song_ids)))
+
+    # work[song] counts the partial products of the songs before it, to cut them into blocks
+    row_lengths = np.diff(user_indptr)
+    work = np.concatenate(([0], np.cumsum(row_lengths[song_users])))[song_indptr]
+    start = 0
+    while start < len(song_ids):
+        end = max(int(np.searchsorted(work, work[start] + block_size, side='right')) - 1, start + 1)
+        yield from neighbor_rows(
+            (user_indptr, user_songs, user_weights), (song_indptr, song_users, song_weights),
+            norms, start, end, top_k, song_ids,
+        )
+        start = end
+
+
+def neighbor_rows(user_matrix, song_matrix, norms, start, end, top_k, song_ids):
+    """The ``song_neighbors`` rows of songs ``start`` to ``end``."""
+    user_indptr, user_songs, user_weights = user_matrix
+    song_indptr, song_users, song_weights = song_matrix
+    first, last = song_indptr[start], song_indptr[end]
+    listeners = song_users[first:last]
+    # Each (song, listener) entry spreads over the listener's row of songs
+    counts = user_indptr[listeners + 1] - user_indptr[listeners]
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = np.repeat(user_indptr[listeners], counts) + offsets
+    songs = np.repeat(np.repeat(np.arange(start, end), np.diff(song_indptr[start:end + 1])), counts)
+    others = user_songs[positions]
+    products = np.repeat(song_weights[first:last], counts) * user_weights[positions]
+
+    keep = songs != others
+    keys, inverse = np.unique(songs[keep] * len(song_ids) + others[keep], return_inverse=True)
+    dots = np.bincount(inverse.ravel(), weights=products[keep])
+    songs, others = np.divmod(keys, len(song_ids))
+    scores = dots / (norms[songs] * norms[others])
+
+    bounds = np.searchsorted(songs, np.arange(start, end + 1))
+    for song in range(start, end):
+        low, high = bounds[song - start], bounds[song - start + 1]
+        if low == high:
+            continue
+        row_scores = scores[low:high]
+        best = np.argsort(-row_scores, kind='stable')[:top_k]
+        neighbors = zip(others[low:high][best].tolist(), row_scores[best].tolist())
+        yield song_ids[song], [(song_ids[other], score) for other, score in neighbors]
+
+
+def build_song_similarity(top_k=TOP_K, history_days=HISTORY_DAYS, batch_size=1000):
+    """
+    Replace every ``SongNeighbor`` row. The neighbours are all computed first,
+    so the transaction that swaps the rows only deletes and inserts and
+    readers never wait on the scoring. Returns ``(songs, rows)`` written.
+    """
+    users = interaction_matrix(history_days)
+    rows = []
+    songs = 0
+    for song_id, neighbors in song_neighbors(users, top_k):
+        rows.extend((song_id, neighbor_id, score) for neighbor_id, score in neighbors)
+        songs += 1
+
+    with transaction.atomic():
+        SongNeighbor.objects.all().delete()
+        for start in range(0, len(rows), batch_size):
+            SongNeighbor.objects.bulk_create([
+                SongNeighbor(song_id=song_id, neighbor_id=neighbor_id, score=score)
+                for song_id, neighbor_id, score in rows[start:start + batch_size]
+            ])
+    return songs, len(rows)
+
+
+def similar_songs(seed_ids, exclude_ids=(), limit=6):
+    """Ids of the songs whose summed neighbour scores over ``seed_ids`` are highest, skipping ``exclude_ids``."""
+    scores = defaultdict(float)
+    for neighbor_id, score in SongNeighbor.objects.filter(song_id__in=seed_ids).values_list('neighbor_id', 'score'):
+        scores[neighbor_id] += score
+    exclude_ids = set(exclude_ids)
+    return heapq.nlargest(limit, (song_id for song_id in scores if song_id not in exclude_ids), key=scores.get)
@@ -1,3 +1,633 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from home import factorization
+from home.explore import SNAPSHOT_CACHE_KEY, build_explore_snapshot, current_explore_snapshot, global_sections
+from home.models import ArtistPlayRollup, PlayEvent, RecentlyPlayed, SongNeighbor, SongPlayRollup
+from home.recent import WINDOW, RecentlyPlayedBuffer, write_windows
+from home.rollups import rollup_play_events
+from home.search import SEARCH_TYPES, cache as search_cache
+from home.search.cache import catalog_generation, single_flight
+from home.search.memory import MemorySearchBackend
+from home.search.postgres import PostgresSearchBackend
+from home.search.sqlite import SqliteSearchBackend
+from home.search.suggest import SuggestIndex
+from home.serializers import MAX_MS_PLAYED
+from home.similarity import build_song_similarity, song_neighbors
+from home.utils import search
+from music.models import Album, LikeSong, Song
+from playlists.models import Playlist
+from playlists.utils import add_or_remove_song_to_playlist
+from spotify_clone.images import image_version
+from spotify_clone.serializers import ImageDerivativesField
+from users.models import UserProfile
+
+User = get_user_model()
+
+
+def create_song(title, album=None, **fields):
+    return Song.objects.create(
+        title=title, album=album, duration=timedelta(minutes=3), audio_file=f'songs/audios/{title}.mp3', **fields
+    )
+
+
+@override_settings(PLAY_ROLLUP_LAG=120)
+class RollupPlayEventsTests(TestCase):
+    def setUp(self):
+        self.listener = User.objects.create(username='listener')
+        self.artist = User.objects.create(username='artist')
+        album = Album.objects.create(
+            title='Album', artist=self.artist, description='', release_date=timezone.localdate()
+        )
+        self.song = create_song('Song', album)
+        self.now = timezone.now()
+
+    def play(self, recorded_ago, **fields):
+        fields.setdefault('played_at', self.now - timedelta(hours=3))
+        return PlayEvent.objects.create(
+            user=self.listener, song=self.song, recorded_at=self.now - recorded_ago, ms_played=1000, **fields
+        )
+
+    def rollup(self, now=None):
+        with mock.patch('home.rollups.timezone.now', return_value=now or self.now):
+            return rollup_play_events()
+
+    def test_folds_events_into_song_and_artist_buckets(self):
+        self.play(timedelta(minutes=10))
+        self.play(timedelta(minutes=20))
+
+        self.assertEqual(self.rollup(), 2)
+
+        for granularity in ('hour', 'day'):
+            song_rollup = SongPlayRollup.objects.get(song=self.song, granularity=granularity)
+            artist_rollup = ArtistPlayRollup.objects.get(artist=self.artist, granularity=granularity)
+            self.assertEqual((song_rollup.plays, song_rollup.ms_played), (2, 2000))
+            self.assertEqual((artist_rollup.plays, artist_rollup.ms_played), (2, 2000))
+        self.assertEqual(self.rollup(), 0)
+
+    def test_events_committed_out_of_id_order_are_not_skipped(self):
+        self.play(timedelta(minutes=10), id=100)
+        self.assertEqual(self.rollup(), 1)
+
+        # A slower flusher commits an earlier id after the rollup ran
+        self.play(timedelta(seconds=30), id=50)
+        self.assertEqual(self.rollup(), 0)
+        self.assertEqual(self.rollup(self.now + timedelta(minutes=5)), 1)
+
+        self.assertEqual(SongPlayRollup.objects.get(song=self.song, granularity='day').plays, 2)
+
+    def test_late_client_timestamps_land_in_their_own_bucket(self):
+        self.play(timedelta(minutes=10), played_at=self.now - timedelta(days=3))
+
+        self.assertEqual(self.rollup(), 1)
+
+        rollup = SongPlayRollup.objects.get(song=self.song, granularity='day')
+        self.assertEqual(rollup.bucket.date(), (self.now - timedelta(days=3)).date())
+
+
+class PlayEventsAPITests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='listener'))
+        self.song = create_song('Song')
+
+    def test_rejects_ms_played_past_the_limit(self):
+        response = self.client.post(
+            reverse('play_events'), [{'song': str(self.song.id), 'ms_played': 2 ** 40}], format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            reverse('play_events'), [{'song': str(self.song.id), 'ms_played': MAX_MS_PLAYED + 1}], format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_plays_of_unknown_songs_are_not_counted(self):
+        with mock.patch('home.views.register_play') as register_play:
+            response = self.client.post(
+                reverse('play_events'), [{'song': str(uuid.uuid4())}, {'song': str(self.song.id)}], format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['message'], '1 plays recorded.')
+        self.assertEqual([call.args[0] for call in register_play.call_args_list], [self.song.id])
+
+    def test_future_played_at_is_clamped_to_now(self):
+        future = timezone.now() + timedelta(days=365)
+        with mock.patch('home.views.register_play') as register_play:
+            self.client.post(
+                reverse('play_events'), [{'song': str(self.song.id), 'played_at': future.isoformat()}], format='json'
+            )
+        self.assertLessEqual(register_play.call_args.kwargs['played_at'], timezone.now())
+
+
+class SearchIndexSignalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.profile = UserProfile.objects.create(user=self.user, role='users', display_name='Owner')
+        self.song = create_song('Song')
+        self.playlist = Playlist.objects.create(user=self.user, name='Road trip')
+
+    def indexed_playlists(self, change):
+        with mock.patch('home.signals.index_later') as index_later:
+            change()
+        return [ids for type, ids in (call.args for call in index_later.call_args_list) if type == 'playlists']
+
+    def test_adding_songs_does_not_reindex(self):
+        indexed = self.indexed_playlists(
+            lambda: add_or_remove_song_to_playlist(self.user, self.playlist.id, self.song.id)
+        )
+        self.assertEqual(indexed, [])
+
+    def test_renaming_a_public_playlist_reindexes(self):
+        def rename():
+            self.playlist.name = 'Night drive'
+            self.playlist.save()
+        self.assertEqual(self.indexed_playlists(rename), [[self.playlist.pk]])
+
+    def test_making_a_playlist_private_reindexes(self):
+        def hide():
+            self.playlist.privacy = 'private'
+            self.playlist.save()
+        self.assertEqual(self.indexed_playlists(hide), [[self.playlist.pk]])
+
+    def test_private_playlists_are_not_reindexed(self):
+        self.playlist.privacy = 'private'
+        self.playlist.save()
+
+        def rename():
+            self.playlist.name = 'Secret'
+            self.playlist.save()
+        self.assertEqual(self.indexed_playlists(rename), [])
+        self.assertEqual(self.indexed_playlists(
+            lambda: Playlist.objects.create(user=self.user, name='Hidden', privacy='private')
+        ), [])
+
+    def test_profile_saves_reindex_only_on_display_name_changes(self):
+        def edit_bio():
+            self.profile.bio = 'Hello'
+            self.profile.save()
+        self.assertEqual(self.indexed_playlists(edit_bio), [])
+
+        def rename():
+            self.profile.display_name = 'New name'
+            self.profile.save()
+        self.assertEqual([list(ids) for ids in self.indexed_playlists(rename)], [[self.playlist.pk]])
+
+
+class ProcessIndexTests(TestCase):
+    """Two instances stand in for two processes sharing the cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.song = create_song('Hold Up')
+
+    def titles(self, index, text):
+        return [title for _, _, title, _ in index.suggest(text, 10)]
+
+    def test_first_use_builds_in_the_background(self):
+        index = SuggestIndex()
+        with mock.patch.object(SuggestIndex, 'build_later') as build_later:
+            self.assertEqual(index.suggest('hold', 10), [])
+        build_later.assert_called_once_with()
+
+    def test_changes_reach_other_processes_without_a_rebuild(self):
+        first, second = SuggestIndex(), SuggestIndex()
+        first.build_now()
+        second.build_now()
+
+        holiday = create_song('Holiday')
+        with mock.patch.object(SuggestIndex, 'build', side_effect=AssertionError("rebuilt")):
+            first.index('songs', [holiday.id])
+            self.assertEqual(self.titles(second, 'hol'), ['Hold Up', 'Holiday'])
+
+            first.remove('songs', [self.song.id])
+            self.assertEqual(self.titles(second, 'hol'), ['Holiday'])
+
+    def test_lost_changes_rebuild_in_the_background(self):
+        index = SuggestIndex()
+        index.build_now()
+        # Another process bumped the generation and its change was evicted
+        cache.delete(index.change_key(cache.incr(index.generation_key)))
+
+        with mock.patch('home.search.memory.CHANGE_WAIT', 0), \
+                mock.patch.object(SuggestIndex, 'build_later') as build_later:
+            self.assertEqual(self.titles(index, 'hold'), ['Hold Up'])
+            self.assertEqual(self.titles(index, 'hold'), ['Hold Up'])
+        build_later.assert_called_once_with()
+
+    def test_memory_backend_follows_the_change_log(self):
+        first, second = MemorySearchBackend(), MemorySearchBackend()
+        first.build_now()
+        second.build_now()
+        hold_on = create_song('Hold On')
+
+        with mock.patch.object(MemorySearchBackend, 'build', side_effect=AssertionError("rebuilt")):
+            first.index('songs', [hold_on.id])
+            ids, hits = second.search_ids('hold', 'songs', 10)
+        self.assertEqual(set(ids), {self.song.id, hold_on.id})
+        self.assertEqual(hits, 2)
+
+    def test_memory_backend_applies_logged_removals(self):
+        first, second = MemorySearchBackend(), MemorySearchBackend()
+        first.build_now()
+        second.build_now()
+
+        with mock.patch.object(MemorySearchBackend, 'build', side_effect=AssertionError("rebuilt")):
+            first.remove('songs', [self.song.id])
+            self.assertEqual(second.search_ids('hold', 'songs', 10), ([], 0))
+
+
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.song = create_song('Hold Up')
+
+    def test_concurrent_misses_share_one_computation(self):
+        started, release = threading.Event(), threading.Event()
+        waiting = threading.Semaphore(0)
+        calls = []
+
+        class WaitingFuture(search_cache.Future):
+            def result(self, timeout=None):
+                waiting.release()
+                return super().result(timeout)
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(single_flight('key', compute))) for _ in range(4)]
+        with mock.patch.object(search_cache, 'Future', WaitingFuture):
+            threads[0].start()
+            started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            for _ in threads[1:]:
+                self.assertTrue(waiting.acquire(timeout=5))
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(cache.get('key'), 'value')
+
+    def test_song_saves_retire_cached_results(self):
+        generation = catalog_generation()
+        self.assertEqual(search('hold', ['songs'], 10)['songs']['count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_song('Hold On')
+
+        self.assertGreater(catalog_generation(), generation)
+        self.assertEqual(search('hold', ['songs'], 10)['songs']['count'], 2)
+
+
+class SearchFanOutTests(TransactionTestCase):
+    """Committed rows, so the search pool's own connections can see them."""
+
+    def setUp(self):
+        cache.clear()
+        artist = User.objects.create(username='artist')
+        UserProfile.objects.create(user=artist, role='artists', display_name='Hold Steady')
+        album = Album.objects.create(title='Hold Tight', artist=artist, release_date=timezone.now().date())
+        create_song('Hold Up', album=album)
+        Playlist.objects.create(user=artist, name='Hold music')
+
+    def test_threaded_search_matches_the_serial_path(self):
+        with override_settings(SEARCH_WORKERS=0):
+            serial = search('hold', SEARCH_TYPES, 10)
+        cache.clear()
+
+        with mock.patch('home.utils.close_old_connections', wraps=close_old_connections) as close:
+            threaded = search('hold', SEARCH_TYPES, 10)
+
+        self.assertEqual(threaded, serial)
+        self.assertEqual({type: section['count'] for type, section in threaded.items()},
+                         {type: 1 for type in SEARCH_TYPES})
+        self.assertEqual(close.call_count, len(SEARCH_TYPES))
+
+
+@skipUnless(connection.vendor == 'sqlite', "needs the SQLite FTS5 table")
+class SqliteSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.backend = SqliteSearchBackend()
+        self.artist = User.objects.create(username='artist')
+        album = Album.objects.create(title='Midnight', artist=self.artist, release_date=timezone.now().date())
+        self.on_album = create_song('Daybreak', album=album)
+        self.titled = create_song('Midnight Train')
+        self.other = create_song('Midnight Blue')
+        self.backend.rebuild()
+
+    def song_ids(self, text):
+        ids, _ = self.backend.search_ids(text, 'songs', 10)
+        return ids
+
+    def test_title_matches_outrank_context_matches(self):
+        self.assertEqual(self.song_ids('midnight')[-1], self.on_album.id)
+        self.assertEqual(self.song_ids('midnight train'), [self.titled.id])
+
+    def test_removed_songs_drop_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.titled.delete()
+        self.backend.remove('songs', [self.other.id, self.on_album.id])
+
+        self.assertEqual(self.song_ids('midnight'), [])
+
+    def test_reindexing_replaces_the_old_row(self):
+        Song.objects.filter(id=self.titled.id).update(title='Evening Train')
+        self.backend.index('songs', [self.titled.id])
+
+        self.assertEqual(self.song_ids('train'), [self.titled.id])
+        self.assertNotIn(self.titled.id, self.song_ids('midnight'))
+
+
+@skipUnless(connection.vendor == 'postgresql', "needs PostgreSQL full-text search")
+class PostgresSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.backend = PostgresSearchBackend()
+        self.artist = User.objects.create(username='artist')
+        UserProfile.objects.create(user=self.artist, role='artists', display_name='Artist')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.album = Album.objects.create(title='Midnight', artist=self.artist, release_date=timezone.now().date())
+            self.on_album = create_song('Daybreak', album=self.album)
+            self.titled = create_song('Midnight Train')
+
+    def song_ids(self, text):
+        ids, _ = self.backend.search_ids(text, 'songs', 10)
+        return list(ids)
+
+    def test_title_matches_outrank_album_matches(self):
+        self.assertEqual(self.song_ids('midnight'), [self.titled.id, self.on_album.id])
+
+    def test_saves_update_the_stored_vectors(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.titled.title = 'Evening Train'
+            self.titled.save()
+            self.album.title = 'Sunrise'
+            self.album.save()
+
+        self.assertEqual(self.song_ids('midnight'), [])
+        self.assertEqual(self.song_ids('evening'), [self.titled.id])
+        self.assertEqual(self.song_ids('sunrise'), [self.on_album.id])
+
+
+class FactorModelTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'model.als')
+
+    def test_recommends_best_scores_first_without_excluded_songs(self):
+        user_ids = sorted((uuid.uuid4() for _ in range(2)), key=lambda user_id: user_id.bytes)
+        song_ids = sorted((uuid.uuid4() for _ in range(5)), key=lambda song_id: song_id.bytes)
+        user_factors = [[1.0, 0.0], [0.0, 1.0]]
+        song_factors = [[0.1, 0.0], [0.5, 0.0], [0.3, 0.0], [0.9, 0.0], [0.0, 1.0]]
+        factorization.write_model(self.path, user_ids, user_factors, song_ids, song_factors)
+        model = factorization.FactorModel(self.path)
+
+        self.assertEqual(model.recommend(user_ids[0], limit=3), [song_ids[3], song_ids[1], song_ids[2]])
+        self.assertEqual(model.recommend(user_ids[0], [song_ids[3]], limit=2), [song_ids[1], song_ids[2]])
+        self.assertEqual(model.recommend(uuid.uuid4()), [])
+
+    def test_training_ranks_songs_of_similar_listeners_first(self):
+        songs = [uuid.uuid4() for _ in range(6)]
+        interactions = {uuid.uuid4(): {song_id: 1.0 for song_id in songs[:3]} for _ in range(10)}
+        interactions.update({uuid.uuid4(): {song_id: 1.0 for song_id in songs[3:]} for _ in range(10)})
+        listener = uuid.uuid4()
+        interactions[listener] = {songs[0]: 1.0, songs[1]: 1.0}
+
+        factorization.write_model(self.path, *factorization.train_als(interactions, factors=4))
+
+        model = factorization.FactorModel(self.path)
+        self.assertEqual(model.recommend(listener, [songs[0], songs[1]], limit=1), [songs[2]])
+
+
+class ExploreSectionsTests(TestCase):
+    def setUp(self):
+        today = timezone.localdate()
+        self.classic_artist = User.objects.create(username='classic')
+        self.new_artist = User.objects.create(username='new')
+        # All-time favourite nobody played this month
+        self.classic = Album.objects.create(title='Classic', artist=self.classic_artist, description='', release_date=today)
+        Album.objects.filter(id=self.classic.id).update(total_plays=10 ** 6, total_likes=10 ** 4)
+        self.recent = Album.objects.create(title='Recent', artist=self.new_artist, description='', release_date=today)
+        song = create_song('Single', self.recent)
+        bucket = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        SongPlayRollup.objects.create(song=song, granularity='day', bucket=bucket, plays=5)
+        ArtistPlayRollup.objects.create(artist=self.new_artist, granularity='day', bucket=bucket, plays=5)
+        ArtistPlayRollup.objects.create(
+            artist=self.classic_artist, granularity='day', bucket=bucket - timedelta(days=90), plays=10 ** 6
+        )
+
+    def test_popular_and_featured_rank_on_the_last_30_days(self):
+        sections = global_sections()
+
+        self.assertEqual([album['title'] for album in sections['popular_albums']['items']], ['Recent'])
+        self.assertEqual([artist['id'] for artist in sections['popular_artists']['items']], [str(self.new_artist.id)])
+        self.assertEqual(sections['featured_album']['details']['title'], 'Recent')
+
+    def test_featured_album_is_the_most_liked_of_those_played(self):
+        liked = Album.objects.create(title='Liked', artist=self.new_artist, description='', release_date=timezone.localdate())
+        song = create_song('Loved', liked, likes=3)
+        bucket = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        SongPlayRollup.objects.create(song=song, granularity='day', bucket=bucket, plays=1)
+
+        self.assertEqual(global_sections()['featured_album']['details']['title'], 'Liked')
+
+
+@override_settings(EXPLORE_SNAPSHOT_MAX_AGE=60)
+class ExploreSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.snapshot = build_explore_snapshot()
+
+    def test_fresh_snapshot_is_served_as_is(self):
+        with mock.patch('home.explore.threading.Thread') as thread:
+            self.assertEqual(current_explore_snapshot()['version'], self.snapshot.id)
+        thread.assert_not_called()
+
+    def test_stale_snapshot_is_served_while_one_refresh_runs(self):
+        payload = cache.get(SNAPSHOT_CACHE_KEY)
+        payload['created_at'] -= timedelta(minutes=5)
+        cache.set(SNAPSHOT_CACHE_KEY, payload, None)
+
+        with mock.patch('home.explore.threading.Thread') as thread:
+            self.assertEqual(current_explore_snapshot()['version'], self.snapshot.id)
+            self.assertEqual(current_explore_snapshot()['version'], self.snapshot.id)
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once_with()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            thread.call_args.kwargs['target']()
+        self.assertGreater(current_explore_snapshot()['version'], self.snapshot.id)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        os.makedirs(os.path.join(media.name, 'album_covers'))
+        self.media = media.name
+
+    def upload(self, name, data, mtime=None):
+        path = os.path.join(self.media, 'album_covers', name)
+        with open(path, 'wb') as file:
+            file.write(data)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return self.url(f'album_covers/{name}', image_version(default_storage, f'album_covers/{name}'))
+
+    def url(self, name, version):
+        return reverse('image-derivative', kwargs={
+            'size': 64, 'image_format': 'webp', 'version': version, 'name': name,
+        })
+
+    def jpeg(self, size=(200, 200)):
+        output = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(output, 'JPEG')
+        return output.getvalue()
+
+    def test_renders_a_derivative(self):
+        response = self.client.get(self.upload('cover.jpg', self.jpeg()))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_replaced_originals_get_new_urls(self):
+        old = self.upload('cover.jpg', self.jpeg(), mtime=1_000_000)
+        new = self.upload('cover.jpg', self.jpeg((300, 200)), mtime=2_000_000)
+        self.assertNotEqual(old, new)
+
+        response = self.client.get(old)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], new)
+
+    def test_serialized_urls_carry_the_version(self):
+        self.upload('cover.jpg', self.jpeg())
+        cover = Album(cover_image='album_covers/cover.jpg').cover_image
+        urls = ImageDerivativesField().to_representation(cover)
+        self.assertEqual(urls['64']['webp'], self.url(cover.name, image_version(default_storage, cover.name)))
+
+        missing = Album(cover_image='album_covers/gone.jpg').cover_image
+        self.assertIsNone(ImageDerivativesField().to_representation(missing))
+
+    def test_truncated_image_is_rejected(self):
+        response = self.client.get(self.upload('truncated.jpg', self.jpeg()[:400]))
+        self.assertEqual(response.status_code, 400)
+
+    def test_image_over_the_pixel_limit_is_rejected(self):
+        url = self.upload('huge.jpg', self.jpeg())
+        pillow_limit = Image.MAX_IMAGE_PIXELS
+        with override_settings(IMAGE_MAX_PIXELS=100 * 100):
+            self.assertEqual(self.client.get(url).status_code, 400)
+        # Far above the limit Pillow refuses to open it at all
+        with override_settings(IMAGE_MAX_PIXELS=50 * 50):
+            self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(Image.MAX_IMAGE_PIXELS, pillow_limit)
+
+    def test_not_an_image_is_not_found(self):
+        self.assertEqual(self.client.get(self.upload('notes.jpg', b'not an image')).status_code, 404)
+        self.assertEqual(self.client.get(self.url('album_covers/missing.jpg', '0' * 16)).status_code, 404)
+
+
+class SongSimilarityTests(TestCase):
+    def test_scores_before_replacing_rows(self):
+        songs = [create_song(f'Song {number}') for number in range(3)]
+        for number in range(2):
+            listener = User.objects.create(username=f'listener{number}')
+            LikeSong.objects.bulk_create([LikeSong(user=listener, song=song) for song in songs[:2]])
+        stale = SongNeighbor.objects.create(song=songs[0], neighbor=songs[2], score=1.0)
+
+        def neighbors(users, top_k):
+            # Nothing is deleted until every neighbour is known
+            self.assertTrue(SongNeighbor.objects.filter(pk=stale.pk).exists())
+            yield from song_neighbors(users, top_k)
+
+        with mock.patch('home.similarity.song_neighbors', side_effect=neighbors), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(build_song_similarity(batch_size=1), (2, 2))
+
+        self.assertEqual(
+            set(SongNeighbor.objects.values_list('song', 'neighbor')),
+            {(songs[0].id, songs[1].id), (songs[1].id, songs[0].id)},
+        )
+
+    def test_neighbours_are_cosines_over_shared_listeners(self):
+        users = {'a': {'one': 1.0, 'two': 1.0}, 'b': {'one': 2.0, 'three': 2.0}, 'c': {'four': 1.0}}
+        # One song per block and one for all of them score the same
+        for block_size in (1, 1000):
+            neighbors = {
+                song: [(other, round(score, 6)) for other, score in row]
+                for song, row in song_neighbors(users, top_k=5, block_size=block_size)
+            }
+            self.assertEqual(neighbors, {
+                'one': [('three', round(2 / 5 ** 0.5, 6)), ('two', round(1 / 5 ** 0.5, 6))],
+                'two': [('one', round(1 / 5 ** 0.5, 6))],
+                'three': [('one', round(2 / 5 ** 0.5, 6))],
+            })
+        self.assertEqual([song for song, _ in song_neighbors(users, top_k=1)], ['one', 'two', 'three'])
+        self.assertEqual(dict(song_neighbors(users, top_k=1))['one'][0][0], 'three')
+
+
+class RecentlyPlayedFlushTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='listener')
+        self.songs = [create_song(f'Song {number}') for number in range(WINDOW + 2)]
+        self.now = timezone.now()
+
+    def entry(self, number, minutes_ago):
+        return ('song', str(self.songs[number].id), self.now - timedelta(minutes=minutes_ago))
+
+    def window(self):
+        rows = RecentlyPlayed.objects.filter(user=self.user).order_by('-played_at')
+        return [self.songs.index(row.song) for row in rows]
+
+    def test_a_partial_window_keeps_older_rows(self):
+        write_windows({self.user.id: [self.entry(number, 10 + number) for number in range(3)]})
+        # Another process, or a cache that lost slots, only knows of one play
+        write_windows({self.user.id: [self.entry(3, 1)]})
+
+        self.assertEqual(self.window(), [3, 0, 1, 2])
+
+    def test_replays_move_up_and_the_oldest_fall_out(self):
+        write_windows({self.user.id: [self.entry(number, 10 + number) for number in range(WINDOW)]})
+        write_windows({self.user.id: [self.entry(WINDOW - 1, 2), self.entry(WINDOW, 1), self.entry(0, 30)]})
+
+        self.assertEqual(self.window(), [WINDOW, WINDOW - 1, *range(WINDOW - 2)])
+        self.assertEqual(RecentlyPlayed.objects.filter(song=self.songs[WINDOW - 1]).count(), 1)
+
+    def test_flush_after_eviction_does_not_drop_rows(self):
+        buffer = RecentlyPlayedBuffer(60)
+        buffer._pid = os.getpid()
+        for number in range(3):
+            buffer.add(self.user.id, 'song', self.songs[number].id, self.now - timedelta(minutes=10 - number))
+        buffer.flush()
+        cache.delete_many(buffer.slot_keys(self.user.id))
+        buffer.add(self.user.id, 'song', self.songs[3].id, self.now)
+
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(self.window(), [3, 2, 1, 0])
@@ -1,8 +1,13 @@
 from django.urls import path
-from home.views import SearchAPI, ExplorePageAPI, RecentlyPlayedAPIView
+from home.views import SearchAPI, SearchSuggestAPI, ExplorePageAPI, RecentlyPlayedAPIView, PlayEventsAPIView, \
+    ImageDerivativeAPIView
 
 urlpatterns = [
     path('recently_played/', RecentlyPlayedAPIView.as_view(), name='recently_played'),
+    path('play_events/', PlayEventsAPIView.as_view(), name='play_events'),
     path('search/', SearchAPI.as_view(), name='search'),
-    path('explore/', ExplorePageAPI.as_view(), name='recommendations')
+    path('search/suggest/', SearchSuggestAPI.as_view(), name='search-suggest'),
+    path('explore/', ExplorePageAPI.as_view(), name='recommendations'),
+    path('images/<int:size>/<str:image_format>/<str:version>/<path:name>', ImageDerivativeAPIView.as_view(),
+         name='image-derivative'),
 ]
\ No newline at end of file
@@ -1,124 +1,115 @@
-from datetime import timedelta
-from django.contrib.auth import get_user_model
-from django.db.models import Count,F, Sum
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count
 from django.utils import timezone
 from rest_framework.response import Response
-from home.models import RecentlyPlayed
-from music.models import Song, Album, LikeSong, UnlikeSong, Genre
-from music.serializers import SongSerializer, AlbumResponseSerializer, AlbumSerializer
+from home.explore import RECOMMENDED_TODAY_CANDIDATES, current_explore_snapshot, order_by_ids, \
+    recommended_today_songs
+from home.factorization import recommend_songs
+from home.recent import recently_played_buffer, recently_played_entries
+from home.search import encode_cursor, search_catalog
+from home.search.cache import catalog_generation, result_cache_key, single_flight
+from home.similarity import similar_songs
+from music.models import Song, LikeSong, UnlikeSong, Genre
+from music.serializers import SongSerializer, AlbumResponseSerializer
 from playlists.models import Playlist
 from playlists.serializers import PlaylistSerializer
 from users.serializers import UserResponseSerializer
-from django.contrib.postgres.search import SearchVector
 
-User = get_user_model()
+# Latest likes whose neighbours feed "Made for you"
+SIMILARITY_SEEDS = 50
 
+_search_executor = None
+_search_executor_pid = None
+_search_executor_lock = threading.Lock()
 
-def add_to_recently_played(user, song=None, playlist=None):
-
-    if RecentlyPlayed.objects.filter(user=user).count() >= 6:
-        oldest = RecentlyPlayed.objects.filter(user=user).order_by('played_at').first()
-        if oldest:
-            oldest.delete()
 
+def add_to_recently_played(user, song=None, playlist=None):
     if song:
-        RecentlyPlayed.objects.update_or_create(
-            user=user,
-            song=song,
-            defaults={'played_at': timezone.now()}
-        )
+        recently_played_buffer.add(user.id, 'song', song.id)
     elif playlist:
-        RecentlyPlayed.objects.update_or_create(
-            user=user,
-            playlist=playlist,
-            defaults={'played_at': timezone.now()}
-        )
-
-
-
-def search(query, type):
-    results = {}
-
-    # SONGS
-    if not type or type == 'songs':
-        songs = (
-            Song.objects
-                .annotate(
-                    search=SearchVector(
-                        'title',
-                        'album__title',
-                        'album__artist__user_profile__display_name',
-                    )
-                )
-                .filter(search=query)
-                .select_related('album', 'album__artist', 'album__artist__user_profile')
-                .prefetch_related('genre', 'featured_artists__user_profile')
-        )
-        results['songs'] = SongSerializer(songs, many=True).data
-
-    # ALBUMS
-    if not type or type == 'albums':
-        albums = (
-            Album.objects
-                .annotate(
-                    search=SearchVector(
-                        'title',
-                        'artist__user_profile__display_name',
-                    )
-                )
-                .filter(search=query)
-                .select_related('artist__user_profile')
-                .prefetch_related('songs')
-        )
-        results['albums'] = AlbumResponseSerializer(albums, many=True).data
-
-    # ARTISTS
-    if not type or type == 'artists':
-        artists = (
-            User.objects
-                .filter(user_profile__role='artists')
-                .annotate(
-                    search=SearchVector(
-                        'first_name',
-                        'last_name',
-                        'user_profile__display_name',
-                    )
-                )
-                .filter(search=query)
-                .distinct()
-                .select_related('user_profile')
-        )
-        results['artists'] = UserResponseSerializer(artists, many=True).data
-
-    # PLAYLISTS
-    if not type or type == 'playlists':
-        playlists = (
-            Playlist.objects
-                .annotate(
-                    search=SearchVector(
-                        'name',
-                        'user__user_profile__display_name',
-                    )
-                )
-                .filter(search=query, privacy='public')
-                .select_related('user__user_profile')
-                .prefetch_related('songs')
-        )
-        results['playlists'] = PlaylistSerializer(playlists, many=True).data
-
-    return Response(results)
+        recently_played_buffer.add(user.id, 'playlist', playlist.id)
+
+
+SEARCH_SERIALIZERS = {
+    'songs': SongSerializer,
+    'albums': AlbumResponseSerializer,
+    'artists': UserResponseSerializer,
+    'playlists': PlaylistSerializer,
+}
+
+
+def search_executor():
+    global _search_executor, _search_executor_pid
+    with _search_executor_lock:
+        if _search_executor_pid != os.getpid():
+            _search_executor = ThreadPoolExecutor(max_workers=settings.SEARCH_WORKERS, thread_name_prefix='search')
+            _search_executor_pid = os.getpid()
+        return _search_executor
+
+
+def search_section(query, type, limit, offset):
+    objects, hits = search_catalog(query, type, limit, offset)
+    next_offset = offset + len(objects)
+    return {
+        'count': hits,
+        'next': encode_cursor(type, next_offset) if objects and next_offset < hits else None,
+        'results': SEARCH_SERIALIZERS[type](objects, many=True).data,
+    }
+
+
+def cached_search_section(key, query, type, limit, offset):
+    return single_flight(key, lambda: search_section(query, type, limit, offset))
+
+
+def run_search_section(*args):
+    try:
+        return cached_search_section(*args)
+    finally:
+        close_old_connections()
+
+
+def search(query, types, limit, offset=0):
+    """
+    One page of ``limit`` results per type with its hit count and the cursor
+    of the next page. Sections are cached per normalized query until the
+    catalog generation changes. Missing types are searched and serialized
+    concurrently on the search pool, each on its own connection, so the page
+    costs about as much as its slowest type.
+    """
+    generation = catalog_generation()
+    keys = {type: result_cache_key(generation, query, type, limit, offset) for type in types}
+    cached = cache.get_many(list(keys.values()))
+    sections = {type: cached[key] for type, key in keys.items() if key in cached}
+    missing = [type for type in types if type not in sections]
+
+    if len(missing) == 1 or not settings.SEARCH_WORKERS:
+        sections.update({type: cached_search_section(keys[type], query, type, limit, offset) for type in missing})
+    else:
+        futures = {
+            type: search_executor().submit(run_search_section, keys[type], query, type, limit, offset)
+            for type in missing
+        }
+        sections.update({type: future.result() for type, future in futures.items()})
+    return {type: sections[type] for type in types}
 
 def explore_page_recommendations(user):
     display_name = user.user_profile.display_name
+    snapshot = current_explore_snapshot()
+    sections = snapshot['sections']
     explore = {}
 
     # ===  PERSONALIZED SECTIONS ===
 
-    liked_ids = list(LikeSong.objects.filter(user=user).values_list('song_id', flat=True))
+    liked_ids = list(LikeSong.objects.filter(user=user).order_by('-liked_at').values_list('song_id', flat=True))
     disliked_ids = list(UnlikeSong.objects.filter(user=user).values_list('song_id', flat=True))
     top_genres = (
         Song.objects.filter(id__in=liked_ids)
-        .prefetch_related('genre')
+        .prefetch_related('genre', 'featured_artists__user_profile')
         .values('genre__id')
         .annotate(genre_count=Count('genre__id'))
         .order_by('-genre_count')[:3]
@@ -126,34 +117,44 @@ def explore_page_recommendations(user):
 
     top_genre_ids = [genre['genre__id'] for genre in top_genres]
 
-    # Made For You Section
+    # Made For You Section, from the factor model for long histories and otherwise
+    # from the precomputed neighbours of the latest likes
     if liked_ids:
-        made_for_you = (
-            Song.objects.filter(genre__id__in=top_genre_ids)
-            .exclude(id__in=liked_ids + disliked_ids)
-            .select_related('album', 'album__artist')
-            .prefetch_related('genre')
-            .order_by('-plays_count')
-            .distinct()[:6]
-        )
+        similar_ids = []
+        if len(liked_ids) >= settings.RECOMMENDER_MIN_HISTORY:
+            similar_ids = recommend_songs(user.id, liked_ids + disliked_ids, limit=6)
+        if not similar_ids:
+            similar_ids = similar_songs(liked_ids[:SIMILARITY_SEEDS], liked_ids + disliked_ids, limit=6)
+        if similar_ids:
+            made_for_you = order_by_ids(
+                Song.objects.select_related('album', 'album__artist')
+                .prefetch_related('genre', 'featured_artists__user_profile'),
+                similar_ids,
+            )
+        else:
+            made_for_you = (
+                Song.objects.filter(genre__id__in=top_genre_ids)
+                .exclude(id__in=liked_ids + disliked_ids)
+                .select_related('album', 'album__artist')
+                .prefetch_related('genre', 'featured_artists__user_profile')
+                .order_by('-plays_count')
+                .distinct()[:6]
+            )
 
         explore['made_for_you'] = {
             'title': f'Made for {display_name}',
             'items': SongSerializer(made_for_you, many=True).data
         }
 
-    # Recommended Today Section
-    recommended_today = (
-        Song.objects
-        .exclude(id__in=liked_ids + disliked_ids)
-        .order_by('-released_date')
-        .select_related('album', 'album__artist')
-        .prefetch_related('genre')
-        .distinct()[:6]
-    )
+    # Recommended Today Section, picked from the snapshot candidates the user has not reacted to
+    reacted_ids = {str(song_id) for song_id in liked_ids + disliked_ids}
+    candidates = sections['recommended_today']['items']
+    recommended_today = [song for song in candidates if song['id'] not in reacted_ids][:6]
+    if len(recommended_today) < 6 and len(candidates) >= RECOMMENDED_TODAY_CANDIDATES:
+        recommended_today = SongSerializer(recommended_today_songs(liked_ids + disliked_ids, limit=6), many=True).data
     explore['recommended_today'] = {
-        'title': 'Recommended for Today',
-        'items': SongSerializer(recommended_today, many=True).data
+        'title': sections['recommended_today']['title'],
+        'items': recommended_today
     }
 
     # Based On Your Recent Listening Section
@@ -164,7 +165,7 @@ def explore_page_recommendations(user):
     }
 
     # Recently Played Section
-    recently_played = RecentlyPlayed.objects.filter(user=user).order_by('-played_at')
+    recently_played = recently_played_entries(user.id)
     recent_songs = [entry.song for entry in recently_played if entry.song]
     recent_playlists = [entry.playlist for entry in recently_played if entry.playlist]
 
@@ -182,68 +183,9 @@ def explore_page_recommendations(user):
 
     # === TRENDING CONTENT ===
 
-    # Popular Albums
-    popular_albums = (
-        Album.objects
-        .annotate(total_plays=Sum('songs__plays_count'))
-        .filter(total_plays__gt=0)
-        .order_by('-total_plays')
-        .select_related('artist')
-        .prefetch_related('songs')[:6]
-    )
-
-    explore['popular_albums'] = {
-        'title': 'Popular Albums',
-        'items': AlbumSerializer(popular_albums, many=True).data
-    }
-
-    # Popular Artists Section
-    popular_artists = (
-        User.objects
-        .filter(album_artist__songs__isnull=False)
-        .annotate(total_plays=Sum('album_artist__songs__plays_count'))
-        .filter(total_plays__gt=0)
-        .order_by('-total_plays')
-        .distinct()[:6]
-    )
-
-    if popular_artists:
-        explore['popular_artists'] = {
-            'title': 'Artist You May Like',
-            'items': UserResponseSerializer(popular_artists, many=True).data
-        }
-
-    # Trending Songs Section
-    trending_window = timezone.now().date() - timedelta(days=30)
-
-    trending_songs = (
-        Song.objects
-        .filter(released_date__gte=trending_window)
-        .annotate(total_engagement=F('plays_count') + F('likes'))
-        .order_by('-total_engagement')
-        .select_related('album', 'album__artist')
-        .prefetch_related('genre')
-        [:6]
-    )
-
-    explore['trending_songs'] = {
-        'title': 'Trending Songs',
-        'items': SongSerializer(trending_songs, many=True).data
-    }
-
-    # Trending Playlists Section
-    trending_playlists = (
-        Playlist.objects
-        .annotate(total_plays=Sum('songs__plays_count'))
-        .filter(total_plays__gt=0, privacy='public')
-        .order_by('-total_plays')
-        .distinct()[:6]
-    )
-
-    explore['trending_playlists'] = {
-        'title': 'Popular Radio',
-        'items': PlaylistSerializer(trending_playlists, many=True).data
-    }
+    for name in ('popular_albums', 'popular_artists', 'trending_songs', 'trending_playlists'):
+        if name in sections:
+            explore[name] = sections[name]
 
     # === ADDITIONAL DATA ===
 
@@ -253,17 +195,17 @@ def explore_page_recommendations(user):
 
     # Recently Played Today Count
     today = timezone.now().date()
-    recently_played_today = RecentlyPlayed.objects.filter(user=user, played_at__date=today).count()
+    recently_played_today = sum(entry.played_at.date() == today for entry in recently_played)
     explore['recently_played_today'] = recently_played_today
 
     # Top Genre Based on Recently Played (Percentage)
     recent_songs_today = [entry.song for entry in recently_played if entry.song and entry.played_at.date() == today]
-    if recent_songs_today:
-        recent_genre_counts = {}
-        for song in recent_songs_today:
-            for genre in song.genre.all():
-                recent_genre_counts[genre.id] = recent_genre_counts.get(genre.id, 0) + 1
+    recent_genre_counts = {}
+    for song in recent_songs_today:
+        for genre in song.genre.all():
+            recent_genre_counts[genre.id] = recent_genre_counts.get(genre.id, 0) + 1
 
+    if recent_genre_counts:
         total_recent_genres = sum(recent_genre_counts.values())
         top_genre_id = max(recent_genre_counts, key=recent_genre_counts.get)
         top_genre_percentage = (recent_genre_counts[top_genre_id] / total_recent_genres) * 100
@@ -274,19 +216,9 @@ def explore_page_recommendations(user):
             'percentage': round(top_genre_percentage, 2)
         }
 
-    # Featured Album (Most Liked and Played)
-    featured_album = (
-        Album.objects
-        .annotate(total_likes=Sum('songs__likes'), total_plays=Sum('songs__plays_count'))
-        .order_by('-total_likes', '-total_plays')
-        .first()
-    )
-
-    if featured_album:
-        explore['featured_album'] = {
-            'title': 'Featured Album',
-            'details': AlbumSerializer(featured_album).data
-        }
+    if 'featured_album' in sections:
+        explore['featured_album'] = sections['featured_album']
+    explore['snapshot_version'] = snapshot['version']
     return Response(explore)
 
 
@@ -1,11 +1,22 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.shortcuts import redirect
+from PIL import UnidentifiedImageError
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
-from home.models import RecentlyPlayed
+from home.recent import recently_played_entries
+from home.search import SEARCH_TYPES, decode_cursor, suggest
+from home.serializers import PlayEventSerializer, SearchQuerySerializer, SuggestQuerySerializer
 from home.utils import search, explore_page_recommendations
+from music.models import Song
+from music.plays import register_play
 from music.serializers import SongSerializer
+from music.streaming import stream_file
 from playlists.serializers import PlaylistSerializer
+from spotify_clone.images import IMAGE_FORMATS, IMAGE_UPLOAD_DIRS, ImageRenderError, get_derivative, image_version
 
 
 class RecentlyPlayedAPIView(APIView):
@@ -13,7 +24,7 @@ class RecentlyPlayedAPIView(APIView):
 
     def get(self, request):
         recently_played = {}
-        recent = RecentlyPlayed.objects.filter(user=request.user).order_by('-played_at')
+        recent = recently_played_entries(request.user.id)
         recent_songs = [entry.song for entry in recent if entry.song]
         recent_playlists = [entry.playlist for entry in recent if entry.playlist]
 
@@ -29,19 +40,79 @@ class RecentlyPlayedAPIView(APIView):
 
         return Response(recently_played)
 
+class PlayEventsAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = PlayEventSerializer(data=request.data, many=True, max_length=500)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+
+        # Only count plays of songs that exist, the counter never checks
+        song_ids = set(
+            Song.objects.filter(id__in={play['song'] for play in serializer.validated_data})
+            .values_list('id', flat=True)
+        )
+        plays = [play for play in serializer.validated_data if play['song'] in song_ids]
+        for play in plays:
+            register_play(
+                play['song'],
+                user.id,
+                playlist_id=play.get('playlist'),
+                ms_played=play['ms_played'],
+                played_at=play.get('played_at'),
+            )
+
+        return Response({'message': f"{len(plays)} plays recorded."}, status=status.HTTP_201_CREATED)
+
 class SearchAPI(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
         query = request.query_params.get('query', None)
-        type = request.query_params.get('type', None)
 
         if not query:
             return Response(
                 {"error": "Search query parameter is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        return search(query, type)
+        serializer = SearchQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        types = [params['type']] if params.get('type') else SEARCH_TYPES
+        offset = 0
+        if params.get('cursor'):
+            position = decode_cursor(params['cursor'])
+            if position is None:
+                return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            # A cursor pages through the one type it came from
+            types, offset = [position[0]], position[1]
+
+        sections = search(params['query'], types, params.get('limit', settings.SEARCH_RESULTS_PER_TYPE), offset)
+        response = {}
+        for type, section in sections.items():
+            # Sections may be shared with other requests, so they are copied rather than changed
+            next_url = None
+            if section['next']:
+                next_url = replace_query_param(request.build_absolute_uri(), 'type', type)
+                next_url = replace_query_param(next_url, 'cursor', section['next'])
+            response[type] = {**section, 'next': next_url}
+        return Response(response)
+
+class SearchSuggestAPI(APIView):
+    """Typeahead over titles and names, answered from this process's prefix index without a query."""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        serializer = SuggestQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        suggestions = suggest(serializer.validated_data['query'], serializer.validated_data['limit'])
+        return Response({
+            'results': [
+                {'type': type, 'id': object_id, 'title': title, 'subtitle': subtitle}
+                for type, object_id, title, subtitle in suggestions
+            ]
+        })
 
 class ExplorePageAPI(APIView):
     permission_classes = [IsAuthenticated]
@@ -49,3 +120,31 @@ class ExplorePageAPI(APIView):
     def get(self, request):
         user = request.user
         return explore_page_recommendations(user)
+
+class ImageDerivativeAPIView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, size, image_format, version, name):
+        if (
+            size not in settings.IMAGE_DERIVATIVE_SIZES
+            or image_format not in IMAGE_FORMATS
+            or not name.startswith(IMAGE_UPLOAD_DIRS)
+            or '..' in name.split('/')
+        ):
+            return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            current = image_version(default_storage, name)
+            if version != current:
+                # The original was replaced since this URL was handed out
+                return redirect('image-derivative', size=size, image_format=image_format, version=current, name=name)
+            derivative = get_derivative(default_storage, name, size, image_format)
+        except (FileNotFoundError, UnidentifiedImageError):
+            return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
+        except ImageRenderError:
+            return Response({"error": "Image cannot be resized"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The URL carries the content hash of the original, so its content never changes
+        return stream_file(request, default_storage, derivative, cache_control={
+            'public': True, 'max_age': settings.IMAGE_DERIVATIVE_MAX_AGE, 'immutable': True
+        })
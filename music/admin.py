@@ -4,15 +4,33 @@ from music.models import *
 admin.site.register(Genre)
 
 class AlbumAdmin(admin.ModelAdmin):
-    list_display = ['title', 'artist','total_songs','release_date']
+    list_display = ['title', 'artist', 'track_count', 'total_plays', 'total_likes', 'release_date']
 
 admin.site.register(Album, AlbumAdmin)
 
 class SongAdmin(admin.ModelAdmin):
-    list_display = ['title', 'album', 'plays_count', 'released_date' , 'likes' , 'dislikes']
+    list_display = ['title', 'album', 'plays_count', 'released_date' , 'likes' , 'dislikes', 'counter_shards']
 
 admin.site.register(Song, SongAdmin)
 
+class ArtistStatsAdmin(admin.ModelAdmin):
+    list_display = ['artist', 'album_count', 'track_count', 'total_plays', 'total_likes']
+
+admin.site.register(ArtistStats, ArtistStatsAdmin)
+
+class TranscodeJobAdmin(admin.ModelAdmin):
+    list_display = ['song', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status']
+
+admin.site.register(TranscodeJob, TranscodeJobAdmin)
+
+class ReleaseAdmin(admin.ModelAdmin):
+    list_display = ['artist', 'album', 'song', 'status', 'published_at']
+    list_filter = ['status']
+    raw_id_fields = ['artist', 'album', 'song']
+
+admin.site.register(Release, ReleaseAdmin)
+admin.site.register(SongRendition)
 admin.site.register(LikeSong)
 admin.site.register(UnlikeSong)
 admin.site.register(Follow)
\ No newline at end of file
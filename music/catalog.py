@@ -0,0 +1,256 @@
+import csv
+import itertools
+import json
+import os
+import uuid
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_duration
+from home.search import index_later
+from music.models import Album, ImportCheckpoint, Song, TranscodeJob
+from music.stats import refresh_album_stats
+from music.utils import add_m2m_rows, resolve_genres
+
+User = get_user_model()
+
+# Keys in a manifest are turned into stable UUIDs so re-importing never duplicates rows
+IMPORT_NAMESPACE = uuid.UUID('5b0e3f6c-6d0a-4f38-9c41-2d2b8f1f7a90')
+LIST_SEPARATOR = '|'
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def read_manifest(path, file_format=None):
+    """
+    Yield the records of a JSONL or CSV manifest one at a time. Lines that
+    cannot be parsed are yielded as ``CatalogError`` so they keep their position.
+    """
+    file_format = file_format or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    with open(path, newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            for row in csv.DictReader(file):
+                yield {key: value for key, value in row.items() if key and value not in ('', None)}
+            return
+
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield CatalogError(f"invalid JSON: {exc}")
+                continue
+            yield record if isinstance(record, dict) else CatalogError("expected a JSON object")
+
+
+def as_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    return [str(item) for item in value]
+
+
+def record_uuid(value, kind):
+    """Manifest references are either UUIDs or free-form keys mapped to a stable UUID."""
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return uuid.uuid5(IMPORT_NAMESPACE, f'{kind}:{value}')
+
+
+def normalize_reference(reference):
+    try:
+        return str(uuid.UUID(reference))
+    except ValueError:
+        return reference
+
+
+def required(record, field):
+    value = record.get(field)
+    if value in (None, ''):
+        raise CatalogError(f"missing '{field}'")
+    return value
+
+
+def parse_value(parser, value, field):
+    parsed = parser(str(value))
+    if parsed is None:
+        raise CatalogError(f"invalid '{field}': {value}")
+    return parsed
+
+
+def resolve_users(references):
+    """Map artist references (UUID, email or username) to user ids with one query."""
+    references = {normalize_reference(reference) for reference in references}
+    if not references:
+        return {}
+    uuids = set()
+    for reference in references:
+        try:
+            uuids.add(uuid.UUID(reference))
+        except ValueError:
+            pass
+
+    user_ids = {}
+    users = User.objects.filter(Q(id__in=uuids) | Q(email__in=references) | Q(username__in=references))
+    for user_id, email, username in users.values_list('id', 'email', 'username'):
+        for reference in (str(user_id), email, username):
+            if reference in references:
+                user_ids[reference] = user_id
+    return user_ids
+
+
+def build_album(record, user_ids):
+    artist = normalize_reference(str(required(record, 'artist')))
+    if artist not in user_ids:
+        raise CatalogError(f"unknown artist '{artist}'")
+    return Album(
+        id=record_uuid(record.get('id') or required(record, 'key'), 'album'),
+        title=required(record, 'title'),
+        artist_id=user_ids[artist],
+        description=record.get('description', ''),
+        release_date=parse_value(parse_date, required(record, 'release_date'), 'release_date'),
+        cover_image=record.get('cover_image'),
+    )
+
+
+def build_song(record, user_ids):
+    album = record.get('album')
+    featured = [normalize_reference(reference) for reference in as_list(record.get('featured_artists'))]
+    unknown = [reference for reference in featured if reference not in user_ids]
+    if unknown:
+        raise CatalogError(f"unknown featured artists {', '.join(unknown)}")
+
+    title = required(record, 'title')
+    song = Song(
+        id=record_uuid(record.get('id') or record.get('key') or f'{album}:{title}', 'song'),
+        title=title,
+        album_id=record_uuid(album, 'album') if album else None,
+        duration=parse_value(parse_duration, required(record, 'duration'), 'duration'),
+        audio_file=required(record, 'audio_file'),
+        song_cover_image=record.get('song_cover_image'),
+        lyrics=record.get('lyrics'),
+        description=record.get('description'),
+        released_date=parse_value(parse_date, record['released_date'], 'released_date')
+        if record.get('released_date') else None,
+    )
+    return song, as_list(record.get('genres')), [user_ids[reference] for reference in featured]
+
+
+def import_chunk(records, transcode=True):
+    """
+    Import ``[(position, record), ...]`` with a fixed number of queries. Albums go
+    first so songs can reference albums from the same chunk. Returns
+    ``(stats, errors)`` where errors are ``(position, message)`` pairs.
+
+    With ``transcode`` each new song gets a pending ``TranscodeJob``; they are
+    left for the ``transcode_songs`` command rather than this process's pool.
+    """
+    stats = {'albums': 0, 'songs': 0, 'existing': 0, 'errors': 0}
+    errors = []
+    album_records, song_records = [], []
+    for position, record in records:
+        if isinstance(record, CatalogError):
+            errors.append((position, str(record)))
+        elif record.get('type') == 'album':
+            album_records.append((position, record))
+        elif record.get('type') == 'song':
+            song_records.append((position, record))
+        else:
+            errors.append((position, f"unknown record type '{record.get('type')}'"))
+
+    references = [str(record['artist']) for _, record in album_records if record.get('artist')]
+    references += [reference for _, record in song_records for reference in as_list(record.get('featured_artists'))]
+    user_ids = resolve_users(references)
+
+    albums = []
+    for position, record in album_records:
+        try:
+            albums.append(build_album(record, user_ids))
+        except CatalogError as exc:
+            errors.append((position, str(exc)))
+    existing_album_ids = set(Album.objects.filter(id__in=[album.id for album in albums]).values_list('id', flat=True))
+    new_albums = list({album.id: album for album in albums if album.id not in existing_album_ids}.values())
+    Album.objects.bulk_create(new_albums, ignore_conflicts=True)
+    stats['albums'] = len(new_albums)
+    stats['existing'] += len(albums) - len(new_albums)
+
+    songs = []
+    for position, record in song_records:
+        try:
+            songs.append((position, *build_song(record, user_ids)))
+        except CatalogError as exc:
+            errors.append((position, str(exc)))
+
+    album_ids = set(Album.objects.filter(id__in={song.album_id for _, song, _, _ in songs if song.album_id})
+                    .values_list('id', flat=True))
+    existing_song_ids = set(Song.objects.filter(id__in=[song.id for _, song, _, _ in songs]).values_list('id', flat=True))
+    new_songs = {}
+    for position, song, genre_names, featured_ids in songs:
+        if song.album_id and song.album_id not in album_ids:
+            errors.append((position, f"unknown album '{song.album_id}'"))
+        elif song.id in existing_song_ids or song.id in new_songs:
+            stats['existing'] += 1
+        else:
+            new_songs[song.id] = (song, genre_names, featured_ids)
+
+    Song.objects.bulk_create([song for song, _, _ in new_songs.values()], ignore_conflicts=True)
+    stats['songs'] = len(new_songs)
+
+    genre_ids = resolve_genres(name for _, genre_names, _ in new_songs.values() for name in genre_names)
+    add_m2m_rows(Song.genre, [
+        (song_id, genre_ids[name]) for song_id, (_, genre_names, _) in new_songs.items() for name in genre_names
+    ])
+    add_m2m_rows(Song.featured_artists, [
+        (song_id, user_id) for song_id, (_, _, featured_ids) in new_songs.items() for user_id in featured_ids
+    ])
+
+    # bulk_create skips the signals that keep album and artist stats in step
+    refresh_album_stats(
+        {song.album_id for song, _, _ in new_songs.values() if song.album_id} | {album.id for album in new_albums}
+    )
+    index_later('albums', [album.id for album in new_albums])
+    index_later('songs', new_songs)
+
+    if transcode:
+        TranscodeJob.objects.bulk_create(
+            [TranscodeJob(song_id=song.id, source_name=song.audio_file.name) for song, _, _ in new_songs.values()],
+            ignore_conflicts=True,
+        )
+
+    stats['errors'] = len(errors)
+    return stats, errors
+
+
+def import_catalog(path, name=None, chunk_size=1000, file_format=None, transcode=True, restart=False,
+                   progress=None):
+    """
+    Stream ``path`` into the catalog one chunk per transaction. The number of
+    committed records is stored in an ``ImportCheckpoint`` in the same
+    transaction, so an interrupted import resumes after the last chunk.
+    ``progress(position, totals, errors)`` is called after every chunk.
+    """
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(name=(name or os.path.abspath(path))[:255])
+    if restart:
+        checkpoint.position = 0
+        checkpoint.save(update_fields=['position', 'updated_at'])
+
+    totals = {'albums': 0, 'songs': 0, 'existing': 0, 'errors': 0, 'resumed_at': checkpoint.position}
+    records = itertools.islice(enumerate(read_manifest(path, file_format), start=1), checkpoint.position, None)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            return totals
+
+        with transaction.atomic():
+            stats, errors = import_chunk(chunk, transcode=transcode)
+            ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(position=chunk[-1][0])
+
+        for key, value in stats.items():
+            totals[key] += value
+        if progress:
+            progress(chunk[-1][0], totals, errors)
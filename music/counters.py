@@ -0,0 +1,120 @@
+import random
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Count, F
+from music.models import LikeSong, Song, SongCounterShard, UnlikeSong
+from music.stats import delta_case, id_chunks, refresh_album_stats
+
+
+def adjust_song_counters(song, likes=0, dislikes=0):
+    """
+    Apply like/dislike deltas to ``song``. Call it inside the transaction that
+    inserts or deletes the matching ``LikeSong``/``UnlikeSong`` rows.
+
+    Songs with ``counter_shards`` set spread their writes over that many
+    ``SongCounterShard`` rows, which ``fold_counter_shards`` moves back onto the
+    song on every play count flush.
+    """
+    if not likes and not dislikes:
+        return
+
+    deltas = {'likes': F('likes') + likes, 'dislikes': F('dislikes') + dislikes}
+    if not song.counter_shards:
+        Song.objects.filter(id=song.id).update(**deltas)
+        return
+
+    # The play counter's flusher folds the shards; make sure this process runs one
+    from music.plays import play_counter
+    play_counter.start()
+
+    shard = SongCounterShard.objects.filter(song=song, shard=random.randrange(song.counter_shards))
+    if not shard.update(**deltas):
+        SongCounterShard.objects.bulk_create(
+            [SongCounterShard(song=song, shard=index) for index in range(song.counter_shards)],
+            ignore_conflicts=True
+        )
+        shard.update(**deltas)
+
+
+def adjust_many_song_counters(songs, likes=None, dislikes=None):
+    """
+    Bulk ``adjust_song_counters`` taking ``{song_id: delta}`` maps. Unsharded
+    songs are updated with a single statement.
+    """
+    likes = likes or {}
+    dislikes = dislikes or {}
+    plain_ids = []
+    for song in songs:
+        if song.counter_shards:
+            adjust_song_counters(song, likes.get(song.id, 0), dislikes.get(song.id, 0))
+        elif likes.get(song.id) or dislikes.get(song.id):
+            plain_ids.append(song.id)
+
+    if plain_ids:
+        Song.objects.filter(id__in=plain_ids).update(
+            likes=F('likes') + delta_case(likes),
+            dislikes=F('dislikes') + delta_case(dislikes),
+        )
+
+
+def fold_counter_shards(chunk_size=1000):
+    """Move the deltas accumulated in counter shards onto ``Song.likes``/``dislikes``."""
+    folded = 0
+    pending = SongCounterShard.objects.exclude(likes=0, dislikes=0).values('song_id')
+    for song_ids in id_chunks(Song.objects.filter(id__in=pending), chunk_size):
+        with transaction.atomic():
+            songs = list(Song.objects.select_for_update().filter(id__in=song_ids).only('id', 'likes', 'dislikes'))
+            shards = SongCounterShard.objects.select_for_update().filter(song_id__in=song_ids)
+
+            deltas = defaultdict(lambda: [0, 0])
+            for song_id, likes, dislikes in shards.values_list('song_id', 'likes', 'dislikes'):
+                deltas[song_id][0] += likes
+                deltas[song_id][1] += dislikes
+
+            changed = [song for song in songs if any(deltas[song.id])]
+            for song in changed:
+                song.likes += deltas[song.id][0]
+                song.dislikes += deltas[song.id][1]
+
+            Song.objects.bulk_update(changed, ['likes', 'dislikes'])
+            shards.update(likes=0, dislikes=0)
+            folded += len(changed)
+    return folded
+
+
+def rebuild_song_counters(chunk_size=1000):
+    """
+    Recount likes and dislikes from ``LikeSong``/``UnlikeSong`` one chunk of
+    songs at a time and return how many songs had drifted.
+    """
+    drifted = 0
+    for song_ids in id_chunks(Song.objects.all(), chunk_size):
+        with transaction.atomic():
+            # Lock the counters first so likes landing mid-chunk are not overwritten
+            songs = list(
+                Song.objects.select_for_update().filter(id__in=song_ids).only('id', 'album_id', 'likes', 'dislikes')
+            )
+            shards = SongCounterShard.objects.select_for_update().filter(song_id__in=song_ids)
+            list(shards)
+
+            likes = dict(
+                LikeSong.objects.filter(song_id__in=song_ids)
+                .values('song_id').annotate(total=Count('id')).values_list('song_id', 'total')
+            )
+            dislikes = dict(
+                UnlikeSong.objects.filter(song_id__in=song_ids)
+                .values('song_id').annotate(total=Count('id')).values_list('song_id', 'total')
+            )
+
+            changed = []
+            for song in songs:
+                counts = (likes.get(song.id, 0), dislikes.get(song.id, 0))
+                if (song.likes, song.dislikes) != counts:
+                    song.likes, song.dislikes = counts
+                    changed.append(song)
+
+            Song.objects.bulk_update(changed, ['likes', 'dislikes'])
+            shards.update(likes=0, dislikes=0)
+            refresh_album_stats({song.album_id for song in changed if song.album_id})
+            drifted += len(changed)
+    return drifted
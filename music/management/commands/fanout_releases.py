@@ -0,0 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from music.models import Release
+from music.releases import run_in_worker
+
+
+class Command(BaseCommand):
+    help = "Deliver pending releases to the inboxes of the artists' followers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        release_ids = list(Release.objects.filter(status='pending').order_by('id').values_list('id', flat=True))
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            list(pool.map(run_in_worker, release_ids))
+
+        done = Release.objects.filter(id__in=release_ids).exclude(status='pending').count()
+        self.stdout.write(self.style.SUCCESS(f"Fanned out {done} of {len(release_ids)} releases"))
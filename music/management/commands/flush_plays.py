@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from music.plays import play_counter
+
+
+class Command(BaseCommand):
+    help = "Drain buffered song plays into Song.plays_count and fold sharded like counters"
+
+    def handle(self, *args, **options):
+        plays = play_counter.flush()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {plays} buffered plays"))
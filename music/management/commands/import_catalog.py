@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from music.catalog import import_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Import albums and songs from a JSONL or CSV manifest, resuming where the last run stopped. "
+        "Imported songs get pending transcode jobs; run transcode_songs afterwards to encode them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help="Manifest format, guessed from the file extension by default")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--name', help="Checkpoint name, defaults to the manifest's absolute path")
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and start from the top")
+        parser.add_argument('--skip-transcode', action='store_true',
+                            help="Do not create pending transcode jobs for imported songs")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        imported_from = None
+
+        def progress(position, totals, errors):
+            nonlocal imported_from
+            if imported_from is None:
+                imported_from = totals['resumed_at']
+            for record, message in errors:
+                self.stderr.write(f"record {record}: {message}")
+            rate = (position - imported_from) / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"{position} records, {totals['albums']} albums, {totals['songs']} songs, "
+                f"{totals['existing']} already imported, {totals['errors']} errors ({rate:.0f} records/s)"
+            )
+
+        try:
+            totals = import_catalog(
+                options['manifest'],
+                name=options['name'],
+                chunk_size=options['chunk_size'],
+                file_format=options['format'],
+                transcode=not options['skip_transcode'],
+                restart=options['restart'],
+                progress=progress,
+            )
+        except OSError as exc:
+            raise CommandError(exc)
+
+        if totals['resumed_at']:
+            self.stdout.write(f"Resumed after record {totals['resumed_at']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['albums']} albums and {totals['songs']} songs "
+            f"with {totals['errors']} errors in {time.monotonic() - started:.1f}s"
+        ))
+        if totals['songs'] and not options['skip_transcode']:
+            self.stdout.write("Run transcode_songs to encode the imported songs")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from music.stats import rebuild_catalog_stats
+
+
+class Command(BaseCommand):
+    help = "Verify or rebuild the album and artist aggregates from their songs in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--verify', action='store_true', help="Only report drift, without writing")
+
+    def handle(self, *args, **options):
+        albums, artists = rebuild_catalog_stats(chunk_size=options['chunk_size'], dry_run=options['verify'])
+        if options['verify']:
+            style = self.style.SUCCESS if not albums and not artists else self.style.WARNING
+            self.stdout.write(style(f"{albums} albums and {artists} artists have drifted"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats, {albums} albums and {artists} artists had drifted"))
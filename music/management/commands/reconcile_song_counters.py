@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from music.counters import fold_counter_shards, rebuild_song_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild Song.likes/dislikes from LikeSong and UnlikeSong in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--fold-only', action='store_true',
+                            help="Only fold counter shard deltas into songs, without recounting")
+
+    def handle(self, *args, **options):
+        if options['fold_only']:
+            folded = fold_counter_shards(chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f"Folded counter shards for {folded} songs"))
+            return
+
+        drifted = rebuild_song_counters(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters, {drifted} songs had drifted"))
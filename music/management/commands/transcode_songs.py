@@ -0,0 +1,39 @@
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from music.models import Song, TranscodeJob
+from music.transcoding import enqueue_transcode, run_in_worker
+
+
+class Command(BaseCommand):
+    help = "Run pending song transcode jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--missing', action='store_true',
+                            help="Queue songs that have never been transcoded or have no waveform yet")
+        parser.add_argument('--retry-failed', action='store_true')
+        parser.add_argument('--stale-minutes', type=int, default=60,
+                            help="Requeue running jobs started longer ago than this")
+
+    def handle(self, *args, **options):
+        if options['missing']:
+            missing = Song.objects.filter(
+                Q(transcode_job__isnull=True) | Q(transcode_job__status='done', transcode_job__waveform='')
+            )
+            for song in missing.only('id', 'audio_file').iterator():
+                enqueue_transcode(song, dispatch=False)
+
+        stale_before = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        TranscodeJob.objects.filter(status='running', started_at__lt=stale_before).update(status='pending')
+        if options['retry_failed']:
+            TranscodeJob.objects.filter(status='failed').update(status='pending')
+
+        job_ids = list(TranscodeJob.objects.filter(status='pending').values_list('id', flat=True))
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            list(pool.map(run_in_worker, job_ids))
+
+        done = TranscodeJob.objects.filter(id__in=job_ids, status='done').count()
+        self.stdout.write(self.style.SUCCESS(f"Transcoded {done} of {len(job_ids)} songs"))
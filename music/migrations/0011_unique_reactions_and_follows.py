@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    for model_name, fields in (
+        ('LikeSong', ('user', 'song')),
+        ('UnlikeSong', ('user', 'song')),
+        ('Follow', ('follower', 'followed')),
+    ):
+        model = apps.get_model('music', model_name)
+        keep_ids = model.objects.values(*fields).annotate(keep_id=Min('id')).values('keep_id')
+        model.objects.exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0010_song_counter_shards'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('follower', 'followed'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='likesong',
+            constraint=models.UniqueConstraint(fields=('user', 'song'), name='unique_song_like'),
+        ),
+        migrations.AddConstraint(
+            model_name='unlikesong',
+            constraint=models.UniqueConstraint(fields=('user', 'song'), name='unique_song_unlike'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:23
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0011_unique_reactions_and_follows'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='likesong',
+            name='liked_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='likesong',
+            index=models.Index(fields=['user', '-liked_at'], name='song_like_user_liked_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0014_transcode_jobs_and_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcodejob',
+            name='waveform',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:51
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DurationField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_stats(apps, schema_editor):
+    Album = apps.get_model('music', 'Album')
+    Song = apps.get_model('music', 'Song')
+    ArtistStats = apps.get_model('music', 'ArtistStats')
+
+    songs = Song.objects.filter(album=OuterRef('pk')).order_by().values('album')
+
+    def total(aggregate, default):
+        return Coalesce(Subquery(songs.annotate(total=aggregate).values('total')), default)
+
+    Album.objects.update(
+        track_count=total(Count('id'), Value(0)),
+        total_duration=total(Sum('duration'), Value(datetime.timedelta(), output_field=DurationField())),
+        total_plays=total(Sum('plays_count'), Value(0)),
+        total_likes=total(Sum('likes'), Value(0)),
+    )
+    ArtistStats.objects.bulk_create([
+        ArtistStats(
+            artist_id=row['artist'],
+            album_count=row['album_count'],
+            track_count=row['tracks'],
+            total_plays=row['plays'],
+            total_likes=row['likes'],
+        )
+        for row in Album.objects.order_by().values('artist').annotate(
+            album_count=Count('id'), tracks=Sum('track_count'), plays=Sum('total_plays'), likes=Sum('total_likes')
+        )
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0016_import_checkpoint'),
+        ('users', '0007_list_ordering_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtistStats',
+            fields=[
+                ('artist', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='artist_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('album_count', models.PositiveIntegerField(default=0)),
+                ('track_count', models.PositiveIntegerField(default=0)),
+                ('total_plays', models.BigIntegerField(default=0)),
+                ('total_likes', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RenameField(
+            model_name='album',
+            old_name='total_songs',
+            new_name='track_count',
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='total_duration',
+            field=models.DurationField(default=datetime.timedelta),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='total_likes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='total_plays',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(fields=['-total_plays'], name='album_total_plays_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(fields=['-total_likes', '-total_plays'], name='album_total_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artiststats',
+            index=models.Index(fields=['-total_plays'], name='artist_stats_total_plays_idx'),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
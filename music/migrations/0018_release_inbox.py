@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0017_album_and_artist_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Release',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('pull', 'Pull')], default='pending', max_length=10)),
+                ('fanout_cursor', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReleaseInboxItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followed', 'id'], name='follow_followed_idx'),
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='album',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='release', to='music.album'),
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='artist',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='releases', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='release',
+            name='song',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='release', to='music.song'),
+        ),
+        migrations.AddField(
+            model_name='releaseinboxitem',
+            name='release',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_items', to='music.release'),
+        ),
+        migrations.AddField(
+            model_name='releaseinboxitem',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='release_inbox', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='release',
+            index=models.Index(fields=['artist', 'status', '-published_at', '-id'], name='release_artist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='release',
+            index=models.Index(fields=['status'], name='release_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='releaseinboxitem',
+            index=models.Index(fields=['user', '-published_at', '-release'], name='release_inbox_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='releaseinboxitem',
+            constraint=models.UniqueConstraint(fields=('user', 'release'), name='unique_release_inbox_item'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:19
+
+import operator
+from functools import reduce
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.contrib.postgres.search import SearchVector
+from spotify_clone.operations import PostgresAddIndex
+
+
+def backfill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, fields in (
+        ('Song', (('title', 'A'), ('album__title', 'B'), ('album__artist__user_profile__display_name', 'C'))),
+        ('Album', (('title', 'A'), ('artist__user_profile__display_name', 'B'))),
+    ):
+        model = apps.get_model('music', model_name)
+        vector = reduce(operator.add, (SearchVector(field, weight=weight) for field, weight in fields))
+        vectors = model.objects.filter(pk=OuterRef('pk')).annotate(vector=vector).values('vector')[:1]
+        model.objects.update(search_vector=Subquery(vectors))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0019_follow_indexes'),
+        ('users', '0009_search_vectors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        PostgresAddIndex(
+            model_name='album',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='album_search_idx'),
+        ),
+        PostgresAddIndex(
+            model_name='song',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='song_search_idx'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
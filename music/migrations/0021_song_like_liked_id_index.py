@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0020_search_vectors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='likesong',
+            name='song_like_user_liked_idx',
+        ),
+        migrations.AddIndex(
+            model_name='likesong',
+            index=models.Index(fields=['user', '-liked_at', '-id'], name='song_like_user_liked_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:17
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0021_song_like_liked_id_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='album',
+            name='album_total_plays_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='album',
+            name='album_total_likes_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='artiststats',
+            name='artist_stats_total_plays_idx',
+        ),
+    ]
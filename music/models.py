@@ -1,4 +1,7 @@
 import uuid
+from datetime import timedelta
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from spotify_clone import settings
 
@@ -20,12 +23,38 @@ class Album(models.Model):
     release_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     cover_image = models.ImageField(upload_to="album_covers/", blank=True, null=True)
-    total_songs = models.PositiveIntegerField(default=0)
+    # Aggregates over the album's songs, kept up to date by music.stats
+    track_count = models.PositiveIntegerField(default=0)
+    total_duration = models.DurationField(default=timedelta)
+    # Refreshed by rebuild_catalog_stats rather than on every play or like
+    total_plays = models.BigIntegerField(default=0)
+    total_likes = models.BigIntegerField(default=0)
+    # Maintained by home.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='album_search_idx'),
+            models.Index(fields=['-created_at', '-id'], name='album_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class ArtistStats(models.Model):
+    """Per-artist totals over their albums, kept up to date by music.stats."""
+    artist = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='artist_stats')
+    album_count = models.PositiveIntegerField(default=0)
+    track_count = models.PositiveIntegerField(default=0)
+    # Refreshed by rebuild_catalog_stats, like the album totals
+    total_plays = models.BigIntegerField(default=0)
+    total_likes = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.artist} stats"
+
+
 class Song(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
@@ -40,15 +69,98 @@ class Song(models.Model):
     description = models.TextField(blank=True, null=True)
     likes = models.IntegerField(default=0)
     dislikes = models.IntegerField(default=0)
+    counter_shards = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     released_date = models.DateField(blank=True, null=True)
+    # Maintained by home.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='song_search_idx'),
+            models.Index(fields=['-created_at', '-id'], name='song_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        song = super().from_db(db, field_names, values)
+        # What the album aggregates last counted, so saves need no extra query (see music.signals)
+        if 'album_id' in field_names and 'duration' in field_names:
+            song._saved_stats = {'album_id': song.album_id, 'duration': song.duration}
+        return song
+
+
+class SongCounterShard(models.Model):
+    """Like/dislike deltas for songs with ``counter_shards`` enabled, folded into ``Song`` later."""
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='counter_shard_rows')
+    shard = models.PositiveSmallIntegerField()
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['song', 'shard'], name='unique_song_counter_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.song} shard {self.shard}"
+
+class TranscodeJob(models.Model):
+    """Tracks the background transcode of a song's ``audio_file`` into its renditions."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, related_name='transcode_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    source_name = models.CharField(max_length=255)
+    output_dir = models.CharField(max_length=255, blank=True)
+    hls_master = models.CharField(max_length=255, blank=True)
+    waveform = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.song} transcode ({self.status})"
+
+
+class SongRendition(models.Model):
+    """One transcoded bitrate of a song: a progressive file plus its HLS media playlist."""
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='renditions')
+    bitrate = models.PositiveIntegerField(help_text="kbit/s")
+    audio_file = models.CharField(max_length=255)
+    hls_playlist = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['song', 'bitrate'], name='unique_song_rendition'),
+        ]
+
+    def __str__(self):
+        return f"{self.song} @ {self.bitrate}k"
+
+
 class LikeSong(models.Model):
     song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='song_likes')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='song_likes')
+    liked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'song'], name='unique_song_like'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-liked_at', '-id'], name='song_like_user_liked_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} liked  {self.song.title}"
@@ -59,6 +171,11 @@ class UnlikeSong(models.Model):
     song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name='song_unlikes')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='song_unlikes')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'song'], name='unique_song_unlike'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} unliked  {self.song.title}"
 
@@ -66,5 +183,74 @@ class Follow(models.Model):
     follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following')
     followed = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followed'], name='unique_follow'),
+        ]
+        indexes = [
+            # Follower/following lists newest first; also the keyset scan for release fan-out
+            models.Index(fields=['followed', 'id'], name='follow_followed_idx'),
+            models.Index(fields=['follower', 'id'], name='follow_follower_idx'),
+            # Reverse of unique_follow, for "which of these users follow X" lookups
+            models.Index(fields=['followed', 'follower'], name='follow_followed_follower_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower.username} follows {self.followed.username}"
+
+
+class Release(models.Model):
+    """
+    An album or single announced to the artist's followers. Releases are fanned
+    out into each follower's inbox, except for artists with too many followers
+    (``pull``), which are merged into the feed when it is read.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('pull', 'Pull'),
+    ]
+    artist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='releases')
+    album = models.OneToOneField(Album, on_delete=models.CASCADE, null=True, blank=True, related_name='release')
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, null=True, blank=True, related_name='release')
+    published_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Last Follow id whose follower already has an inbox row
+    fanout_cursor = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['artist', 'status', '-published_at', '-id'], name='release_artist_idx'),
+            models.Index(fields=['status'], name='release_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.album or self.song} ({self.status})"
+
+
+class ReleaseInboxItem(models.Model):
+    """One release delivered to one follower; a user's feed is a range scan over these."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='release_inbox')
+    release = models.ForeignKey(Release, on_delete=models.CASCADE, related_name='inbox_items')
+    published_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'release'], name='unique_release_inbox_item'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-published_at', '-release'], name='release_inbox_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.release} for {self.user}"
+
+
+class ImportCheckpoint(models.Model):
+    """How many records of a catalog manifest ``import_catalog`` has committed."""
+    name = models.CharField(max_length=255, unique=True)
+    position = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f"{self.follower.username} follows {self.followed.username}"
\ No newline at end of file
+        return f"{self.name} @ {self.position}"
@@ -0,0 +1,246 @@
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth import get_user_model
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from home.models import PlayEvent
+from music.counters import fold_counter_shards
+from music.models import Song
+from playlists.models import Playlist
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'plays'
+KEY_TIMEOUT = 60 * 60 * 24
+# How many epochs a flush looks back at most, even after a long outage
+LOOKBACK_EPOCHS = 10
+
+
+class PlayCounter:
+    """
+    Write-behind buffer for song plays.
+
+    Plays are counted in the cache under time-based epochs and flushed to the
+    database as batched ``F('plays_count') + n`` updates. With a local-memory
+    cache the buffer is per process; pointing ``PLAY_COUNT_CACHE`` at a shared
+    cache lets every worker and the ``flush_plays`` command drain one store.
+    The flush that holds the lock also folds sharded like counters back onto
+    their songs.
+    """
+
+    def __init__(self, cache_alias, interval):
+        self.cache_alias = cache_alias
+        self.interval = max(int(interval), 1)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def current_epoch(self):
+        return int(time.time() // self.interval)
+
+    def key(self, epoch, *parts):
+        return ':'.join([KEY_PREFIX, str(epoch), *map(str, parts)])
+
+    def incr(self, key, delta):
+        """Increment ``key`` by ``delta`` and return ``(value, created)``."""
+        if self.cache.add(key, delta, KEY_TIMEOUT):
+            return delta, True
+        try:
+            return self.cache.incr(key, delta), False
+        except ValueError:
+            # The key expired between add() and incr()
+            self.cache.set(key, delta, KEY_TIMEOUT)
+            return delta, True
+
+    def register(self, song_id, count=1, event=None):
+        self.start()
+        epoch = self.current_epoch()
+        _, created = self.incr(self.key(epoch, 'song', song_id), count)
+        if created:
+            # First play of this song in the epoch, remember it for the flusher
+            slot, _ = self.incr(self.key(epoch, 'n'), 1)
+            self.cache.set(self.key(epoch, 'slot', slot), str(song_id), KEY_TIMEOUT)
+        if event is not None:
+            slot, _ = self.incr(self.key(epoch, 'events'), 1)
+            self.cache.set(self.key(epoch, 'event', slot), event, KEY_TIMEOUT)
+
+    def flush(self):
+        """
+        Write every buffered play to the database and return how many plays were applied.
+        Only one flush runs at a time across all processes sharing the cache.
+        """
+        lock_key = f'{KEY_PREFIX}:lock'
+        drained_key = f'{KEY_PREFIX}:drained'
+        lock_timeout = max(self.interval * 2, 60)
+        token = uuid.uuid4().hex
+        if not self.cache.add(lock_key, token, lock_timeout):
+            return 0
+
+        try:
+            current = self.current_epoch()
+            oldest = current - LOOKBACK_EPOCHS
+            drained = self.cache.get(drained_key, oldest)
+            if drained < oldest:
+                # After a long outage only the last epochs are worth the round trips
+                logger.warning("Skipping %d undrained play epochs", oldest - drained)
+                drained = oldest
+            total = 0
+            for epoch in range(drained + 1, current + 1):
+                # Another process may have taken over if the lock expired, it drains the rest
+                if self.cache.get(lock_key) != token:
+                    logger.warning("Lost the play flush lock, stopping at epoch %d", epoch)
+                    return total
+                self.cache.touch(lock_key, lock_timeout)
+                # Epochs older than the previous one no longer receive writes
+                sealed = epoch < current - 1
+                total += self.drain_epoch(epoch, sealed=sealed)
+                if sealed:
+                    self.cache.set(drained_key, epoch, None)
+            fold_counter_shards()
+            return total
+        finally:
+            if self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+
+    def drain_epoch(self, epoch, sealed):
+        size_key = self.key(epoch, 'n')
+        size = self.cache.get(size_key, 0)
+        slot_keys = [self.key(epoch, 'slot', slot) for slot in range(1, size + 1)]
+        song_ids = set(self.cache.get_many(slot_keys).values())
+        count_keys = {self.key(epoch, 'song', song_id): song_id for song_id in song_ids}
+        counts = {
+            count_keys[key]: value
+            for key, value in self.cache.get_many(list(count_keys)).items()
+            if value > 0
+        }
+
+        events_key = self.key(epoch, 'events')
+        done_key = self.key(epoch, 'events', 'done')
+        event_keys = [self.key(epoch, 'event', slot) for slot in range(1, self.cache.get(events_key, 0) + 1)]
+        done = self.cache.get(done_key, 0)
+        found = self.cache.get_many(event_keys[done:])
+        events = []
+        for key in event_keys[done:]:
+            if key not in found and not sealed:
+                # Slot reserved but not written yet, pick it up on the next flush
+                break
+            if key in found:
+                events.append(found[key])
+            done += 1
+
+        if counts:
+            apply_plays(counts)
+            # decr() instead of delete() keeps plays registered while we were writing
+            for song_id, value in counts.items():
+                try:
+                    self.cache.decr(self.key(epoch, 'song', song_id), value)
+                except ValueError:
+                    pass
+        if events:
+            record_play_events(events)
+            self.cache.set(done_key, done, KEY_TIMEOUT)
+
+        if sealed:
+            self.cache.delete_many([size_key, events_key, done_key, *slot_keys, *count_keys, *event_keys])
+        return sum(counts.values())
+
+    def start(self):
+        """Start the background flusher once per process."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self.run, name='play-counter-flush', daemon=True)
+            thread.start()
+            atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush buffered plays")
+            finally:
+                close_old_connections()
+
+
+def apply_plays(counts):
+    """
+    Apply ``{song_id: plays}`` with one UPDATE per distinct increment. Album
+    and artist play totals are recomputed by ``rebuild_catalog_stats``.
+    """
+    song_ids_by_count = defaultdict(list)
+    for song_id, count in counts.items():
+        song_ids_by_count[count].append(song_id)
+
+    with transaction.atomic():
+        for count, song_ids in song_ids_by_count.items():
+            Song.objects.filter(id__in=song_ids).update(plays_count=F('plays_count') + count)
+
+
+def record_play_events(events):
+    """
+    Bulk insert buffered ``(user_id, song_id, playlist_id, played_at, ms_played)``
+    events and return how many were written. Events whose user or song was
+    deleted while they sat in the buffer are dropped. If the batch still fails,
+    the events are retried one by one and the ones that fail again are logged
+    and dropped, so a single bad event never holds up the rest of the buffer.
+    """
+    user_ids = set(User.objects.filter(id__in={event[0] for event in events}).values_list('id', flat=True))
+    song_ids = set(Song.objects.filter(id__in={event[1] for event in events}).values_list('id', flat=True))
+    playlist_ids = set(
+        Playlist.objects.filter(id__in={event[2] for event in events if event[2]}).values_list('id', flat=True)
+    )
+    rows = [
+        PlayEvent(
+            user_id=user_id,
+            song_id=song_id,
+            playlist_id=playlist_id if playlist_id in playlist_ids else None,
+            played_at=played_at,
+            ms_played=ms_played,
+        )
+        for user_id, song_id, playlist_id, played_at, ms_played in events
+        if user_id in user_ids and song_id in song_ids
+    ]
+    try:
+        with transaction.atomic():
+            PlayEvent.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+    except (DataError, IntegrityError):
+        logger.warning("Failed to insert %d play events at once, retrying them one by one", len(rows))
+
+    written = 0
+    for row in rows:
+        try:
+            with transaction.atomic():
+                row.save(force_insert=True)
+            written += 1
+        except (DataError, IntegrityError):
+            logger.exception("Dropping play event of user %s on song %s", row.user_id, row.song_id)
+    return written
+
+
+play_counter = PlayCounter(settings.PLAY_COUNT_CACHE, settings.PLAY_COUNT_FLUSH_INTERVAL)
+
+
+def register_play(song_id, user_id, playlist_id=None, ms_played=0, played_at=None):
+    """Count a play of ``song_id`` and buffer its listening-history event."""
+    event = (user_id, song_id, playlist_id, played_at or timezone.now(), ms_played)
+    play_counter.register(song_id, event=event)
@@ -0,0 +1,138 @@
+import base64
+import heapq
+import itertools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from music.models import Follow, Release, ReleaseInboxItem
+from users.models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RELEASE_FANOUT_WORKERS, thread_name_prefix='release-fanout'
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def publish_release(artist_id, album=None, song=None, dispatch=True):
+    """
+    Record a new album or single and fan it out to the artist's followers once
+    the surrounding transaction commits. With ``RELEASE_FANOUT_WORKERS=0`` the
+    fan-out waits for the ``fanout_releases`` command instead.
+    """
+    release = Release.objects.create(artist_id=artist_id, album=album, song=song)
+    if dispatch and settings.RELEASE_FANOUT_WORKERS:
+        transaction.on_commit(lambda: executor().submit(run_in_worker, release.id))
+    return release
+
+
+def run_in_worker(release_id):
+    try:
+        fan_out_release(release_id)
+    except Exception:
+        logger.exception("Fan-out of release %s crashed", release_id)
+    finally:
+        close_old_connections()
+
+
+def fan_out_release(release_id, batch_size=None):
+    """
+    Write an inbox row per follower of the release's artist, one batch per
+    transaction. Progress is kept in ``fanout_cursor`` so an interrupted
+    fan-out resumes where it stopped. Artists above
+    ``RELEASE_FANOUT_MAX_FOLLOWERS`` are switched to fan-out-on-read instead.
+    Returns the number of followers written.
+    """
+    batch_size = batch_size or settings.RELEASE_FANOUT_BATCH_SIZE
+    release = Release.objects.filter(id=release_id, status='pending').first()
+    if release is None:
+        return 0
+
+    # The profile keeps the count, so big artists are switched without counting their followers
+    follower_count = UserProfile.objects.filter(user_id=release.artist_id).values_list('follower_count', flat=True)
+    if (follower_count.first() or 0) > settings.RELEASE_FANOUT_MAX_FOLLOWERS:
+        Release.objects.filter(id=release.id).update(status='pull')
+        return 0
+
+    followers = Follow.objects.filter(followed_id=release.artist_id)
+    cursor = release.fanout_cursor
+    written = 0
+    while True:
+        batch = list(followers.filter(id__gt=cursor).order_by('id').values_list('id', 'follower_id')[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            ReleaseInboxItem.objects.bulk_create(
+                [ReleaseInboxItem(user_id=follower_id, release_id=release.id, published_at=release.published_at)
+                 for _, follower_id in batch],
+                ignore_conflicts=True,
+            )
+            cursor = batch[-1][0]
+            Release.objects.filter(id=release.id).update(fanout_cursor=cursor)
+        written += len(batch)
+
+    Release.objects.filter(id=release.id).update(status='done')
+    return written
+
+
+def encode_cursor(published_at, release_id):
+    return base64.urlsafe_b64encode(f'{published_at.isoformat()}|{release_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """``(published_at, release_id)`` from a feed cursor, or ``None`` if it is not valid."""
+    try:
+        published_at, release_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        published_at = parse_datetime(published_at)
+        return (published_at, int(release_id)) if published_at else None
+    except (ValueError, UnicodeError):
+        return None
+
+
+def release_feed(user, limit, before=None):
+    """
+    Newest releases from the artists ``user`` follows, as ``(releases, next_key)``.
+    Pushed releases come from one range scan over the user's inbox, releases of
+    ``pull`` artists from their own index; both are merged on
+    ``(published_at, id)``. ``before`` is the key returned for the previous page.
+    """
+    inbox = ReleaseInboxItem.objects.filter(user=user)
+    pulled = Release.objects.filter(
+        status='pull', artist__in=Follow.objects.filter(follower=user).values('followed')
+    )
+    if before:
+        published_at, release_id = before
+        inbox = inbox.filter(Q(published_at__lt=published_at) | Q(published_at=published_at, release_id__lt=release_id))
+        pulled = pulled.filter(Q(published_at__lt=published_at) | Q(published_at=published_at, id__lt=release_id))
+
+    keys = heapq.merge(
+        inbox.order_by('-published_at', '-release_id').values_list('published_at', 'release_id')[:limit + 1],
+        pulled.order_by('-published_at', '-id').values_list('published_at', 'id')[:limit + 1],
+        reverse=True,
+    )
+    keys = list(itertools.islice(keys, limit + 1))
+    page = keys[:limit]
+
+    releases = Release.objects.select_related(
+        'artist', 'artist__user_profile', 'album', 'album__artist', 'album__artist__user_profile', 'song'
+    ).in_bulk([release_id for _, release_id in page])
+    next_key = page[-1] if len(keys) > limit else None
+    return [releases[release_id] for _, release_id in page if release_id in releases], next_key
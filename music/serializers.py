@@ -1,99 +1,84 @@
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from rest_framework import serializers
-from music.models import Album, Genre, Song, LikeSong, UnlikeSong
+from music.models import Album, Genre, Song, LikeSong, UnlikeSong, Release
+from music.transcoding import enqueue_transcode
+from music.utils import add_m2m_rows, resolve_genres
+from spotify_clone.serializers import DynamicFieldsMixin, ImageDerivativesField
 
 User = get_user_model()
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Genre
         fields = '__all__'
 
-class SongSerializer(serializers.ModelSerializer):
+class SongSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     genres = serializers.ListField(child=serializers.CharField(), required=False, write_only=True)
     featured_artists = serializers.ListField(child=serializers.UUIDField(), required=False, write_only=True)
-    featured_artists_details = serializers.SerializerMethodField()
+    song_cover_image_sizes = ImageDerivativesField(source='song_cover_image')
 
     class Meta:
         model = Song
         fields = [
-            'id', 'title', 'song_cover_image', 'album', 'featured_artists', 'featured_artists_details', 'duration',
+            'id', 'title', 'song_cover_image', 'song_cover_image_sizes', 'album', 'featured_artists', 'duration',
             'lyrics', 'genres', 'audio_file', 'plays_count', 'description','created_at', 'released_date']
         extra_kwargs = {
             'album': {'required': False}
         }
+        expandable_fields = {
+            'featured_artists_details': {
+                'serializer': 'users.serializers.UserResponseSerializer',
+                'source': 'featured_artists',
+                'many': True,
+                'prefetch': ['featured_artists__user_profile'],
+                'default': True,
+            },
+        }
+
+    def validate_featured_artists(self, value):
+        artist_ids = list(dict.fromkeys(value))
+        found_ids = set(User.objects.filter(id__in=artist_ids).values_list('id', flat=True))
+        for artist in artist_ids:
+            if artist not in found_ids:
+                raise serializers.ValidationError(f"Artist with UUID '{artist}' does not exist")
+        return artist_ids
+
+    def add_genres_and_artists(self, song, genre_names, featured_artist_ids):
+        genre_ids = resolve_genres(genre_names)
+        add_m2m_rows(Song.genre, [(song.id, genre_id) for genre_id in genre_ids.values()])
+        add_m2m_rows(Song.featured_artists, [(song.id, artist_id) for artist_id in featured_artist_ids])
 
     def create(self, validated_data):
         genre_names = validated_data.pop('genres', [])
         featured_artist_ids = validated_data.pop('featured_artists', [])
-        album = validated_data.get('album')
 
         with transaction.atomic():
             song = Song.objects.create(**validated_data)
-
-            if genre_names:
-                genres = []
-                for genre_name in genre_names:
-                    genre, _ = Genre.objects.get_or_create(name=genre_name)
-                    genres.append(genre)
-
-                song.genre.set(genres)
-
-            if featured_artist_ids:
-                featured_artists = []
-                for artist in featured_artist_ids:
-                    try:
-                        artist = User.objects.get(id=artist)
-                        featured_artists.append(artist)
-                    except User.DoesNotExist:
-                        song.delete()
-                        raise serializers.ValidationError(
-                            f"Artist with UUID '{artist}' does not exist"
-                        )
-
-                song.featured_artists.set(featured_artists)
-
-            if album:
-                try:
-                    album_instance = Album.objects.get(id=album.id)
-                    album_instance.total_songs += 1
-                    album_instance.save()
-                except Album.DoesNotExist:
-                    song.delete()
-                    raise serializers.ValidationError("Album not found")
+            self.add_genres_and_artists(song, genre_names, featured_artist_ids)
+            enqueue_transcode(song)
         return song
 
     def update(self, instance, validated_data):
         genre_names = validated_data.pop('genres', [])
         featured_artist_ids = validated_data.pop('featured_artists', [])
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
 
-        if genre_names:
-            for genre_name in genre_names:
-                genre, _ = Genre.objects.get_or_create(name=genre_name)
-                instance.genre.add(genre)
+            if 'audio_file' in validated_data:
+                enqueue_transcode(instance)
 
-        if featured_artist_ids:
-            for artist in featured_artist_ids:
-                try:
-                    artist = User.objects.get(id=artist)
-                    instance.featured_artists.add(artist)
-                except User.DoesNotExist:
-                    raise serializers.ValidationError(f"Artist with UUID '{artist}' does not exist")
+            self.add_genres_and_artists(instance, genre_names, featured_artist_ids)
 
         return instance
 
-    def get_featured_artists_details(self, obj):
-        from users.serializers import UserResponseSerializer
-        return UserResponseSerializer(obj.featured_artists.all(), many=True).data
-
 
 class AlbumSerializer(serializers.ModelSerializer):
     genres = serializers.ListField(child=serializers.CharField(), required=False, write_only=True)
+    total_songs = serializers.IntegerField(source='track_count', read_only=True)
 
     class Meta:
         model = Album
@@ -101,7 +86,6 @@ class AlbumSerializer(serializers.ModelSerializer):
             'title', 'artist', 'description', 'release_date', 'cover_image', 'total_songs', 'genres']
         extra_kwargs = {
             'artist': {'required': False},
-            'total_songs': {'required': False}
         }
 
     def create(self, validated_data):
@@ -115,33 +99,72 @@ class AlbumSerializer(serializers.ModelSerializer):
         return instance
 
 
-class AlbumResponseSerializer(serializers.ModelSerializer):
-    songs = SongSerializer(many=True, read_only=True)
+class AlbumResponseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     artist = serializers.SerializerMethodField()
+    cover_image_sizes = ImageDerivativesField(source='cover_image')
+    total_songs = serializers.IntegerField(source='track_count', read_only=True)
 
     class Meta:
         model = Album
         fields = [
-            'id', 'title', 'artist', 'description', 'release_date', 'cover_image', 'total_songs', 'songs']
+            'id', 'title', 'artist', 'description', 'release_date', 'cover_image', 'cover_image_sizes', 'total_songs',
+            'total_duration', 'total_plays', 'total_likes']
+        expandable_fields = {
+            'songs': {
+                'serializer': SongSerializer,
+                'many': True,
+                'prefetch': ['songs'],
+            },
+        }
 
     def get_artist(self, obj):
         from users.serializers import UserResponseSerializer
         return UserResponseSerializer(obj.artist).data
 
-class SongResponseSerializer(serializers.ModelSerializer):
-    genre_details = GenreSerializer(many=True, read_only=True, source='genre')
-    featured_artists_details = serializers.SerializerMethodField()
-    album_details = AlbumResponseSerializer(source='album', read_only=True)
+class SongResponseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    song_cover_image_sizes = ImageDerivativesField(source='song_cover_image')
 
     class Meta:
         model = Song
         fields = [
-            'id', 'title', 'song_cover_image', 'album', 'album_details', 'featured_artists_details', 'duration', 'likes', 'dislikes',
-            'lyrics', 'genre_details', 'audio_file', 'plays_count', 'description', 'created_at', 'released_date']
+            'id', 'title', 'song_cover_image', 'song_cover_image_sizes', 'album', 'duration', 'likes', 'dislikes',
+            'lyrics', 'audio_file', 'plays_count', 'description', 'created_at', 'released_date']
+        expandable_fields = {
+            'album_details': {
+                'serializer': AlbumResponseSerializer,
+                'source': 'album',
+                'prefetch': ['album__artist__user_profile'],
+            },
+            'featured_artists_details': {
+                'serializer': 'users.serializers.UserResponseSerializer',
+                'source': 'featured_artists',
+                'many': True,
+                'prefetch': ['featured_artists__user_profile'],
+            },
+            'genre_details': {
+                'serializer': GenreSerializer,
+                'source': 'genre',
+                'many': True,
+                'prefetch': ['genre'],
+            },
+        }
+
+class ReleaseSerializer(serializers.ModelSerializer):
+    type = serializers.SerializerMethodField()
+    artist = serializers.SerializerMethodField()
+    album = AlbumResponseSerializer(read_only=True)
+    song = SongResponseSerializer(read_only=True)
+
+    class Meta:
+        model = Release
+        fields = ['id', 'type', 'published_at', 'artist', 'album', 'song']
 
-    def get_featured_artists_details(self, obj):
+    def get_type(self, obj):
+        return 'album' if obj.album_id else 'song'
+
+    def get_artist(self, obj):
         from users.serializers import UserResponseSerializer
-        return UserResponseSerializer(obj.featured_artists.all(), many=True).data
+        return UserResponseSerializer(obj.artist).data
 
 class LikeSongSerializer(serializers.ModelSerializer):
     song = serializers.PrimaryKeyRelatedField( queryset=Song.objects.all(), required=True,
@@ -151,16 +174,32 @@ class LikeSongSerializer(serializers.ModelSerializer):
         model = LikeSong
         fields = ['song']
 
-class LikeSongResponseSerializer(serializers.ModelSerializer):
-    song = SongResponseSerializer()
+class TrackSerializer(serializers.ModelSerializer):
+    """Flat song representation for long lists, readable from one joined query."""
+    album_title = serializers.CharField(source='album.title', read_only=True, default=None)
+    artist = serializers.UUIDField(source='album.artist_id', read_only=True, default=None)
     display_name = serializers.SerializerMethodField()
+    song_cover_image_sizes = ImageDerivativesField(source='song_cover_image')
 
     class Meta:
-        model = LikeSong
-        fields = ['song', 'display_name']
+        model = Song
+        fields = [
+            'id', 'title', 'song_cover_image', 'song_cover_image_sizes', 'duration', 'album', 'album_title', 'artist', 'display_name',
+            'audio_file', 'plays_count', 'likes']
 
     def get_display_name(self, obj):
-        return obj.song.album.artist.user_profile.display_name
+        if obj.album is None:
+            return None
+        artist = obj.album.artist
+        return artist.user_profile.display_name if hasattr(artist, 'user_profile') else artist.username
+
+
+class LikedSongSerializer(serializers.ModelSerializer):
+    song = TrackSerializer()
+
+    class Meta:
+        model = LikeSong
+        fields = ['song', 'liked_at']
 
 
 class UnlikeSongSerializer(serializers.ModelSerializer):
@@ -172,10 +211,21 @@ class UnlikeSongSerializer(serializers.ModelSerializer):
         fields = ['song']
 
 
+class BulkSongReactionSerializer(serializers.Serializer):
+    songs = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=500)
+
+
 class FollowUserSerializer(serializers.ModelSerializer):
     followed = serializers.PrimaryKeyRelatedField( queryset=User.objects.all(), required=True,
                                                    error_messages={"does_not_exist": "User not found with this id"})
 
     class Meta:
         model = LikeSong
-        fields = ['followed']
\ No newline at end of file
+        fields = ['followed']
+
+class BulkFollowUserSerializer(serializers.Serializer):
+    users = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=500)
+
+
+class FollowStatusSerializer(serializers.Serializer):
+    users = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=100)
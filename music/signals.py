@@ -0,0 +1,85 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from music.models import Album, Follow, Genre, Song
+from music.releases import publish_release
+from music.stats import adjust_artist_stats, adjust_follow_counts, move_song_stats
+from music.utils import genre_id_cache
+
+SONG_STATS_FIELDS = ('album_id', 'duration')
+
+
+@receiver([post_save, post_delete], sender=Genre)
+def invalidate_genre_ids(sender, **kwargs):
+    genre_id_cache.invalidate()
+
+
+def deleted_directly(model, origin):
+    """Whether a delete started from ``model`` rather than cascading from a parent row."""
+    return getattr(origin, 'model', type(origin)) is model
+
+
+def writes_song_stats(update_fields):
+    return update_fields is None or bool({'album', 'album_id', 'duration'} & set(update_fields))
+
+
+@receiver(pre_save, sender=Song)
+def remember_song_stats(sender, instance, update_fields=None, **kwargs):
+    instance._previous_stats = None
+    if instance._state.adding or not writes_song_stats(update_fields):
+        return
+    instance._previous_stats = getattr(instance, '_saved_stats', None)
+    if instance._previous_stats is None:
+        # Not loaded with its album and duration, e.g. built by hand or with only()
+        instance._previous_stats = Song.objects.filter(pk=instance.pk).values(*SONG_STATS_FIELDS).first()
+
+
+@receiver(post_save, sender=Song)
+def update_album_stats_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if not writes_song_stats(update_fields):
+        return
+    current = {field: getattr(instance, field) for field in SONG_STATS_FIELDS}
+    move_song_stats(None if created else instance._previous_stats, current)
+    instance._saved_stats = current
+
+
+@receiver(post_delete, sender=Song)
+def update_album_stats_on_delete(sender, instance, origin=None, **kwargs):
+    # When the album itself is deleted its row takes the song totals with it
+    if deleted_directly(Song, origin):
+        move_song_stats({field: getattr(instance, field) for field in SONG_STATS_FIELDS}, None)
+
+
+@receiver(post_save, sender=Album)
+def count_new_album(sender, instance, created, **kwargs):
+    if created:
+        adjust_artist_stats({instance.artist_id: {'album_count': 1}})
+
+
+@receiver(post_save, sender=Album)
+def publish_new_album(sender, instance, created, **kwargs):
+    # Songs added to the album are part of this release, and songs without an
+    # album have no artist to announce them
+    if created:
+        publish_release(instance.artist_id, album=instance)
+
+
+@receiver(post_delete, sender=Album)
+def uncount_deleted_album(sender, instance, origin=None, **kwargs):
+    if deleted_directly(Album, origin):
+        adjust_artist_stats({instance.artist_id: {
+            'album_count': -1,
+            'track_count': -instance.track_count,
+            'total_plays': -instance.total_plays,
+            'total_likes': -instance.total_likes,
+        }})
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        adjust_follow_counts(instance.follower_id, instance.followed_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    adjust_follow_counts(instance.follower_id, instance.followed_id, -1)
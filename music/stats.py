@@ -0,0 +1,195 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Case, Count, DurationField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from music.models import Album, ArtistStats, Follow, Song
+from users.models import UserProfile
+
+ARTIST_FIELDS = ('album_count', 'track_count', 'total_plays', 'total_likes')
+
+
+def delta_case(deltas, field='id'):
+    """Build a ``CASE`` picking each row's delta from ``{key: delta}``, matching ``field`` against the keys."""
+    keys_by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        keys_by_delta[delta].append(key)
+    whens = [When(**{f'{field}__in': keys}, then=Value(delta)) for delta, keys in keys_by_delta.items()]
+    return Case(*whens, default=Value(0)) if whens else Value(0)
+
+
+def id_chunks(queryset, chunk_size):
+    """Yield lists of ids from ``queryset`` ordered by id, one keyset page at a time."""
+    last_id = None
+    while True:
+        page = queryset.order_by('id')
+        if last_id is not None:
+            page = page.filter(id__gt=last_id)
+        ids = list(page.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def adjust_artist_stats(artist_deltas):
+    """Apply ``{artist_id: {field: delta}}`` to ``ArtistStats``, creating missing rows."""
+    artist_deltas = {
+        artist_id: {field: delta for field, delta in deltas.items() if field in ARTIST_FIELDS and delta}
+        for artist_id, deltas in artist_deltas.items()
+    }
+    artist_deltas = {artist_id: deltas for artist_id, deltas in artist_deltas.items() if deltas}
+    if not artist_deltas:
+        return
+
+    ArtistStats.objects.bulk_create([ArtistStats(artist_id=artist_id) for artist_id in artist_deltas],
+                                    ignore_conflicts=True)
+    fields = {field for deltas in artist_deltas.values() for field in deltas}
+    ArtistStats.objects.filter(artist_id__in=artist_deltas).update(**{
+        field: F(field) + delta_case(
+            {artist_id: deltas[field] for artist_id, deltas in artist_deltas.items() if field in deltas},
+            field='artist_id',
+        )
+        for field in fields
+    })
+
+
+def adjust_album_stats(album_id, **deltas):
+    """Apply field deltas to one album and the matching ones to its artist."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    artist_id = Album.objects.filter(id=album_id).values_list('artist_id', flat=True).first()
+    if not deltas or artist_id is None:
+        return
+    Album.objects.filter(id=album_id).update(**{field: F(field) + delta for field, delta in deltas.items()})
+    adjust_artist_stats({artist_id: deltas})
+
+
+def song_stats(song):
+    return {'track_count': 1, 'total_duration': song['duration']}
+
+
+def move_song_stats(previous, current):
+    """
+    Keep album track counts and durations in step with a song being created,
+    edited or deleted. ``previous``/``current`` are dicts of ``album_id`` and
+    ``duration``, or ``None``. Play and like totals are left to
+    ``rebuild_catalog_stats``.
+    """
+    if previous and current and previous['album_id'] == current['album_id'] \
+            and previous['duration'] == current['duration']:
+        return
+    if previous and previous['album_id']:
+        adjust_album_stats(previous['album_id'], **{
+            field: -value for field, value in song_stats(previous).items()
+        })
+    if current and current['album_id']:
+        adjust_album_stats(current['album_id'], **song_stats(current))
+
+
+def album_aggregates():
+    songs = Song.objects.filter(album=OuterRef('pk')).order_by().values('album')
+
+    def total(aggregate, default):
+        return Coalesce(Subquery(songs.annotate(total=aggregate).values('total')), default)
+
+    return {
+        'track_count': total(Count('id'), Value(0)),
+        'total_duration': total(Sum('duration'), Value(timedelta(), output_field=DurationField())),
+        'total_plays': total(Sum('plays_count'), Value(0)),
+        'total_likes': total(Sum('likes'), Value(0)),
+    }
+
+
+def refresh_album_stats(album_ids):
+    """Recompute the aggregates of ``album_ids`` and their artists from scratch."""
+    album_ids = set(album_ids)
+    if not album_ids:
+        return
+    Album.objects.filter(id__in=album_ids).update(**album_aggregates())
+    artist_ids = set(Album.objects.filter(id__in=album_ids).values_list('artist_id', flat=True))
+    refresh_artist_stats(artist_ids)
+
+
+def artist_totals(artist_ids):
+    totals = {artist_id: dict.fromkeys(ARTIST_FIELDS, 0) for artist_id in artist_ids}
+    rows = (
+        Album.objects.filter(artist_id__in=artist_ids).order_by()
+        .values('artist_id')
+        .annotate(album_count=Count('id'), track_count=Sum('track_count'),
+                  total_plays=Sum('total_plays'), total_likes=Sum('total_likes'))
+    )
+    for row in rows:
+        totals[row.pop('artist_id')] = row
+    return totals
+
+
+def refresh_artist_stats(artist_ids, dry_run=False):
+    """Rewrite ``ArtistStats`` for ``artist_ids`` from their albums. Returns how many had drifted."""
+    totals = artist_totals(artist_ids)
+    existing = ArtistStats.objects.in_bulk(list(totals))
+    drifted = []
+    for artist_id, values in totals.items():
+        stats = existing.get(artist_id) or ArtistStats(artist_id=artist_id)
+        if any(getattr(stats, field) != values[field] for field in ARTIST_FIELDS):
+            for field in ARTIST_FIELDS:
+                setattr(stats, field, values[field])
+            drifted.append(stats)
+
+    if not dry_run:
+        ArtistStats.objects.bulk_create(
+            [stats for stats in drifted if stats.artist_id not in existing], ignore_conflicts=True
+        )
+        ArtistStats.objects.bulk_update(
+            [stats for stats in drifted if stats.artist_id in existing], list(ARTIST_FIELDS)
+        )
+    return len(drifted)
+
+
+def rebuild_catalog_stats(chunk_size=1000, dry_run=False):
+    """
+    Recompute album and artist aggregates one chunk at a time and return
+    ``(drifted_albums, drifted_artists)``. With ``dry_run`` nothing is written.
+    """
+    fields = ['track_count', 'total_duration', 'total_plays', 'total_likes']
+    drifted_albums = 0
+    artist_ids = set()
+    for album_ids in id_chunks(Album.objects.all(), chunk_size):
+        with transaction.atomic():
+            albums = list(Album.objects.select_for_update().filter(id__in=album_ids).only('id', 'artist_id', *fields))
+            aggregates = {f'expected_{field}': value for field, value in album_aggregates().items()}
+            expected = {row.pop('id'): row for row in Album.objects.filter(id__in=album_ids).values('id', **aggregates)}
+            changed = []
+            for album in albums:
+                artist_ids.add(album.artist_id)
+                if any(getattr(album, field) != expected[album.id][f'expected_{field}'] for field in fields):
+                    for field in fields:
+                        setattr(album, field, expected[album.id][f'expected_{field}'])
+                    changed.append(album)
+            if not dry_run:
+                Album.objects.bulk_update(changed, fields)
+            drifted_albums += len(changed)
+
+    # Artists whose albums are all gone still have a stats row to zero out
+    artist_ids |= set(ArtistStats.objects.values_list('artist_id', flat=True))
+    artist_ids = sorted(artist_ids)
+    drifted_artists = 0
+    for start in range(0, len(artist_ids), chunk_size):
+        with transaction.atomic():
+            drifted_artists += refresh_artist_stats(artist_ids[start:start + chunk_size], dry_run=dry_run)
+    return drifted_albums, drifted_artists
+
+
+def adjust_follow_counts(follower_id, followed_id, delta):
+    UserProfile.objects.filter(user_id=follower_id).update(following_count=F('following_count') + delta)
+    UserProfile.objects.filter(user_id=followed_id).update(follower_count=F('follower_count') + delta)
+
+
+def refresh_follow_counts(user_ids):
+    """Recount followers and followings of ``user_ids`` from ``Follow``."""
+    def count(field):
+        follows = Follow.objects.filter(**{field: OuterRef('user_id')}).order_by().values(field)
+        return Coalesce(Subquery(follows.annotate(total=Count('id')).values('total')), Value(0))
+
+    UserProfile.objects.filter(user_id__in=user_ids).update(
+        follower_count=count('followed'), following_count=count('follower')
+    )
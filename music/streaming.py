@@ -0,0 +1,198 @@
+import mimetypes
+import os
+import re
+import secrets
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+RANGE_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+MAX_RANGES = 16
+BLOCK_SIZE = 64 * 1024
+
+
+def parse_range_header(header, size):
+    """
+    Parse a ``Range: bytes=...`` header into inclusive ``(start, end)`` pairs.
+
+    Returns ``None`` when the header is missing or malformed (serve the whole
+    file) and ``[]`` when none of the ranges overlap the file (416).
+    """
+    units, _, spec = (header or '').partition('=')
+    if units.strip().lower() != 'bytes' or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        match = RANGE_RE.match(part)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if not first:
+            # Suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+            if not int(last):
+                continue
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        if start < size:
+            ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+class FileRange:
+    """
+    File-like view over ``length`` bytes of ``file`` starting at ``start``.
+
+    ``fileno()`` is passed through so WSGI servers with ``wsgi.file_wrapper``
+    (gunicorn) can ``sendfile`` the slice from the current offset.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+HLS_CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+
+def content_type_for(name):
+    extension = os.path.splitext(name)[1]
+    if extension in HLS_CONTENT_TYPES:
+        return HLS_CONTENT_TYPES[extension]
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def if_range_passes(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Only a strong match allows a partial response
+        return not if_range.startswith('W/') and etag in parse_etags(if_range)
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def multipart_ranges(file, ranges, size, content_type, boundary):
+    """Return ``(parts, content_length)`` for a ``multipart/byteranges`` body."""
+    headers = [
+        f'--{boundary}\r\nContent-Type: {content_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n'.encode()
+        for start, end in ranges
+    ]
+    closing = f'--{boundary}--\r\n'.encode()
+    length = sum(len(header) + end - start + 1 + 2 for header, (start, end) in zip(headers, ranges)) + len(closing)
+
+    def parts():
+        try:
+            for header, (start, end) in zip(headers, ranges):
+                yield header
+                part = FileRange(file, start, end - start + 1)
+                for chunk in iter(lambda: part.read(BLOCK_SIZE), b''):
+                    yield chunk
+                yield b'\r\n'
+            yield closing
+        finally:
+            file.close()
+
+    return parts(), length
+
+
+def offload_response(storage, name, content_type):
+    """Hand the transfer to the front proxy, which handles ranges itself."""
+    response = HttpResponse(content_type=content_type)
+    if settings.AUDIO_STREAM_OFFLOAD == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.AUDIO_STREAM_ACCEL_PREFIX.rstrip('/') + '/' + name
+    else:
+        response['X-Sendfile'] = storage.path(name)
+    return response
+
+
+def stream_file(request, storage, name, cache_control=None):
+    """
+    Serve the stored file ``name`` with ``Range``, ``ETag`` and ``Last-Modified`` support.
+    Single ranges and whole files go through ``FileResponse`` so they can be
+    sent with ``sendfile``; multiple ranges come back as ``multipart/byteranges``.
+    ``cache_control`` overrides the default private ``Cache-Control`` directives.
+    Raises ``Http404`` when the file is missing from the storage.
+    """
+    try:
+        size = storage.size(name)
+        last_modified = int(storage.get_modified_time(name).timestamp())
+    except FileNotFoundError:
+        raise Http404("File not found.")
+    etag = quote_etag(f'{size:x}-{last_modified:x}')
+    content_type = content_type_for(name)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if settings.AUDIO_STREAM_OFFLOAD:
+            response = offload_response(storage, name, content_type)
+        else:
+            response = range_response(request, storage, name, size, content_type, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, **(cache_control or {'private': True, 'max_age': settings.AUDIO_STREAM_MAX_AGE}))
+    return response
+
+
+def range_response(request, storage, name, size, content_type, etag, last_modified):
+    ranges = None
+    if if_range_passes(request, etag, last_modified):
+        ranges = parse_range_header(request.META.get('HTTP_RANGE'), size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    try:
+        file = storage.open(name, 'rb')
+    except FileNotFoundError:
+        # Deleted since it was measured
+        raise Http404("File not found.")
+    if not ranges:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = size
+        return response
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = FileResponse(FileRange(file, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return response
+
+    boundary = secrets.token_hex(16)
+    parts, length = multipart_ranges(file, ranges, size, content_type, boundary)
+    response = StreamingHttpResponse(
+        parts, status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+    )
+    response['Content-Length'] = length
+    return response
@@ -1,3 +1,579 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from home.models import PlayEvent
+from music.catalog import import_catalog, record_uuid
+from music.counters import adjust_song_counters
+from music.models import (
+    Album, ArtistStats, Follow, Genre, ImportCheckpoint, LikeSong, Release, Song, SongCounterShard, SongRendition,
+    TranscodeJob, UnlikeSong,
+)
+from music.plays import KEY_PREFIX, LOOKBACK_EPOCHS, PlayCounter, apply_plays, record_play_events
+from music.releases import fan_out_release
+from music.serializers import SongSerializer
+from music.stats import rebuild_catalog_stats
+from music.transcoding import enqueue_transcode, pick_rendition, run_transcode_job
+from music.utils import genre_id_cache, resolve_genres
+from users.models import UserProfile
+
+User = get_user_model()
+
+
+def create_song(title, album=None, **fields):
+    return Song.objects.create(
+        title=title, album=album, duration=timedelta(minutes=3), audio_file=f'songs/audios/{title}.mp3', **fields
+    )
+
+
+class PlayCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='listener')
+        self.song = create_song('Song')
+        self.counter = PlayCounter('default', 30)
+        # No background flusher, the test flushes by hand
+        self.counter._pid = os.getpid()
+
+    def event(self, user_id=None, ms_played=1000):
+        return (user_id or self.user.id, self.song.id, None, timezone.now(), ms_played)
+
+    def test_events_of_deleted_users_are_dropped(self):
+        gone = User.objects.create(username='gone')
+        self.counter.register(self.song.id, event=self.event(gone.id))
+        self.counter.register(self.song.id, event=self.event())
+        gone.delete()
+
+        self.assertEqual(self.counter.flush(), 2)
+
+        self.song.refresh_from_db()
+        self.assertEqual(self.song.plays_count, 2)
+        self.assertEqual(list(PlayEvent.objects.values_list('user_id', flat=True)), [self.user.id])
+
+    def test_a_bad_event_does_not_block_the_buffer(self):
+        self.counter.register(self.song.id, event=self.event(ms_played=-1))
+        self.counter.register(self.song.id, event=self.event())
+
+        with self.assertLogs('music.plays', 'WARNING'):
+            self.assertEqual(self.counter.flush(), 2)
+        # Nothing is left to retry on the next flush
+        self.assertEqual(self.counter.flush(), 0)
+
+        self.song.refresh_from_db()
+        self.assertEqual(self.song.plays_count, 2)
+        self.assertEqual(PlayEvent.objects.count(), 1)
+
+    def test_flush_folds_sharded_like_counters(self):
+        song = create_song('Hot', counter_shards=4)
+        with mock.patch('music.plays.play_counter.start'):
+            for _ in range(3):
+                adjust_song_counters(song, likes=1)
+            adjust_song_counters(song, dislikes=1)
+        song.refresh_from_db()
+        self.assertEqual((song.likes, song.dislikes), (0, 0))
+
+        self.counter.flush()
+
+        song.refresh_from_db()
+        self.assertEqual((song.likes, song.dislikes), (3, 1))
+        self.assertFalse(SongCounterShard.objects.exclude(likes=0, dislikes=0).exists())
+
+    def plays_count(self):
+        self.song.refresh_from_db()
+        return self.song.plays_count
+
+    def test_plays_from_every_epoch_since_the_last_flush_are_applied(self):
+        with mock.patch.object(self.counter, 'current_epoch', return_value=100):
+            self.counter.register(self.song.id, event=self.event())
+        with mock.patch.object(self.counter, 'current_epoch', return_value=101):
+            self.counter.register(self.song.id, count=2, event=self.event())
+            self.assertEqual(self.counter.flush(), 3)
+
+        self.assertEqual(self.plays_count(), 3)
+        self.assertEqual(PlayEvent.objects.count(), 2)
+
+    def test_open_epochs_are_kept_and_sealed_ones_cleared(self):
+        with mock.patch.object(self.counter, 'current_epoch', return_value=100):
+            self.counter.register(self.song.id, event=self.event())
+            # A slot reserved by a request that has not written its event yet
+            self.counter.incr(self.counter.key(100, 'events'), 1)
+            self.counter.flush()
+            self.assertEqual(self.counter.flush(), 0)
+        self.assertEqual(self.plays_count(), 1)
+        self.assertEqual(PlayEvent.objects.count(), 1)
+        self.assertIsNotNone(cache.get(self.counter.key(100, 'n')))
+
+        self.counter.cache.set(self.counter.key(100, 'event', 2), self.event(), 60)
+        with mock.patch.object(self.counter, 'current_epoch', return_value=102):
+            self.assertEqual(self.counter.flush(), 0)
+        # The late event is picked up once, and the sealed epoch is gone
+        self.assertEqual(self.plays_count(), 1)
+        self.assertEqual(PlayEvent.objects.count(), 2)
+        self.assertIsNone(cache.get(self.counter.key(100, 'n')))
+        self.assertIsNone(cache.get(self.counter.key(100, 'song', self.song.id)))
+
+    def test_plays_registered_during_a_flush_are_not_lost(self):
+        apply_plays = mock.Mock(side_effect=lambda counts: self.counter.register(self.song.id))
+        with mock.patch.object(self.counter, 'current_epoch', return_value=100):
+            self.counter.register(self.song.id)
+            with mock.patch('music.plays.apply_plays', apply_plays):
+                self.assertEqual(self.counter.flush(), 1)
+            apply_plays.assert_called_once_with({str(self.song.id): 1})
+            # The play that arrived mid-flush is left for the next one
+            self.assertEqual(self.counter.flush(), 1)
+        self.assertEqual(self.plays_count(), 1)
+
+    def test_flush_looks_back_a_bounded_number_of_epochs(self):
+        cache.set(f'{KEY_PREFIX}:drained', 0, None)
+        with mock.patch.object(self.counter, 'current_epoch', return_value=10 ** 6), \
+                mock.patch.object(self.counter, 'drain_epoch', return_value=0) as drain_epoch, \
+                self.assertLogs('music.plays', 'WARNING'):
+            self.counter.flush()
+        self.assertEqual(drain_epoch.call_count, LOOKBACK_EPOCHS)
+        self.assertEqual(cache.get(f'{KEY_PREFIX}:drained'), 10 ** 6 - 2)
+
+    def test_flush_stops_when_its_lock_is_taken_over(self):
+        def drain_epoch(epoch, sealed):
+            # The lock expired and another process took it
+            cache.set(f'{KEY_PREFIX}:lock', 'other', 60)
+            return 1
+
+        cache.set(f'{KEY_PREFIX}:drained', 95, None)
+        with mock.patch.object(self.counter, 'current_epoch', return_value=100), \
+                mock.patch.object(self.counter, 'drain_epoch', side_effect=drain_epoch) as drained, \
+                self.assertLogs('music.plays', 'WARNING'):
+            self.assertEqual(self.counter.flush(), 1)
+        drained.assert_called_once_with(96, sealed=True)
+        self.assertEqual(cache.get(f'{KEY_PREFIX}:drained'), 96)
+        # The other process still holds its lock
+        self.assertEqual(cache.get(f'{KEY_PREFIX}:lock'), 'other')
+
+    def test_start_registers_an_exit_flush_once_per_process(self):
+        counter = PlayCounter('default', 30)
+        with mock.patch('music.plays.threading.Thread') as thread, mock.patch('music.plays.atexit.register') as register:
+            counter.start()
+            counter.start()
+        thread.return_value.start.assert_called_once_with()
+        register.assert_called_once_with(counter.flush)
+
+        counter.register(self.song.id)
+        # What the exit hook runs drains the buffer
+        self.assertEqual(register.call_args.args[0](), 1)
+        self.assertEqual(self.plays_count(), 1)
+
+    def test_record_play_events_returns_rows_written(self):
+        events = [self.event(), self.event(ms_played=-1), self.event(user_id=123456)]
+        with self.assertLogs('music.plays', 'WARNING'):
+            self.assertEqual(record_play_events(events), 1)
+
+
+class CatalogStatsTests(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create(username='artist')
+        self.album = Album.objects.create(
+            title='Album', artist=self.artist, description='', release_date=timezone.localdate()
+        )
+        self.song = create_song('Song', self.album)
+
+    def totals(self):
+        self.album.refresh_from_db()
+        stats = ArtistStats.objects.get(artist=self.artist)
+        return (self.album.total_plays, self.album.total_likes), (stats.total_plays, stats.total_likes)
+
+    def test_plays_and_likes_leave_totals_to_the_rebuild(self):
+        # The song UPDATE inside its savepoint
+        with self.assertNumQueries(3):
+            apply_plays({str(self.song.id): 3})
+        with self.assertNumQueries(1):
+            adjust_song_counters(self.song, likes=2)
+        self.assertEqual(self.totals(), ((0, 0), (0, 0)))
+
+        rebuild_catalog_stats()
+
+        self.assertEqual(self.totals(), ((3, 2), (3, 2)))
+
+    def test_saving_a_loaded_song_does_not_read_it_again(self):
+        song = Song.objects.get(id=self.song.id)
+        song.title = 'Renamed'
+        with self.assertNumQueries(1):
+            song.save(update_fields=['title'])
+        with self.assertNumQueries(1):
+            song.save()
+
+    def test_moving_a_song_moves_its_track_and_duration(self):
+        other = Album.objects.create(title='Other', artist=self.artist, description='', release_date=timezone.localdate())
+        song = Song.objects.get(id=self.song.id)
+        song.album = other
+        song.save()
+        # Saved twice, the second save starts from what the first wrote
+        song.duration = timedelta(minutes=5)
+        song.save()
+
+        counts = dict(Album.objects.values_list('title', 'track_count'))
+        self.assertEqual(counts, {'Album': 0, 'Other': 1})
+        other.refresh_from_db()
+        self.assertEqual(other.total_duration, timedelta(minutes=5))
+        self.assertEqual(ArtistStats.objects.get(artist=self.artist).track_count, 1)
+
+
+class ResolveGenresTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        genre_id_cache.ids = {}
+
+    def test_created_ids_are_cached_on_commit(self):
+        rock = Genre.objects.create(name='rock')
+        with self.captureOnCommitCallbacks(execute=True):
+            genre_ids = resolve_genres(['rock', 'jazz'])
+            self.assertEqual(genre_id_cache.get_many(['rock', 'jazz']), {})
+
+        self.assertEqual(genre_ids['rock'], rock.id)
+        self.assertEqual(genre_id_cache.get_many(['rock', 'jazz']), genre_ids)
+
+    def test_rolled_back_genres_are_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                resolve_genres(['jazz'])
+                transaction.set_rollback(True)
+
+        self.assertFalse(Genre.objects.filter(name='jazz').exists())
+        self.assertEqual(genre_id_cache.get_many(['jazz']), {})
+        self.assertEqual(set(resolve_genres(['jazz'])), {'jazz'})
+
+
+class LikedSongsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='listener')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_do_not_skip_or_repeat_likes_from_the_same_instant(self):
+        songs = [create_song(f'Song {number}') for number in range(7)]
+        LikeSong.objects.bulk_create([LikeSong(user=self.user, song=song) for song in songs])
+        LikeSong.objects.filter(user=self.user).update(liked_at=timezone.now())
+
+        seen, url = [], '/api/songs/liked_songs/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [like['song']['id'] for like in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(sorted(seen), sorted(str(song.id) for song in songs))
+
+
+class SongReactionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='listener')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.songs = [create_song(f'Song {number}') for number in range(3)]
+
+    def bulk_like(self):
+        return self.client.post('/api/like-song/bulk/', {'songs': [str(song.id) for song in self.songs]}, format='json')
+
+    def test_bulk_like_counts_only_songs_it_liked(self):
+        self.client.post('/api/like-song/', {'song': str(self.songs[0].id)}, format='json')
+        self.client.post('/api/unlike-song/', {'song': str(self.songs[1].id)}, format='json')
+
+        response = self.bulk_like()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['liked']), {self.songs[1].id, self.songs[2].id})
+        counters = {song.id: (song.likes, song.dislikes) for song in Song.objects.all()}
+        self.assertEqual(counters, {song.id: (1, 0) for song in self.songs})
+        self.assertFalse(UnlikeSong.objects.exists())
+
+    def test_single_and_bulk_likes_take_the_same_lock(self):
+        with mock.patch('music.views.lock_reactions') as view_lock:
+            self.client.post('/api/like-song/', {'song': str(self.songs[0].id)}, format='json')
+            self.client.post('/api/unlike-song/', {'song': str(self.songs[1].id)}, format='json')
+        self.assertEqual([call.args for call in view_lock.call_args_list], [(self.user,), (self.user,)])
+
+        with mock.patch('music.utils.lock_reactions') as bulk_lock:
+            self.bulk_like()
+        bulk_lock.assert_called_once_with(self.user)
+
+
+class FieldSelectionTests(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create(username='artist')
+        self.album = Album.objects.create(
+            title='Album', artist=self.artist, description='', release_date=timezone.localdate()
+        )
+        self.song = create_song('Song', self.album)
+        self.song.featured_artists.add(User.objects.create(username='guest'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.artist)
+
+    def get(self, url):
+        # Song reads register a play, which would start the background flusher
+        with mock.patch('music.viewsets.register_play'), mock.patch('music.viewsets.add_to_recently_played'):
+            return self.client.get(url)
+
+    def test_song_serializer_keeps_featured_artists_by_default(self):
+        data = SongSerializer(self.song).data
+        self.assertEqual([artist['username'] for artist in data['featured_artists_details']], ['guest'])
+        self.assertEqual(set(SongSerializer(self.song, fields=['id', 'title']).data), {'id', 'title'})
+
+    def test_song_detail_is_flat_until_expanded(self):
+        response = self.get(f'/api/songs/{self.song.id}/')
+        self.assertNotIn('album_details', response.data)
+
+        response = self.get(
+            f'/api/songs/{self.song.id}/?expand=album_details.songs,featured_artists_details&fields=id,album_details'
+        )
+        self.assertEqual(set(response.data), {'id', 'album_details', 'featured_artists_details'})
+        album = response.data['album_details']
+        self.assertEqual([song['title'] for song in album['songs']], ['Song'])
+        # Album tracks keep their own default featured artists
+        self.assertEqual([artist['username'] for artist in album['songs'][0]['featured_artists_details']], ['guest'])
+
+    def test_unknown_field_names_are_ignored(self):
+        response = self.get(f'/api/songs/{self.song.id}/?fields=id,nope&expand=bogus')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'id'})
+
+        response = self.get(f'/api/songs/{self.song.id}/?fields=album_details.title,album_details.nope&expand=album_details')
+        self.assertEqual(response.data, {'album_details': {'title': 'Album'}})
+
+    def test_album_expansion_prefetches_nested_defaults(self):
+        for number in range(3):
+            create_song(f'Track {number}', self.album).featured_artists.add(self.artist)
+        # Album, songs, featured artists and their profiles, whatever the track count
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/albums/{self.album.id}/?expand=songs')
+        self.assertEqual(len(response.data['songs']), 4)
+
+
+class ReleaseTests(TestCase):
+    def test_songs_added_to_an_album_share_its_release(self):
+        artist = User.objects.create(username='artist')
+        album = Album.objects.create(title='Album', artist=artist, description='', release_date=timezone.localdate())
+        for number in range(3):
+            create_song(f'Track {number}', album)
+        create_song('Loose')
+
+        self.assertEqual(list(Release.objects.values_list('artist', 'album', 'song')), [(artist.id, album.id, None)])
+
+    def test_fan_out_switches_by_the_profile_follower_count(self):
+        artist = User.objects.create(username='artist')
+        UserProfile.objects.create(user=artist, role='artists', display_name='Artist')
+        for number in range(3):
+            Follow.objects.create(follower=User.objects.create(username=f'fan{number}'), followed=artist)
+        album = Album.objects.create(title='Album', artist=artist, description='', release_date=timezone.localdate())
+
+        with override_settings(RELEASE_FANOUT_MAX_FOLLOWERS=2), self.assertNumQueries(3):
+            self.assertEqual(fan_out_release(album.release.id), 0)
+        self.assertEqual(Release.objects.get().status, 'pull')
+
+        Release.objects.update(status='pending')
+        with override_settings(RELEASE_FANOUT_MAX_FOLLOWERS=3):
+            self.assertEqual(fan_out_release(album.release.id), 3)
+
+
+def fake_ffmpeg(command, **kwargs):
+    """Write the files ffmpeg would, given the outputs ``ffmpeg_command`` lists."""
+    for path in command:
+        if path.endswith(('.m4a', '.m3u8')):
+            with open(path, 'w') as file:
+                file.write(path)
+        elif path.endswith('.pcm'):
+            with open(path, 'wb') as file:
+                file.write(bytes(range(256)) * 100)
+
+
+@override_settings(AUDIO_STREAM_OFFLOAD='', AUDIO_TRANSCODE_BITRATES=[64, 128, 256], AUDIO_STREAM_DEFAULT_BITRATE=128)
+class StreamingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='listener'))
+        self.song = Song.objects.create(title='Gone', duration=timedelta(minutes=3), audio_file='songs/audios/missing.mp3')
+
+    def transcode(self, run=fake_ffmpeg):
+        job = enqueue_transcode(self.song, dispatch=False)
+        with mock.patch('music.transcoding.subprocess.run', side_effect=run) as ffmpeg, \
+                self.captureOnCommitCallbacks(execute=True):
+            done = run_transcode_job(job.id)
+        job.refresh_from_db()
+        return done, job, ffmpeg
+
+    def test_transcode_swaps_renditions_in_and_removes_the_old_ones(self):
+        done, first, _ = self.transcode()
+        self.assertTrue(done)
+        self.assertEqual((first.status, first.attempts), ('done', 1))
+        self.assertEqual(sorted(self.song.renditions.values_list('bitrate', flat=True)), [64, 128, 256])
+        storage = self.song.audio_file.storage
+        self.assertTrue(storage.exists(f'{first.output_dir}/128k.m4a'))
+        self.assertTrue(storage.exists(first.waveform))
+
+        done, second, _ = self.transcode()
+        self.assertTrue(done)
+        self.assertNotEqual(second.output_dir, first.output_dir)
+        self.assertFalse(storage.exists(f'{first.output_dir}/128k.m4a'))
+        self.assertEqual(
+            set(self.song.renditions.values_list('audio_file', flat=True)),
+            {f'{second.output_dir}/{bitrate}k.m4a' for bitrate in (64, 128, 256)},
+        )
+
+    def test_failed_transcode_records_ffmpeg_error(self):
+        def crash(command, **kwargs):
+            raise subprocess.CalledProcessError(1, command, stderr=b'Invalid data found when processing input')
+
+        with self.assertLogs('music.transcoding', 'WARNING'):
+            done, job, _ = self.transcode(crash)
+
+        self.assertFalse(done)
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Invalid data found', job.error)
+        self.assertFalse(SongRendition.objects.exists())
+
+    def test_jobs_are_claimed_once(self):
+        job = enqueue_transcode(self.song, dispatch=False)
+        TranscodeJob.objects.filter(id=job.id).update(status='running')
+        with mock.patch('music.transcoding.subprocess.run') as ffmpeg:
+            self.assertFalse(run_transcode_job(job.id))
+        ffmpeg.assert_not_called()
+
+    def test_output_of_replaced_audio_is_discarded(self):
+        def replace_audio(command, **kwargs):
+            fake_ffmpeg(command)
+            self.song.audio_file = 'songs/audios/new.mp3'
+            self.song.save()
+            enqueue_transcode(self.song, dispatch=False)
+
+        done, job, _ = self.transcode(replace_audio)
+
+        self.assertFalse(done)
+        self.assertEqual((job.status, job.source_name), ('pending', 'songs/audios/new.mp3'))
+        self.assertFalse(SongRendition.objects.exists())
+        _, files = self.song.audio_file.storage.listdir(f'songs/renditions/{self.song.id}')
+        self.assertEqual(files, [])
+
+    def test_pick_rendition(self):
+        SongRendition.objects.bulk_create([
+            SongRendition(song=self.song, bitrate=bitrate, audio_file=f'{bitrate}k.m4a', hls_playlist='')
+            for bitrate in (256, 64, 128)
+        ])
+        self.assertEqual(pick_rendition(self.song).bitrate, 128)
+        self.assertEqual(pick_rendition(self.song, bitrate=200).bitrate, 128)
+        self.assertEqual(pick_rendition(self.song, bitrate=320).bitrate, 256)
+        # Nothing fits below the request, the lowest is the closest
+        self.assertEqual(pick_rendition(self.song, bitrate=32).bitrate, 64)
+        self.assertEqual(pick_rendition(self.song, bitrate=320, save_data=True).bitrate, 64)
+        self.assertIsNone(pick_rendition(create_song('Raw')))
+
+    def test_stream_passes_bitrate_and_save_data(self):
+        with mock.patch('music.viewsets.pick_rendition', return_value=None) as pick, \
+                mock.patch('music.viewsets.stream_file', return_value=HttpResponse()) as stream_file:
+            self.client.get(f'/api/songs/{self.song.id}/stream/?bitrate=64', HTTP_SAVE_DATA='on')
+            self.client.get(f'/api/songs/{self.song.id}/stream/?bitrate=original')
+        pick.assert_called_once_with(mock.ANY, bitrate=64, save_data=True)
+        self.assertEqual(stream_file.call_args.args[2], 'songs/audios/missing.mp3')
+
+    def test_missing_audio_file_is_not_found(self):
+        response = self.client.get(f'/api/songs/{self.song.id}/stream/?bitrate=original')
+        self.assertEqual(response.status_code, 404)
+
+    def test_waveform_serves_peaks_of_the_requested_window(self):
+        samples = [-256, 512] * 40 + [1024, -2048] * 40 + [4096] * 10
+
+        def run(command, **kwargs):
+            fake_ffmpeg(command, **kwargs)
+            with open(next(path for path in command if path.endswith('.pcm')), 'wb') as file:
+                file.write(b''.join(sample.to_bytes(2, 'little', signed=True) for sample in samples))
+
+        self.transcode(run)
+        response = self.client.get(f'/api/songs/{self.song.id}/waveform/?start=0.01&points=1')
+
+        self.assertEqual(response.data, {'start': 0.01, 'end': 0.03, 'points': 1, 'peaks': [-8, 16]})
+        self.assertEqual(self.client.get(f'/api/songs/{self.song.id}/waveform/?end=0.01').data['peaks'], [-1, 2])
+
+    def test_waveform_rejects_non_finite_bounds(self):
+        TranscodeJob.objects.update_or_create(
+            song=self.song, defaults={'status': 'done', 'waveform': 'songs/waveforms/missing.peaks'}
+        )
+        for query in ('start=nan', 'start=inf', 'start=0&end=-inf', 'end=NaN'):
+            response = self.client.get(f'/api/songs/{self.song.id}/waveform/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_missing_hls_segment_is_not_found(self):
+        TranscodeJob.objects.update_or_create(
+            song=self.song,
+            defaults={'status': 'done', 'output_dir': 'songs/hls/missing', 'hls_master': 'songs/hls/missing/master.m3u8'},
+        )
+        response = self.client.get(f'/api/songs/{self.song.id}/hls/128k/segment_000.ts')
+        self.assertEqual(response.status_code, 404)
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create(username='artist', email='artist@example.com')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.manifest = os.path.join(directory, 'catalog.jsonl')
+        records = [
+            {'type': 'album', 'key': 'debut', 'title': 'Debut', 'artist': 'artist', 'release_date': '2024-01-01'},
+            {'type': 'song', 'key': 'opener', 'title': 'Opener', 'album': 'debut', 'duration': '00:03:00',
+             'audio_file': 'songs/audios/opener.mp3', 'genres': 'Rock|Indie'},
+            {'type': 'song', 'title': 'Closer', 'album': 'debut', 'duration': '00:04:00',
+             'audio_file': 'songs/audios/closer.mp3', 'featured_artists': 'artist@example.com'},
+            5,
+            {'type': 'song', 'title': 'Lost', 'album': 'missing', 'duration': '00:02:00',
+             'audio_file': 'songs/audios/lost.mp3'},
+        ]
+        with open(self.manifest, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(record) + '\n' for record in records)
+            file.write('{not json\n')
+
+    def test_import_uses_stable_ids_and_reports_bad_records(self):
+        errors = []
+        totals = import_catalog(self.manifest, chunk_size=2, progress=lambda position, _, chunk: errors.extend(chunk))
+
+        self.assertEqual(totals, {'albums': 1, 'songs': 2, 'existing': 0, 'errors': 3, 'resumed_at': 0})
+        errors = dict(errors)
+        self.assertEqual(sorted(errors), [4, 5, 6])
+        self.assertEqual(errors[4], "expected a JSON object")
+
+        album = Album.objects.get()
+        self.assertEqual(album.id, record_uuid('debut', 'album'))
+        self.assertEqual(album.artist, self.artist)
+        opener = Song.objects.get(id=record_uuid('opener', 'song'))
+        self.assertEqual(opener.album, album)
+        self.assertEqual(set(opener.genre.values_list('name', flat=True)), {'Rock', 'Indie'})
+        closer = Song.objects.get(id=record_uuid('debut:Closer', 'song'))
+        self.assertEqual(list(closer.featured_artists.all()), [self.artist])
+        self.assertEqual(TranscodeJob.objects.filter(status='pending').count(), 2)
+
+    def test_rerun_resumes_from_the_checkpoint(self):
+        import_catalog(self.manifest, name='catalog', chunk_size=2)
+        self.assertEqual(ImportCheckpoint.objects.get(name='catalog').position, 6)
+
+        totals = import_catalog(self.manifest, name='catalog', chunk_size=2)
+
+        self.assertEqual(totals, {'albums': 0, 'songs': 0, 'existing': 0, 'errors': 0, 'resumed_at': 6})
+
+    def test_restart_skips_rows_that_already_exist(self):
+        import_catalog(self.manifest, name='catalog', chunk_size=2)
+
+        totals = import_catalog(self.manifest, name='catalog', chunk_size=2, restart=True)
+
+        self.assertEqual(totals, {'albums': 0, 'songs': 0, 'existing': 3, 'errors': 3, 'resumed_at': 0})
+        self.assertEqual(Album.objects.count(), 1)
+        self.assertEqual(Song.objects.count(), 2)
+        self.assertEqual(TranscodeJob.objects.count(), 2)
@@ -0,0 +1,224 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from music.models import SongRendition, TranscodeJob
+from music.waveforms import PCM_SAMPLE_RATE, compute_peaks, write_peaks
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'songs/renditions'
+HLS_SEGMENT_SECONDS = 6
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Per-process pool; each worker thread drives one ffmpeg subprocess."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AUDIO_TRANSCODE_WORKERS, thread_name_prefix='transcode'
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def enqueue_transcode(song, dispatch=True):
+    """
+    (Re)queue ``song`` for transcoding. The job is handed to the in-process pool
+    once the surrounding transaction commits; with ``AUDIO_TRANSCODE_WORKERS=0``
+    it waits for the ``transcode_songs`` command instead.
+    """
+    # Renditions of the previous audio must not be served anymore, their files
+    # are removed once the new job swaps its output in
+    SongRendition.objects.filter(song=song).delete()
+    job, _ = TranscodeJob.objects.update_or_create(
+        song=song,
+        defaults={
+            'status': 'pending',
+            'source_name': song.audio_file.name,
+            'hls_master': '',
+            'waveform': '',
+            'error': '',
+            'started_at': None,
+            'finished_at': None,
+        },
+    )
+    if dispatch and settings.AUDIO_TRANSCODE_WORKERS:
+        transaction.on_commit(lambda: executor().submit(run_in_worker, job.id))
+    return job
+
+
+def run_in_worker(job_id):
+    try:
+        run_transcode_job(job_id)
+    except Exception:
+        logger.exception("Transcode job %s crashed", job_id)
+    finally:
+        close_old_connections()
+
+
+def ffmpeg_command(source, workdir, bitrates):
+    """
+    Decode ``source`` once and encode a progressive AAC file and an HLS playlist
+    per bitrate, plus low-rate mono PCM for the waveform peaks.
+    """
+    command = [settings.FFMPEG_BINARY, '-nostdin', '-hide_banner', '-loglevel', 'error', '-y', '-i', source]
+    for bitrate in bitrates:
+        hls_dir = os.path.join(workdir, f'{bitrate}k')
+        os.makedirs(hls_dir, exist_ok=True)
+        encode = ['-map', '0:a:0', '-vn', '-c:a', 'aac', '-b:a', f'{bitrate}k']
+        command += encode + ['-movflags', '+faststart', os.path.join(workdir, f'{bitrate}k.m4a')]
+        command += encode + [
+            '-f', 'hls',
+            '-hls_time', str(HLS_SEGMENT_SECONDS),
+            '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', os.path.join(hls_dir, 'segment_%03d.ts'),
+            os.path.join(hls_dir, 'index.m3u8'),
+        ]
+    command += [
+        '-map', '0:a:0', '-vn', '-ac', '1', '-ar', str(PCM_SAMPLE_RATE), '-f', 's16le',
+        os.path.join(workdir, 'waveform.pcm'),
+    ]
+    return command
+
+
+def master_playlist(bitrates):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for bitrate in bitrates:
+        lines += [f'#EXT-X-STREAM-INF:BANDWIDTH={bitrate * 1000},CODECS="mp4a.40.2"', f'{bitrate}k/index.m3u8']
+    return '\n'.join(lines) + '\n'
+
+
+def local_source(storage, name, workdir):
+    """Return a local path ffmpeg can read, downloading from remote storages."""
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        local = os.path.join(workdir, 'source' + os.path.splitext(name)[1])
+        with storage.open(name, 'rb') as src, open(local, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        return local
+
+
+def upload_tree(storage, local_dir, prefix):
+    for root, _, files in os.walk(local_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            name = f"{prefix}/{os.path.relpath(path, local_dir).replace(os.sep, '/')}"
+            with open(path, 'rb') as file:
+                storage.save(name, File(file))
+
+
+def delete_tree(storage, path):
+    try:
+        dirs, files = storage.listdir(path)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for filename in files:
+        storage.delete(f'{path}/{filename}')
+    for dirname in dirs:
+        delete_tree(storage, f'{path}/{dirname}')
+
+
+def run_transcode_job(job_id):
+    """
+    Claim a pending job, transcode its source into every configured bitrate and
+    swap the song's renditions over. Returns ``True`` when the job completed.
+    """
+    claimed = TranscodeJob.objects.filter(id=job_id, status='pending').update(
+        status='running', started_at=timezone.now(), attempts=F('attempts') + 1
+    )
+    if not claimed:
+        return False
+
+    job = TranscodeJob.objects.select_related('song').get(id=job_id)
+    storage = job.song.audio_file.storage
+    bitrates = sorted(set(settings.AUDIO_TRANSCODE_BITRATES))
+    output_dir = f'{RENDITIONS_DIR}/{job.song_id}/{uuid.uuid4().hex[:12]}'
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='transcode-') as workdir:
+            out = os.path.join(workdir, 'out')
+            os.makedirs(out)
+            source = local_source(storage, job.source_name, workdir)
+            subprocess.run(
+                ffmpeg_command(source, out, bitrates),
+                check=True, capture_output=True, timeout=settings.AUDIO_TRANSCODE_TIMEOUT
+            )
+            with open(os.path.join(out, 'master.m3u8'), 'w') as master:
+                master.write(master_playlist(bitrates))
+            pcm = os.path.join(out, 'waveform.pcm')
+            write_peaks(os.path.join(out, 'waveform.peaks'), compute_peaks(pcm))
+            os.remove(pcm)
+            sizes = {bitrate: os.path.getsize(os.path.join(out, f'{bitrate}k.m4a')) for bitrate in bitrates}
+            upload_tree(storage, out, output_dir)
+    except (OSError, subprocess.SubprocessError) as exc:
+        stderr = getattr(exc, 'stderr', None)
+        error = stderr.decode(errors='replace') if stderr else str(exc)
+        TranscodeJob.objects.filter(id=job_id, status='running', source_name=job.source_name).update(
+            status='failed', error=error[-2000:], finished_at=timezone.now()
+        )
+        delete_tree(storage, output_dir)
+        logger.warning("Transcode job %s failed: %s", job_id, error[-500:])
+        return False
+
+    with transaction.atomic():
+        current = TranscodeJob.objects.select_for_update().get(id=job_id)
+        if current.status != 'running' or current.source_name != job.source_name:
+            # The audio was replaced while we were encoding, a newer job owns the song now
+            transaction.on_commit(lambda: delete_tree(storage, output_dir))
+            return False
+
+        previous_dir = current.output_dir
+        SongRendition.objects.filter(song_id=job.song_id).delete()
+        SongRendition.objects.bulk_create([
+            SongRendition(
+                song_id=job.song_id,
+                bitrate=bitrate,
+                audio_file=f'{output_dir}/{bitrate}k.m4a',
+                hls_playlist=f'{output_dir}/{bitrate}k/index.m3u8',
+                size=sizes[bitrate],
+            )
+            for bitrate in bitrates
+        ])
+        current.status = 'done'
+        current.output_dir = output_dir
+        current.hls_master = f'{output_dir}/master.m3u8'
+        current.waveform = f'{output_dir}/waveform.peaks'
+        current.error = ''
+        current.finished_at = timezone.now()
+        current.save()
+        if previous_dir:
+            transaction.on_commit(lambda: delete_tree(storage, previous_dir))
+    return True
+
+
+def pick_rendition(song, bitrate=None, save_data=False):
+    """
+    Choose the rendition to stream: the lowest one for ``Save-Data`` clients,
+    otherwise the highest at or below the requested (or default) bitrate.
+    """
+    renditions = sorted(song.renditions.all(), key=lambda rendition: rendition.bitrate)
+    if not renditions:
+        return None
+    if save_data:
+        return renditions[0]
+    target = bitrate or settings.AUDIO_STREAM_DEFAULT_BITRATE
+    fitting = [rendition for rendition in renditions if rendition.bitrate <= target]
+    return fitting[-1] if fitting else renditions[0]
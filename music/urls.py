@@ -1,6 +1,7 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
-from music.views import LikeSongView, UnlikeSongView, FollowUserView, UnFollowUserView
+from music.views import LikeSongView, UnlikeSongView, FollowUserView, UnFollowUserView, BulkLikeSongView, \
+    BulkUnlikeSongView, BulkFollowUserView, SongHLSView, NewReleasesView
 from music.viewsets import SongViewSet, AlbumViewSet
 
 router = DefaultRouter()
@@ -9,8 +10,15 @@ router.register(r'albums', AlbumViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    # No trailing slash, players resolve segment URLs relative to the playlist
+    re_path(r'^songs/(?P<pk>[0-9a-f-]{36})/hls/(?P<path>[\w-]+(?:/[\w-]+)*\.(?:m3u8|ts))$',
+            SongHLSView.as_view(), name='song-hls'),
     path('like-song/', LikeSongView.as_view(), name='like-song'),
+    path('like-song/bulk/', BulkLikeSongView.as_view(), name='like-song-bulk'),
     path('unlike-song/', UnlikeSongView.as_view(), name='unlike-song'),
+    path('unlike-song/bulk/', BulkUnlikeSongView.as_view(), name='unlike-song-bulk'),
     path('follow_user/', FollowUserView.as_view(), name='follow_user'),
-    path('unfollow_user/', UnFollowUserView.as_view(), name='unfollow_user')
+    path('follow_user/bulk/', BulkFollowUserView.as_view(), name='follow_user_bulk'),
+    path('unfollow_user/', UnFollowUserView.as_view(), name='unfollow_user'),
+    path('releases/', NewReleasesView.as_view(), name='new-releases'),
 ]
\ No newline at end of file
@@ -1,7 +1,172 @@
-from music.models import LikeSong, Song, UnlikeSong
+import uuid
+from functools import partial
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from music.counters import adjust_many_song_counters
+from music.models import Follow, Genre, LikeSong, Song, UnlikeSong
+from music.stats import refresh_follow_counts
 
+User = get_user_model()
 
-def update_counts(song):
-    likes = LikeSong.objects.filter(song=song).count()
-    dislikes= UnlikeSong.objects.filter(song=song).count()
-    Song.objects.filter(id=song.id).update(likes=likes, dislikes=dislikes)
\ No newline at end of file
+
+def parse_playlist_context(request):
+    """Return the ``?playlist=`` a song was opened from, if it is a valid id."""
+    playlist_id = request.query_params.get('playlist')
+    if not playlist_id:
+        return None
+    try:
+        return uuid.UUID(playlist_id)
+    except ValueError:
+        return None
+
+
+class GenreIdCache:
+    """
+    Per-process ``{name: genre_id}`` map. Each lookup compares it against a
+    generation number in the shared cache, which is bumped whenever a genre is
+    saved or deleted, so renames and deletes are seen by every process.
+    """
+    generation_key = 'genres:generation'
+
+    def __init__(self):
+        self.ids = {}
+        self.generation = None
+
+    def get_many(self, names):
+        generation = cache.get_or_set(self.generation_key, 0, None)
+        if generation != self.generation:
+            self.ids = {}
+            self.generation = generation
+        return {name: self.ids[name] for name in names if name in self.ids}
+
+    def set_many(self, genre_ids, generation):
+        if generation == self.generation:
+            self.ids.update(genre_ids)
+
+    def invalidate(self):
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, 1, None)
+        self.ids = {}
+
+
+genre_id_cache = GenreIdCache()
+
+
+def resolve_genres(names):
+    """
+    Return ``{name: genre_id}`` for ``names``. Cache misses are looked up with a
+    single ``IN`` query and the missing genres are created in one insert. The
+    ids are only cached once the caller's transaction commits, so a rollback
+    never leaves ids of genres that were not created in the cache.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    genre_ids = genre_id_cache.get_many(names)
+    generation = genre_id_cache.generation
+    missing = names - set(genre_ids)
+    if missing:
+        found = dict(Genre.objects.filter(name__in=missing).values_list('name', 'id'))
+        if missing - set(found):
+            Genre.objects.bulk_create([Genre(name=name) for name in missing - set(found)], ignore_conflicts=True)
+            found.update(Genre.objects.filter(name__in=missing - set(found)).values_list('name', 'id'))
+        transaction.on_commit(partial(genre_id_cache.set_many, found, generation))
+        genre_ids.update(found)
+    return genre_ids
+
+
+def add_m2m_rows(descriptor, pairs):
+    """Insert ``(source_id, target_id)`` rows into a many-to-many through table, skipping existing ones."""
+    field = descriptor.field
+    through = descriptor.through
+    through.objects.bulk_create(
+        [through(**{field.m2m_column_name(): source, field.m2m_reverse_name(): target}) for source, target in pairs],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def lock_reactions(user):
+    """
+    Serialise every like and unlike of ``user`` for the rest of the transaction,
+    so the rows one request reads as existing are still the only ones when it
+    inserts and counts its own.
+    """
+    User.objects.select_for_update().filter(id=user.id).exists()
+
+
+def bulk_react_to_songs(user, song_ids, model, opposite_model):
+    """
+    Add a ``LikeSong`` or ``UnlikeSong`` row for every song in ``song_ids`` and
+    drop the opposite reaction, with set-based queries regardless of batch size.
+    Returns ``(reacted_ids, not_found_ids)``.
+    """
+    songs = list(Song.objects.filter(id__in=song_ids).only('id', 'counter_shards'))
+    found_ids = {song.id for song in songs}
+
+    with transaction.atomic():
+        # Single likes take the same lock, so no insert below can lose a race
+        # and every id in new_ids is a row this batch added
+        lock_reactions(user)
+
+        existing_ids = set(model.objects.filter(user=user, song_id__in=found_ids).values_list('song_id', flat=True))
+        new_songs = [song for song in songs if song.id not in existing_ids]
+        new_ids = {song.id for song in new_songs}
+        model.objects.bulk_create([model(user=user, song=song) for song in new_songs], ignore_conflicts=True)
+
+        opposite = opposite_model.objects.filter(user=user, song_id__in=new_ids)
+        flipped_ids = set(opposite.values_list('song_id', flat=True))
+        opposite.delete()
+
+        added = dict.fromkeys(new_ids, 1)
+        removed = dict.fromkeys(flipped_ids, -1)
+        if model is LikeSong:
+            adjust_many_song_counters(new_songs, likes=added, dislikes=removed)
+        else:
+            adjust_many_song_counters(new_songs, likes=removed, dislikes=added)
+
+    return new_ids, [song_id for song_id in song_ids if song_id not in found_ids]
+
+
+def bulk_like_songs(user, song_ids):
+    liked, not_found = bulk_react_to_songs(user, song_ids, LikeSong, UnlikeSong)
+    return Response({
+        'message': f'You have successfully liked {len(liked)} songs.',
+        'liked': list(liked),
+        'not_found': not_found,
+    }, status=status.HTTP_200_OK)
+
+
+def bulk_unlike_songs(user, song_ids):
+    unliked, not_found = bulk_react_to_songs(user, song_ids, UnlikeSong, LikeSong)
+    return Response({
+        'message': f'You have successfully unliked {len(unliked)} songs.',
+        'unliked': list(unliked),
+        'not_found': not_found,
+    }, status=status.HTTP_200_OK)
+
+
+def bulk_follow_users(user, user_ids):
+    found_ids = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    existing_ids = set(
+        Follow.objects.filter(follower=user, followed_id__in=found_ids).values_list('followed_id', flat=True)
+    )
+    new_ids = found_ids - existing_ids
+    with transaction.atomic():
+        Follow.objects.bulk_create(
+            [Follow(follower=user, followed_id=followed_id) for followed_id in new_ids],
+            ignore_conflicts=True
+        )
+        # bulk_create skips the signals that maintain the profile counters
+        if new_ids:
+            refresh_follow_counts({user.id, *new_ids})
+    return Response({
+        'message': f'You have successfully Followed {len(new_ids)} Users.',
+        'followed': list(new_ids),
+        'not_found': [user_id for user_id in user_ids if user_id not in found_ids],
+    }, status=status.HTTP_200_OK)
@@ -1,10 +1,18 @@
+from django.db import IntegrityError, transaction
+from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from music.models import LikeSong, UnlikeSong, Follow
-from music.serializers import LikeSongSerializer, UnlikeSongSerializer, FollowUserSerializer
-from music.utils import update_counts
+from music.counters import adjust_song_counters
+from rest_framework.utils.urls import replace_query_param
+from music.models import LikeSong, UnlikeSong, Follow, TranscodeJob, ReleaseInboxItem
+from music.releases import decode_cursor, encode_cursor, release_feed
+from music.serializers import LikeSongSerializer, UnlikeSongSerializer, FollowUserSerializer, \
+    BulkSongReactionSerializer, BulkFollowUserSerializer, ReleaseSerializer
+from music.streaming import stream_file
+from music.utils import bulk_like_songs, bulk_unlike_songs, bulk_follow_users, lock_reactions
+from spotify_clone.pagination import CreatedAtCursorPagination
 
 
 class LikeSongView(APIView):
@@ -19,15 +27,27 @@ class LikeSongView(APIView):
         if LikeSong.objects.filter(user=user, song=song).exists():
             return Response({'message': 'You have already liked this Song.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        LikeSong.objects.create(user=user, song=song)
-        song_ins = UnlikeSong.objects.filter(user=user, song=song).first()
-        if song_ins:
-            song_ins.delete()
+        try:
+            with transaction.atomic():
+                lock_reactions(user)
+                LikeSong.objects.create(user=user, song=song)
+                removed, _ = UnlikeSong.objects.filter(user=user, song=song).delete()
+                adjust_song_counters(song, likes=1, dislikes=-removed)
+        except IntegrityError:
+            return Response({'message': 'You have already liked this Song.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        update_counts(song)
         return Response({'message': 'You have successfully liked this song.'}, status=status.HTTP_200_OK)
 
 
+class BulkLikeSongView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkSongReactionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return bulk_like_songs(request.user, serializer.validated_data['songs'])
+
+
 class UnlikeSongView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -40,14 +60,25 @@ class UnlikeSongView(APIView):
         if UnlikeSong.objects.filter(user=user, song=song).exists():
             return Response({'message': 'You have already unliked this song.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        UnlikeSong.objects.create(user=user, song=song)
-        song_ins = LikeSong.objects.filter(user=user, song=song).first()
-        if song_ins:
-            song_ins.delete()
+        try:
+            with transaction.atomic():
+                lock_reactions(user)
+                UnlikeSong.objects.create(user=user, song=song)
+                removed, _ = LikeSong.objects.filter(user=user, song=song).delete()
+                adjust_song_counters(song, likes=-removed, dislikes=1)
+        except IntegrityError:
+            return Response({'message': 'You have already unliked this song.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        update_counts(song)
         return Response({'message': 'You have successfully unliked this song.'})
 
+class BulkUnlikeSongView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkSongReactionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return bulk_unlike_songs(request.user, serializer.validated_data['songs'])
+
 class FollowUserView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -60,10 +91,21 @@ class FollowUserView(APIView):
         if Follow.objects.filter(follower=user, followed=followed).exists():
             return Response({'message': 'You have already Followed this User.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        Follow.objects.create(follower=user, followed=followed)
+        try:
+            Follow.objects.create(follower=user, followed=followed)
+        except IntegrityError:
+            return Response({'message': 'You have already Followed this User.'}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({'message': 'You have successfully Followed this User.'}, status=status.HTTP_200_OK)
 
+class BulkFollowUserView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkFollowUserSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return bulk_follow_users(request.user, serializer.validated_data['users'])
+
 class UnFollowUserView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -75,7 +117,40 @@ class UnFollowUserView(APIView):
 
         try:
             follow_instance = Follow.objects.get(follower=user, followed=followed)
-            follow_instance.delete()
+            with transaction.atomic():
+                follow_instance.delete()
+                ReleaseInboxItem.objects.filter(user=user, release__artist=followed).delete()
             return Response({'message': 'User unfollowed successfully.'}, status=status.HTTP_200_OK)
         except Follow.DoesNotExist:
             return Response({'message': 'You are not following this user.'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class SongHLSView(APIView):
+    """Serves a song's HLS master/media playlists and segments from its latest transcode."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, path):
+        job = get_object_or_404(TranscodeJob.objects.select_related('song').exclude(hls_master=''), song_id=pk)
+        return stream_file(request, job.song.audio_file.storage, f'{job.output_dir}/{path}')
+
+
+class NewReleasesView(APIView):
+    """New albums and songs from the artists the user follows, newest first."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        before = None
+        if request.query_params.get('cursor'):
+            before = decode_cursor(request.query_params['cursor'])
+            if before is None:
+                return Response({'message': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page_size = CreatedAtCursorPagination().get_page_size(request)
+        releases, next_key = release_feed(request.user, page_size, before=before)
+        next_url = None
+        if next_key:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(*next_key))
+        return Response({
+            'next': next_url,
+            'results': ReleaseSerializer(releases, many=True).data,
+        })
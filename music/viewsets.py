@@ -1,3 +1,7 @@
+import math
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -5,21 +9,32 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated
 
 from home.utils import add_to_recently_played
-from music.models import Album, Song, LikeSong
+from music.models import Album, Song, LikeSong, TranscodeJob
+from music.plays import register_play
+from music.streaming import stream_file
+from music.transcoding import pick_rendition
+from music.waveforms import MAX_POINTS, downsample, read_peaks
+from music.utils import parse_playlist_context
+from spotify_clone.pagination import LikedSongsPagination
+from spotify_clone.serializers import requested_fields
 from music.serializers import AlbumSerializer, AlbumResponseSerializer, SongSerializer, SongResponseSerializer, \
-    LikeSongResponseSerializer
+    LikedSongSerializer
 
 
 class AlbumViewSet(ModelViewSet):
-    queryset = Album.objects.all().select_related('artist', 'artist__user_profile').prefetch_related('songs')
+    queryset = Album.objects.all().select_related('artist', 'artist__user_profile')
     serializer_class = AlbumResponseSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        params = requested_fields(self.request)
+        return self.queryset.prefetch_related(*AlbumResponseSerializer.expansion_prefetches(**params))
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         album = serializer.save(artist=request.user)
-        response_serializer = AlbumResponseSerializer(album)
+        response_serializer = AlbumResponseSerializer(album, **requested_fields(request))
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
@@ -27,7 +42,7 @@ class AlbumViewSet(ModelViewSet):
         serializer = AlbumSerializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         album = serializer.save()
-        response_serializer = AlbumResponseSerializer(album)
+        response_serializer = AlbumResponseSerializer(album, **requested_fields(request))
         return Response(response_serializer.data, status=status.HTTP_200_OK)
 
 
@@ -38,17 +53,13 @@ class SongViewSet(ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return (
-            Song.objects
-            .select_related('album', 'album__artist', 'album__artist__user_profile')
-            .prefetch_related('genre', 'featured_artists', 'featured_artists__user_profile')
-        )
+        params = requested_fields(self.request)
+        return Song.objects.prefetch_related(*SongResponseSerializer.expansion_prefetches(**params))
 
     def retrieve(self, request, *args, **kwargs):
         user = request.user
         instance = self.get_object()
-        instance.plays_count += 1
-        instance.save()
+        register_play(instance.id, user.id, playlist_id=parse_playlist_context(request))
         add_to_recently_played(user, song=instance)
         serializer = self.get_serializer(instance)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -57,7 +68,7 @@ class SongViewSet(ModelViewSet):
         serializer = SongSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         song = serializer.save()
-        response_serializer = SongResponseSerializer(song)
+        response_serializer = SongResponseSerializer(song, **requested_fields(request))
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
@@ -65,13 +76,64 @@ class SongViewSet(ModelViewSet):
         serializer = SongSerializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         song = serializer.save()
-        response_serializer = SongResponseSerializer(song)
+        response_serializer = SongResponseSerializer(song, **requested_fields(request))
         return Response(response_serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=True, permission_classes=[IsAuthenticated])
+    def stream(self, request, pk=None):
+        song = get_object_or_404(Song.objects.only('id', 'audio_file').prefetch_related('renditions'), pk=pk)
+        if not song.audio_file:
+            return Response({'message': 'This Song has no audio file.'}, status=status.HTTP_404_NOT_FOUND)
+
+        storage = song.audio_file.storage
+        bitrate = request.query_params.get('bitrate')
+        if bitrate != 'original':
+            rendition = pick_rendition(
+                song,
+                bitrate=int(bitrate) if bitrate and bitrate.isdigit() else None,
+                save_data=request.headers.get('Save-Data', '').lower() == 'on',
+            )
+            if rendition:
+                return stream_file(request, storage, rendition.audio_file)
+        return stream_file(request, storage, song.audio_file.name)
+
+    @action(detail=True, permission_classes=[IsAuthenticated])
+    def waveform(self, request, pk=None):
+        job = get_object_or_404(TranscodeJob.objects.select_related('song'), song_id=pk)
+        if not job.waveform:
+            return Response({'message': 'Waveform is not ready yet.'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            start = float(request.query_params.get('start', 0))
+            end = float(request.query_params['end']) if 'end' in request.query_params else None
+            points = min(int(request.query_params.get('points', 1000)), MAX_POINTS)
+        except ValueError:
+            return Response({'message': 'start, end and points must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        # float() accepts "nan" and "inf", which have no bucket
+        if not math.isfinite(start) or (end is not None and not math.isfinite(end)):
+            return Response({'message': 'start and end must be finite.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        buckets_per_second, first, peaks = read_peaks(job.song.audio_file.storage, job.waveform, start, end)
+        merged = downsample(peaks, max(points, 1))
+        response = Response({
+            'start': first / buckets_per_second,
+            'end': (first + len(peaks) // 2) / buckets_per_second,
+            'points': len(merged) // 2,
+            'peaks': merged,
+        }, status=status.HTTP_200_OK)
+        patch_cache_control(response, private=True, max_age=settings.AUDIO_STREAM_MAX_AGE)
+        return response
+
     @action(detail=False, permission_classes=[IsAuthenticated])
     def liked_songs(self, request):
         user = self.request.user
-        liked_songs = LikeSong.objects.filter(user=user)
-        serializer = LikeSongResponseSerializer(liked_songs, many=True)
-        return Response(serializer.data)
+        liked_songs = (
+            LikeSong.objects
+            .filter(user=user)
+            .select_related('song', 'song__album', 'song__album__artist', 'song__album__artist__user_profile')
+        )
+        paginator = LikedSongsPagination()
+        page = paginator.paginate_queryset(liked_songs, request, view=self)
+        serializer = LikedSongSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
@@ -0,0 +1,91 @@
+import math
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'PEAK'
+VERSION = 1
+# magic, version, buckets per second, bucket count
+HEADER = struct.Struct('<4sBxHI')
+
+PCM_SAMPLE = np.dtype('<i2')
+PEAK = np.dtype('i1')
+
+PCM_SAMPLE_RATE = 8000
+BUCKETS_PER_SECOND = 100
+MAX_POINTS = 4000
+
+
+def compute_peaks(pcm_path):
+    """
+    Reduce mono signed 16-bit little-endian PCM to interleaved int8
+    ``(min, max)`` pairs, one pair per ``1 / BUCKETS_PER_SECOND`` seconds.
+    The file is memory-mapped and viewed as one row per bucket, so each side
+    is a single vectorized reduction.
+    """
+    samples_per_bucket = PCM_SAMPLE_RATE // BUCKETS_PER_SECOND
+    count = os.path.getsize(pcm_path) // PCM_SAMPLE.itemsize
+    if not count:
+        return np.empty(0, PEAK)
+    samples = np.memmap(pcm_path, dtype=PCM_SAMPLE, mode='r', shape=(count,))
+    full = count - count % samples_per_bucket
+    buckets = [samples[:full].reshape(-1, samples_per_bucket)]
+    if full < count:
+        buckets.append(samples[full:].reshape(1, -1))
+    peaks = np.concatenate([np.stack([bucket.min(axis=1), bucket.max(axis=1)], axis=1) for bucket in buckets])
+    # The high byte of each extreme
+    return (peaks >> 8).astype(PEAK).ravel()
+
+
+def write_peaks(path, peaks):
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, BUCKETS_PER_SECOND, len(peaks) // 2))
+        file.write(peaks.tobytes())
+
+
+def read_header(data):
+    magic, version, buckets_per_second, buckets = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a peaks file")
+    return buckets_per_second, buckets
+
+
+def read_peaks(storage, name, start, end):
+    """
+    Return ``(buckets_per_second, first_bucket, peaks)`` for the ``start``-``end``
+    seconds of a peaks sidecar. Local files are memory-mapped so only the
+    pages covering the slice are read.
+    """
+    def bounds(buckets_per_second, buckets):
+        first = min(max(int(start * buckets_per_second), 0), buckets)
+        last = buckets if end is None else min(max(math.ceil(end * buckets_per_second), first), buckets)
+        return first, last
+
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        with storage.open(name, 'rb') as file:
+            buckets_per_second, buckets = read_header(file.read(HEADER.size))
+            first, last = bounds(buckets_per_second, buckets)
+            file.seek(HEADER.size + first * 2)
+            return buckets_per_second, first, np.frombuffer(file.read((last - first) * 2), dtype=PEAK)
+
+    with open(path, 'rb') as file:
+        buckets_per_second, buckets = read_header(file.read(HEADER.size))
+    first, last = bounds(buckets_per_second, buckets)
+    if first == last:
+        return buckets_per_second, first, np.empty(0, PEAK)
+    peaks = np.memmap(path, dtype=PEAK, mode='r', offset=HEADER.size, shape=(buckets * 2,))
+    return buckets_per_second, first, np.array(peaks[first * 2:last * 2])
+
+
+def downsample(peaks, points):
+    """Merge ``(min, max)`` pairs so at most ``points`` pairs remain."""
+    pairs = len(peaks) // 2
+    if pairs <= points:
+        return peaks.tolist()
+    group = math.ceil(pairs / points)
+    starts = np.arange(0, pairs, group)
+    merged = np.stack([np.minimum.reduceat(peaks[0::2], starts), np.maximum.reduceat(peaks[1::2], starts)], axis=1)
+    return merged.ravel().tolist()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_alter_paymentlogs_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentlogs',
+            index=models.Index(fields=['user', '-id'], name='payment_log_user_idx'),
+        ),
+    ]
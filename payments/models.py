@@ -10,5 +10,10 @@ class PaymentLogs(models.Model):
     details = models.CharField(max_length=100, null=True)
     is_deleted = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='payment_log_user_idx'),
+        ]
+
     def __str__(self):
         return f" {self.user.username} Payment Log"
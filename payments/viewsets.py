@@ -10,6 +10,7 @@ from rest_framework.viewsets import ModelViewSet
 
 from payments.models import PaymentLogs
 from payments.serializers import PaymentMethodSerializer, PaymentLogSerializer
+from spotify_clone.pagination import IdCursorPagination
 from payments.utils import add_stripe_account, add_payment_method, get_stripe_account, subscribe, unsubscribe, \
     list_my_subscriptions
 
@@ -121,6 +122,7 @@ class PaymentViewSet(ModelViewSet):
 class PaymentLogListView(ListAPIView):
     serializer_class = PaymentLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
 
     def get_queryset(self):
         return PaymentLogs.objects.filter(
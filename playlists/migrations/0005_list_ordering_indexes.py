@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0013_list_ordering_indexes'),
+        ('playlists', '0004_playlist_created_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playlist',
+            index=models.Index(fields=['privacy', '-created_at', '-id'], name='playlist_privacy_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playlist',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='playlist_user_created_idx'),
+        ),
+    ]
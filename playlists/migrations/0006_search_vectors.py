@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:19
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.contrib.postgres.search import SearchVector
+from spotify_clone.operations import PostgresAddIndex
+
+
+def backfill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Playlist = apps.get_model('playlists', 'Playlist')
+    vector = SearchVector('name', weight='A') + SearchVector('user__user_profile__display_name', weight='B')
+    vectors = Playlist.objects.filter(pk=OuterRef('pk')).annotate(vector=vector).values('vector')[:1]
+    Playlist.objects.update(search_vector=Subquery(vectors))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0020_search_vectors'),
+        ('playlists', '0005_list_ordering_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        PostgresAddIndex(
+            model_name='playlist',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='playlist_search_idx'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 import uuid
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from music.models import Song
 
@@ -18,6 +20,15 @@ class Playlist(models.Model):
     privacy = models.CharField(max_length=10, choices=PRIVACY_CHOICES, default='public')
     total_songs = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by home.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='playlist_search_idx'),
+            models.Index(fields=['privacy', '-created_at', '-id'], name='playlist_privacy_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='playlist_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name}"
\ No newline at end of file
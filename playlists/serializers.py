@@ -2,24 +2,25 @@ from rest_framework import serializers
 from playlists.models import Playlist
 from music.serializers import  SongResponseSerializer
 from users.serializers import UserSerializer
+from spotify_clone.serializers import DynamicFieldsMixin, ImageDerivativesField
 
 
-class PlaylistSerializer(serializers.ModelSerializer):
+class PlaylistSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    cover_image_sizes = ImageDerivativesField(source='cover_image')
+
     class Meta:
         model = Playlist
-        fields = ['id' ,'user', 'name' , 'privacy', 'total_songs', 'cover_image', 'created_at']
+        fields = ['id' ,'user', 'name' , 'privacy', 'total_songs', 'cover_image', 'cover_image_sizes', 'created_at']
 
-class PlaylistDetailSerializer(serializers.ModelSerializer):
-    songs = serializers.SerializerMethodField()
+class PlaylistDetailSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    songs = SongResponseSerializer(many=True, read_only=True)
     user = serializers.SerializerMethodField()
+    cover_image_sizes = ImageDerivativesField(source='cover_image')
 
     class Meta:
         model = Playlist
-        fields = ['id' , 'name' , 'cover_image', 'privacy', 'created_at', 'total_songs', 'songs', 'user']
-
-    def get_songs(self, obj):
-        return SongResponseSerializer(obj.songs.all(), many=True).data
+        fields = ['id' , 'name' , 'cover_image', 'cover_image_sizes', 'privacy', 'created_at', 'total_songs', 'songs', 'user']
 
     def get_user(self, obj):
         return UserSerializer(obj.user).data
\ No newline at end of file
@@ -1,3 +1,83 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from music.models import Album, Song
+from playlists.models import Playlist
+
+User = get_user_model()
+
+
+class PlaylistPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='listener')
+        self.other = User.objects.create(username='other')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def collect(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [playlist['id'] for playlist in response.data['results']]
+            url = response.data['next']
+        return seen
+
+    def test_list_pages_public_playlists_without_gaps(self):
+        public = [Playlist.objects.create(user=self.other, name=f'Mix {number}') for number in range(5)]
+        Playlist.objects.create(user=self.other, name='Secret', privacy='private')
+
+        seen = self.collect('/api/playlists/?page_size=2')
+
+        self.assertEqual(sorted(seen), sorted(str(playlist.id) for playlist in public))
+
+    def test_my_playlists_pages_only_own_playlists(self):
+        mine = [Playlist.objects.create(user=self.user, name=f'Mine {number}', privacy='private') for number in range(3)]
+        Playlist.objects.create(user=self.other, name='Theirs')
+
+        seen = self.collect('/api/playlists/my_playlists/?page_size=2')
+
+        self.assertEqual(sorted(seen), sorted(str(playlist.id) for playlist in mine))
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/playlists/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+@mock.patch('playlists.viewsets.add_to_recently_played')
+class PlaylistFieldSelectionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='listener')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        album = Album.objects.create(title='Album', artist=self.user, description='', release_date=timezone.localdate())
+        song = Song.objects.create(
+            title='Song', album=album, duration=timedelta(minutes=3), audio_file='songs/audios/song.mp3'
+        )
+        self.playlist = Playlist.objects.create(user=self.user, name='Mix')
+        self.playlist.songs.add(song)
+
+    def test_list_keeps_only_requested_fields(self, recently_played):
+        response = self.client.get('/api/playlists/?fields=id,name,nope')
+        self.assertEqual(response.data['results'], [{'id': str(self.playlist.id), 'name': 'Mix'}])
+
+    def test_detail_songs_are_flat_until_expanded(self, recently_played):
+        response = self.client.get(f'/api/playlists/{self.playlist.id}/')
+        self.assertNotIn('album_details', response.data['songs'][0])
+
+        response = self.client.get(
+            f'/api/playlists/{self.playlist.id}/?fields=songs.title,songs.album_details.title'
+            '&expand=songs.album_details,songs.bogus'
+        )
+        self.assertEqual(response.data, {'songs': [{'title': 'Song', 'album_details': {'title': 'Album'}}]})
 
-# Create your tests here.
+    def test_private_playlist_is_not_found(self, recently_played):
+        self.playlist.privacy = 'private'
+        self.playlist.save()
+        response = self.client.get(f'/api/playlists/{self.playlist.id}/?expand=songs.album_details')
+        self.assertEqual(response.status_code, 404)
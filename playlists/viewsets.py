@@ -7,6 +7,7 @@ from home.utils import add_to_recently_played
 from playlists.models import Playlist
 from playlists.serializers import PlaylistSerializer, PlaylistDetailSerializer
 from playlists.utils import add_or_remove_song_to_playlist
+from spotify_clone.serializers import requested_fields
 
 
 class PlaylistViewSet(ModelViewSet):
@@ -15,12 +16,17 @@ class PlaylistViewSet(ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Playlist.objects.filter(privacy='public')
+        queryset = Playlist.objects.filter(privacy='public').select_related('user')
+        if self.action == 'retrieve':
+            params = requested_fields(self.request)
+            queryset = queryset.prefetch_related('songs', *PlaylistDetailSerializer.expansion_prefetches(**params))
+        return queryset
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
-        serializer = PlaylistSerializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = PlaylistSerializer(page, many=True, **requested_fields(request))
+        return self.get_paginated_response(serializer.data)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -32,14 +38,15 @@ class PlaylistViewSet(ModelViewSet):
         user = request.user
         instance = self.get_object()
         add_to_recently_played(user, playlist=instance)
-        serializer = PlaylistDetailSerializer(instance)
+        serializer = PlaylistDetailSerializer(instance, **requested_fields(request))
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_playlists(self, request):
-        playlists = Playlist.objects.filter(user=request.user)
-        serializer = PlaylistSerializer(playlists, many=True)
-        return Response(serializer.data)
+        playlists = Playlist.objects.filter(user=request.user).select_related('user')
+        page = self.paginate_queryset(playlists)
+        serializer = PlaylistSerializer(page, many=True, **requested_fields(request))
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['post'])
     def add_or_remove_song(self, request, *args, **kwargs):
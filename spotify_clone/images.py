@@ -0,0 +1,134 @@
+import hashlib
+import io
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+DERIVATIVES_DIR = 'derivatives'
+IMAGE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+# Only uploads from these folders can be resized
+IMAGE_UPLOAD_DIRS = ('album_covers/', 'songs/covers/', 'playlist_covers/', 'profile_pictures/')
+
+# Characters of the content hash that version derivative URLs
+VERSION_LENGTH = 16
+
+_pixel_limit_lock = threading.Lock()
+_pixel_limit_users = 0
+_pillow_pixel_limit = None
+
+
+class ImageRenderError(ValueError):
+    """The original is too large to decode safely, or is truncated or corrupt."""
+
+
+def content_hash(storage, name):
+    """SHA-1 of the original image, cached per name and modification time."""
+    key = f'image-hash:{name}:{storage.get_modified_time(name).timestamp()}'
+    digest = cache.get(key)
+    if digest is None:
+        sha1 = hashlib.sha1()
+        with storage.open(name, 'rb') as file:
+            for chunk in file.chunks():
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+        cache.set(key, digest, None)
+    return digest
+
+
+def image_version(storage, name):
+    """What derivative URLs of ``name`` carry, so a replaced original gets new URLs."""
+    return content_hash(storage, name)[:VERSION_LENGTH]
+
+
+@contextmanager
+def pixel_limit(limit):
+    """
+    Set Pillow's ``MAX_IMAGE_PIXELS`` to ``limit`` while any thread is inside,
+    leaving it as it was for other Pillow users of the process otherwise.
+    """
+    global _pixel_limit_users, _pillow_pixel_limit
+    with _pixel_limit_lock:
+        if not _pixel_limit_users:
+            _pillow_pixel_limit = Image.MAX_IMAGE_PIXELS
+            Image.MAX_IMAGE_PIXELS = limit
+        _pixel_limit_users += 1
+    try:
+        yield
+    finally:
+        with _pixel_limit_lock:
+            _pixel_limit_users -= 1
+            if not _pixel_limit_users:
+                Image.MAX_IMAGE_PIXELS = _pillow_pixel_limit
+
+
+def render_derivative(file, size, image_format):
+    limit = settings.IMAGE_MAX_PIXELS
+    # Pillow itself only raises above twice the limit; anything above it is refused here
+    with pixel_limit(limit):
+        image = Image.open(file)
+        if image.width * image.height > limit:
+            raise Image.DecompressionBombError(f"{image.width}x{image.height} is more than {limit} pixels")
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    if image_format == 'jpeg' or image.mode not in ('RGB', 'RGBA'):
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        if image_format == 'jpeg' and has_alpha:
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    output = io.BytesIO()
+    image.save(output, **IMAGE_FORMATS[image_format])
+    return output.getvalue()
+
+
+def get_derivative(storage, name, size, image_format):
+    """
+    Return the storage name of ``name`` resized to fit ``size`` px in
+    ``image_format``, rendering it on first use. Derivatives are named after the
+    content hash of the original, so identical uploads share one file.
+    Raises ``ImageRenderError`` for originals that cannot be rendered.
+    """
+    digest = content_hash(storage, name)
+    derivative = f'{DERIVATIVES_DIR}/{digest[:2]}/{digest}-{size}.{image_format}'
+    if not storage.exists(derivative):
+        with storage.open(name, 'rb') as file:
+            try:
+                data = render_derivative(file, size, image_format)
+            except UnidentifiedImageError:
+                raise
+            except (Image.DecompressionBombError, OSError) as exc:
+                # Too many pixels to decode safely, or truncated or corrupt data
+                raise ImageRenderError(str(exc)) from exc
+        saved = storage.save(derivative, ContentFile(data))
+        if saved != derivative:
+            # Another request rendered it first
+            storage.delete(saved)
+    return derivative
+
+
+def derivative_urls(storage, name, build_url):
+    """
+    ``{size: {format: url}}`` for every configured derivative of ``name``, or
+    ``None`` when the original is missing. URLs carry ``image_version``.
+    """
+    try:
+        version = image_version(storage, name)
+    except FileNotFoundError:
+        return None
+    return {
+        str(size): {
+            image_format: build_url(size, image_format, version, name)
+            for image_format in IMAGE_FORMATS
+        }
+        for size in settings.IMAGE_DERIVATIVE_SIZES
+    }
@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Default keyset pagination for list endpoints, newest first."""
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class DateJoinedCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-date_joined', '-id')
+
+
+class IdCursorPagination(CreatedAtCursorPagination):
+    ordering = '-id'
+
+
+class LikedSongsPagination(CreatedAtCursorPagination):
+    ordering = ('-liked_at', '-id')
+    page_size = 50
+    max_page_size = 200
@@ -0,0 +1,152 @@
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from spotify_clone.images import derivative_urls
+
+
+def split_field_paths(paths):
+    """Group dotted paths by their first segment: ``['a', 'b.c']`` -> ``{'a': [], 'b': ['c']}``."""
+    grouped = {}
+    for path in paths:
+        head, _, rest = path.partition('.')
+        children = grouped.setdefault(head, [])
+        if rest:
+            children.append(rest)
+    return grouped
+
+
+def requested_fields(request):
+    """Read the ``?fields=`` and ``?expand=`` query params as serializer kwargs."""
+    def parse(param):
+        value = request.query_params.get(param)
+        return [path.strip() for path in value.split(',') if path.strip()] if value else None
+
+    return {'fields': parse('fields'), 'expand': parse('expand') or []}
+
+
+class DynamicFieldsMixin:
+    """
+    Lets clients trim a serializer with ``fields`` and opt into the nested
+    objects listed in ``Meta.expandable_fields`` with ``expand``. Both are
+    read from the request query params unless passed explicitly, and dotted
+    paths (``album_details.songs``) are handed down to nested serializers.
+
+    Each expandable field maps to ``serializer`` (a class or dotted path),
+    ``prefetch`` lookups relative to this model, and any field kwargs such as
+    ``source`` or ``many``. ``'default': True`` keeps a field in the default
+    shape, so ``fields`` can still leave it out but it needs no ``expand``.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self._context.get('request')
+        if fields is None and expand is None and request is not None:
+            params = requested_fields(request)
+            fields, expand = params['fields'], params['expand']
+        if fields or expand or self.default_expansions(fields):
+            self.select_fields(fields, expand or [])
+
+    @classmethod
+    def expandable_fields(cls):
+        return getattr(cls.Meta, 'expandable_fields', {})
+
+    @classmethod
+    def default_expansions(cls, fields=None):
+        """Expandable fields in the default shape that ``fields`` does not leave out."""
+        kept = split_field_paths(fields) if fields else None
+        return [
+            name for name, options in cls.expandable_fields().items()
+            if options.get('default') and (kept is None or name in kept)
+        ]
+
+    @classmethod
+    def nested_serializer(cls, name):
+        """Return ``(serializer_class, source)`` for a nested field, or ``None``."""
+        options = cls.expandable_fields().get(name)
+        if options:
+            serializer = options['serializer']
+            serializer_class = import_string(serializer) if isinstance(serializer, str) else serializer
+            return serializer_class, options.get('source', name)
+
+        field = cls._declared_fields.get(name)
+        child = getattr(field, 'child', field)
+        if isinstance(child, DynamicFieldsMixin):
+            return type(child), field.source or name
+        return None
+
+    @classmethod
+    def expansion_prefetches(cls, expand, fields=None, prefix=''):
+        """
+        Return the ``prefetch_related`` lookups needed to serialize ``expand``
+        and the default expansions kept by ``fields`` without N+1 queries.
+        """
+        lookups = []
+        nested_fields = split_field_paths(fields or [])
+        nested_expand = split_field_paths(expand)
+        for name in cls.default_expansions(fields):
+            nested_expand.setdefault(name, [])
+        for name, children in nested_expand.items():
+            options = cls.expandable_fields().get(name)
+            if options:
+                lookups += [prefix + lookup for lookup in options.get('prefetch', [])]
+            nested = cls.nested_serializer(name)
+            if nested and (children or options):
+                serializer_class, source = nested
+                lookups += serializer_class.expansion_prefetches(
+                    children, nested_fields.get(name) or None, prefix + source.replace('.', '__') + '__'
+                )
+        return lookups
+
+    def select_fields(self, fields, expand):
+        expandable = self.expandable_fields()
+        nested_fields = split_field_paths(fields or [])
+        nested_expand = split_field_paths(expand)
+        requested = set(nested_fields) | set(nested_expand)
+        for name in self.default_expansions(fields):
+            nested_expand.setdefault(name, [])
+
+        for name in nested_expand:
+            if name in expandable:
+                serializer_class, _ = self.nested_serializer(name)
+                options = {
+                    key: value for key, value in expandable[name].items()
+                    if key not in ('serializer', 'prefetch', 'default')
+                }
+                self.fields[name] = serializer_class(
+                    read_only=True,
+                    fields=nested_fields.get(name) or None,
+                    expand=nested_expand[name],
+                    **options
+                )
+
+        if fields:
+            for name in list(self.fields):
+                if name not in requested:
+                    self.fields.pop(name)
+
+        for name, field in self.fields.items():
+            child = getattr(field, 'child', field)
+            if name not in expandable and isinstance(child, DynamicFieldsMixin):
+                child.select_fields(nested_fields.get(name) or None, nested_expand.get(name, []))
+
+
+class ImageDerivativesField(serializers.Field):
+    """Read-only ``{size: {format: url}}`` map of resized copies of an image field."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('allow_null', True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+
+        def build_url(size, image_format, version, name):
+            url = reverse('image-derivative', kwargs={
+                'size': size, 'image_format': image_format, 'version': version, 'name': name,
+            })
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return derivative_urls(value.storage, value.name, build_url)
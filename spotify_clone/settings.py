@@ -125,6 +125,11 @@ DATABASES = {
 if env.str("DATABASE_URL", default=None):
     DATABASES = {"default": env.db()}
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
 
 
 # Password validation
@@ -176,6 +181,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     ),
+    'DEFAULT_PAGINATION_CLASS': 'spotify_clone.pagination.CreatedAtCursorPagination',
 }
 
 # Auth User Model
@@ -213,3 +219,63 @@ STRIPE_PRICE_IDS = {
 
 STRIPE_PROFILE_REFRESH_LINK = "https://686e-119-154-156-82.ngrok-free.app"
 STRIPE_PROFILE_REDIRECT_LINK = "https://686e-119-154-156-82.ngrok-free.app"
+
+
+# Play Counter Setting
+PLAY_COUNT_CACHE = env.str("PLAY_COUNT_CACHE", default="default")
+PLAY_COUNT_FLUSH_INTERVAL = env.int("PLAY_COUNT_FLUSH_INTERVAL", default=30)
+# Seconds the play rollups stay behind now, longer than any play flush transaction takes to commit
+PLAY_ROLLUP_LAG = env.int("PLAY_ROLLUP_LAG", default=120)
+# Seconds between writes of the cached recently played windows to the database
+RECENTLY_PLAYED_FLUSH_INTERVAL = env.int("RECENTLY_PLAYED_FLUSH_INTERVAL", default=5)
+
+# Audio Streaming Setting
+# "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd) hands the transfer to the proxy
+AUDIO_STREAM_OFFLOAD = env.str("AUDIO_STREAM_OFFLOAD", default="")
+AUDIO_STREAM_ACCEL_PREFIX = env.str("AUDIO_STREAM_ACCEL_PREFIX", default="/protected-media/")
+AUDIO_STREAM_MAX_AGE = env.int("AUDIO_STREAM_MAX_AGE", default=60 * 60 * 24)
+AUDIO_STREAM_DEFAULT_BITRATE = env.int("AUDIO_STREAM_DEFAULT_BITRATE", default=128)
+
+# Audio Transcoding Setting
+FFMPEG_BINARY = env.str("FFMPEG_BINARY", default="ffmpeg")
+AUDIO_TRANSCODE_BITRATES = env.list("AUDIO_TRANSCODE_BITRATES", cast=int, default=[64, 128, 256])
+# 0 leaves pending jobs to the transcode_songs command
+AUDIO_TRANSCODE_WORKERS = env.int("AUDIO_TRANSCODE_WORKERS", default=2)
+AUDIO_TRANSCODE_TIMEOUT = env.int("AUDIO_TRANSCODE_TIMEOUT", default=600)
+
+# Image Derivative Setting
+IMAGE_DERIVATIVE_SIZES = env.list("IMAGE_DERIVATIVE_SIZES", cast=int, default=[64, 300, 640])
+IMAGE_DERIVATIVE_MAX_AGE = env.int("IMAGE_DERIVATIVE_MAX_AGE", default=60 * 60 * 24 * 365)
+# Uploads with more pixels than this are not decoded for resizing
+IMAGE_MAX_PIXELS = env.int("IMAGE_MAX_PIXELS", default=40_000_000)
+
+# Release Feed Setting
+# 0 leaves pending fan-outs to the fanout_releases command
+RELEASE_FANOUT_WORKERS = env.int("RELEASE_FANOUT_WORKERS", default=1)
+RELEASE_FANOUT_BATCH_SIZE = env.int("RELEASE_FANOUT_BATCH_SIZE", default=1000)
+# Artists with more followers are merged into feeds at read time instead
+RELEASE_FANOUT_MAX_FOLLOWERS = env.int("RELEASE_FANOUT_MAX_FOLLOWERS", default=10000)
+
+# Explore Setting
+# Seconds before the shared explore sections are rebuilt in the background on the next visit
+EXPLORE_SNAPSHOT_MAX_AGE = env.int("EXPLORE_SNAPSHOT_MAX_AGE", default=60 * 15)
+
+# Recommender Setting
+# Trained by train_recommender and memory-mapped by every worker
+RECOMMENDER_MODEL_PATH = env.str("RECOMMENDER_MODEL_PATH", default=os.path.join(BASE_DIR, "var", "recommender.als"))
+# Users with at least this many likes get "Made for you" from the factor model
+RECOMMENDER_MIN_HISTORY = env.int("RECOMMENDER_MIN_HISTORY", default=20)
+
+# Search Setting
+SEARCH_RESULTS_PER_TYPE = env.int("SEARCH_RESULTS_PER_TYPE", default=20)
+# Threads per process searching the types of one request concurrently, 0 searches them in turn
+SEARCH_WORKERS = env.int("SEARCH_WORKERS", default=4)
+# Cached search pages are also retired whenever a song, album, playlist or profile changes
+SEARCH_CACHE_TIMEOUT = env.int("SEARCH_CACHE_TIMEOUT", default=300)
+# Dotted path of the search backend class; empty picks PostgreSQL full-text
+# search, then the SQLite FTS5 table, then an in-process index
+SEARCH_BACKEND = env.str("SEARCH_BACKEND", default="")
+# Typeahead keeps this many of the most popular items of each type per process
+SUGGEST_MAX_PER_TYPE = env.int("SUGGEST_MAX_PER_TYPE", default=50000)
+# Popularity in the typeahead is refreshed by a background rebuild this often
+SUGGEST_REFRESH_SECONDS = env.int("SUGGEST_REFRESH_SECONDS", default=600)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:06
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counts(apps, schema_editor):
+    UserProfile = apps.get_model('users', 'UserProfile')
+    Follow = apps.get_model('music', 'Follow')
+
+    def count(field):
+        follows = Follow.objects.filter(**{field: OuterRef('user_id')}).order_by().values(field)
+        return Coalesce(Subquery(follows.annotate(total=Count('id')).values('total')), Value(0))
+
+    UserProfile.objects.update(follower_count=count('followed'), following_count=count('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_list_ordering_indexes'),
+        ('music', '0019_follow_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_follow_counts, migrations.RunPython.noop),
+    ]
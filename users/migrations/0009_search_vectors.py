@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:19
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.contrib.postgres.search import SearchVector
+from spotify_clone.operations import PostgresAddIndex
+
+
+def backfill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    UserProfile = apps.get_model('users', 'UserProfile')
+    vector = (
+        SearchVector('display_name', weight='A')
+        + SearchVector('user__first_name', weight='B')
+        + SearchVector('user__last_name', weight='B')
+    )
+    vectors = UserProfile.objects.filter(pk=OuterRef('pk')).annotate(vector=vector).values('vector')[:1]
+    UserProfile.objects.update(search_vector=Subquery(vectors))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_profile_follow_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        PostgresAddIndex(
+            model_name='userprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='user_profile_search_idx'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 import uuid
 from django.contrib.auth.models import User, AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from djstripe.models import Customer, Account
 
@@ -9,6 +11,11 @@ class Users(AbstractUser):
     stripe_customer_id = models.OneToOneField(Customer, null=True, blank=True, on_delete=models.SET_NULL)
     stripe_account = models.OneToOneField(Account, null=True, blank=True, on_delete=models.SET_NULL)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['-date_joined', '-id'], name='user_date_joined_idx'),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -28,6 +35,16 @@ class UserProfile(models.Model):
         ('artists', 'Artists'),
     ]
     role = models.CharField(choices=USER_ROLES, max_length=100, blank=True, null=True)
+    # Kept in step with music.Follow by music.stats
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Maintained by home.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='user_profile_search_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -1,10 +1,9 @@
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework import serializers
 from django.contrib.auth.models import  Group
-from music.models import Album
 from music.serializers import AlbumResponseSerializer
-from playlists.models import Playlist
 from users.models import UserProfile , ArtistRequest
+from spotify_clone.serializers import DynamicFieldsMixin, ImageDerivativesField
 
 User = get_user_model()
 
@@ -24,29 +23,34 @@ class UserSerializer(serializers.ModelSerializer):
         UserProfile.objects.create(user=user , role='users')
         return user
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    albums = serializers.SerializerMethodField()
-    my_playlists = serializers.SerializerMethodField()
+    profile_picture_sizes = ImageDerivativesField(source='profile_picture')
 
     class Meta:
         model = UserProfile
-        fields = ['id', 'user', 'display_name', 'bio' , 'date_of_birth' , 'created_at', 'profile_picture' , 'role', 'albums', 'my_playlists']
-
-    def get_albums(self, obj):
-        """Return all albums only if the user is an artist."""
-        if obj.user.groups.filter(name="Artists").exists():
-            return AlbumResponseSerializer(Album.objects.filter(artist=obj.user), many=True).data
-        return None
-
-    def get_my_playlists(self, obj):
-        from playlists.serializers import PlaylistSerializer
-        playlists=Playlist.objects.filter(user=obj.user)
-        return PlaylistSerializer(playlists, many=True).data
+        fields = ['id', 'user', 'display_name', 'bio' , 'date_of_birth' , 'created_at', 'profile_picture' ,
+                  'profile_picture_sizes', 'role', 'follower_count', 'following_count']
+        read_only_fields = ['follower_count', 'following_count']
+        expandable_fields = {
+            'albums': {
+                'serializer': AlbumResponseSerializer,
+                'source': 'user.album_artist',
+                'many': True,
+                'prefetch': ['user__album_artist__artist__user_profile'],
+            },
+            'my_playlists': {
+                'serializer': 'playlists.serializers.PlaylistSerializer',
+                'source': 'user.user_playlist',
+                'many': True,
+                'prefetch': ['user__user_playlist__user'],
+            },
+        }
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if not instance.user.groups.filter(name="Artists").exists():
+        # Albums are only listed for artists
+        if 'albums' in data and not instance.user.groups.filter(name="Artists").exists():
             data.pop("albums", None)
         return data
 
@@ -89,17 +93,27 @@ class UpdatePasswordSerializer(serializers.Serializer):
         attrs['user'] = user
         return attrs
 
-class UserResponseSerializer(serializers.ModelSerializer):
+class UserResponseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     display_name = serializers.SerializerMethodField()
     profile_picture = serializers.SerializerMethodField()
+    profile_picture_sizes = ImageDerivativesField(source='user_profile.profile_picture')
+    follower_count = serializers.SerializerMethodField()
+    following_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'display_name', 'email', 'profile_picture']
+        fields = ['id', 'username', 'display_name', 'email', 'profile_picture', 'profile_picture_sizes',
+                  'follower_count', 'following_count']
 
     def get_display_name(self, obj):
         return obj.user_profile.display_name if hasattr(obj, 'user_profile') else obj.username
 
+    def get_follower_count(self, obj):
+        return obj.user_profile.follower_count if hasattr(obj, 'user_profile') else 0
+
+    def get_following_count(self, obj):
+        return obj.user_profile.following_count if hasattr(obj, 'user_profile') else 0
+
     def get_profile_picture(self, obj):
         if hasattr(obj, 'user_profile') and obj.user_profile.profile_picture:
             try:
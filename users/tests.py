@@ -1,3 +1,71 @@
+import uuid
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from music.models import Follow
+from users.models import UserProfile
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=f'user{number}') for number in range(4)]
+        for user in self.users:
+            UserProfile.objects.create(user=user, role='users')
+        self.user = self.users[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counts(self, user):
+        profile = UserProfile.objects.get(user=user)
+        return profile.follower_count, profile.following_count
+
+    def test_follow_and_unfollow_keep_counts(self):
+        followed = self.users[1]
+        self.assertEqual(self.client.post('/api/follow_user/', {'followed': followed.id}).status_code, 200)
+        self.assertEqual(self.client.post('/api/follow_user/', {'followed': followed.id}).status_code, 400)
+        self.assertEqual((self.counts(self.user), self.counts(followed)), ((0, 1), (1, 0)))
+
+        self.client.post('/api/unfollow_user/', {'followed': followed.id})
+        self.assertEqual((self.counts(self.user), self.counts(followed)), ((0, 0), (0, 0)))
+
+    def test_followers_pages_without_gaps(self):
+        for follower in self.users[1:]:
+            Follow.objects.create(follower=follower, followed=self.user)
+
+        seen, url = [], f'/api/users/{self.user.id}/followers/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [user['id'] for user in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(sorted(seen), sorted(str(user.id) for user in self.users[1:]))
+
+    def test_mutual_lists_only_follows_returned(self):
+        Follow.objects.create(follower=self.user, followed=self.users[1])
+        Follow.objects.create(follower=self.users[1], followed=self.user)
+        Follow.objects.create(follower=self.user, followed=self.users[2])
+        Follow.objects.create(follower=self.users[3], followed=self.user)
+
+        response = self.client.get(f'/api/users/{self.user.id}/mutual/')
+
+        self.assertEqual([user['id'] for user in response.data['results']], [str(self.users[1].id)])
+
+    def test_followers_of_unknown_user_are_not_found(self):
+        response = self.client.get(f'/api/users/{uuid.uuid4()}/followers/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_status(self):
+        Follow.objects.create(follower=self.user, followed=self.users[1])
+        response = self.client.get(f'/api/users/follow_status/?users={self.users[1].id},{self.users[2].id}')
+        self.assertEqual(response.data['following'], {str(self.users[1].id): True, str(self.users[2].id): False})
 
-# Create your tests here.
+    def test_follow_status_rejects_bad_ids(self):
+        too_many = ','.join(str(uuid.uuid4()) for _ in range(101))
+        for users in ('', 'not-a-uuid', too_many):
+            response = self.client.get(f'/api/users/follow_status/?users={users}')
+            self.assertEqual(response.status_code, 400, users[:20])
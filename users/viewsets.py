@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.models import Group
+from django.db.models import prefetch_related_objects
 from django.utils.timezone import now
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -9,7 +10,10 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
 from music.models import Follow
+from music.serializers import FollowStatusSerializer
 from users.models import ArtistRequest
+from spotify_clone.pagination import DateJoinedCursorPagination, IdCursorPagination
+from spotify_clone.serializers import requested_fields
 from users.permission import IsAdmin
 from users.serializers import UserSerializer, LoginSerializer, UserProfileSerializer, ArtistRequestResponseSerializer, \
     ArtistRequestSerializer, UpdatePasswordSerializer, UserResponseSerializer
@@ -20,11 +24,13 @@ class UserViewSet(ModelViewSet):
     queryset = User.objects.all().select_related('user_profile')
     permission_classes = [AllowAny]
     serializer_class = UserSerializer
+    pagination_class = DateJoinedCursorPagination
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
-        serializer = UserResponseSerializer(queryset, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(queryset)
+        serializer = UserResponseSerializer(page, many=True, **requested_fields(request))
+        return self.get_paginated_response(serializer.data)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -53,7 +59,9 @@ class UserViewSet(ModelViewSet):
     def view_profile(self, request):
         user = request.user
         profile = user.user_profile
-        profile_data = UserProfileSerializer(profile).data
+        params = requested_fields(request)
+        prefetch_related_objects([profile], *UserProfileSerializer.expansion_prefetches(**params))
+        profile_data = UserProfileSerializer(profile, **params).data
         return Response(status=status.HTTP_200_OK, data=profile_data)
 
     @action(detail=False, methods=['put'], permission_classes=[IsAuthenticated])
@@ -65,13 +73,49 @@ class UserViewSet(ModelViewSet):
             return Response(serializer.data)
         return Response(serializer.errors, status=400)
 
+    def paginate_follows(self, request, follows, user_field):
+        """Page through ``follows`` newest first and serialize the user on ``user_field`` of each row."""
+        follows = follows.select_related(user_field, f'{user_field}__user_profile')
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(follows, request, view=self)
+        users = [getattr(follow, user_field) for follow in page]
+        serializer = UserResponseSerializer(users, many=True, **requested_fields(request))
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def followed_users(self, request):
-        user = request.user
-        follow_qs = Follow.objects.filter(follower=user).select_related('followed')
-        followed_user_list = [f.followed for f in follow_qs]
-        serializer = UserResponseSerializer(followed_user_list, many=True, context={'request': request})
-        return Response(serializer.data)
+        return self.paginate_follows(request, Follow.objects.filter(follower=request.user), 'followed')
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def followers(self, request, pk=None):
+        user = self.get_object()
+        return self.paginate_follows(request, Follow.objects.filter(followed=user), 'follower')
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def following(self, request, pk=None):
+        user = self.get_object()
+        return self.paginate_follows(request, Follow.objects.filter(follower=user), 'followed')
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def mutual(self, request, pk=None):
+        """Users that this user follows and that follow them back."""
+        user = self.get_object()
+        follows = Follow.objects.filter(
+            follower=user, followed__in=Follow.objects.filter(followed=user).values('follower')
+        )
+        return self.paginate_follows(request, follows, 'followed')
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def follow_status(self, request):
+        """Whether the current user follows each user in ``?users=<id>,<id>,...``."""
+        user_ids = [user_id for user_id in request.query_params.get('users', '').split(',') if user_id]
+        serializer = FollowStatusSerializer(data={'users': user_ids})
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['users']
+        followed_ids = set(
+            Follow.objects.filter(follower=request.user, followed_id__in=user_ids).values_list('followed_id', flat=True)
+        )
+        return Response({'following': {str(user_id): user_id in followed_ids for user_id in user_ids}})
 
     @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
     def update_password(self, request):